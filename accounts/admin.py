@@ -1,12 +1,25 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from django.utils.translation import gettext_lazy as _
+
+from common.admin import ScalableAdminMixin
 
 from .forms import CustomUserCreationForm, CustomUserChangeForm
 from .models import CustomUser
 
+# search terms shorter than this match email prefixes, as the trigram index can not help with them
+TRIGRAM_MIN_LENGTH = 3
+
+
+class CustomUserAdmin(ScalableAdminMixin, UserAdmin):
+    ''' Accounts (CustomUser) Administration customization
 
-class CustomUserAdmin(UserAdmin):
-    ''' Accounts (CustomUser) Administration customization '''
+    For large user tables (see common/admin.py):
+    - the changelist counts users with the planner's estimate, and pages by key above a threshold,
+      in the (unique, indexed) username order of UserAdmin (the username is a copy of the email)
+    - search is by email only (the username is the email), through the email indexes of CustomUser:
+      a prefix (istartswith) for short terms, otherwise a trigram (icontains) match
+    '''
     add_form = CustomUserCreationForm
     form = CustomUserChangeForm
     model = CustomUser
@@ -15,7 +28,36 @@ class CustomUserAdmin(UserAdmin):
         "username",
         "is_staff",
         "is_active",
+        "history_count",
+        "history_last_changed",
+        "history_last_actor",
     ]
 
+    search_fields = ("email",)
+    search_help_text = _("Search by email (or its start, for one or two letters).")
+
+    def get_search_results(self, request, queryset, search_term):
+        '''Search short terms by email prefix, longer terms by trigram (see TRIGRAM_MIN_LENGTH).'''
+        search_term = search_term.strip()
+        if search_term and len(search_term) < TRIGRAM_MIN_LENGTH:
+            return queryset.filter(email__istartswith=search_term), False
+        return super().get_search_results(request, queryset, search_term)
+
+    def get_queryset(self, request):
+        '''Annotate the users with their history summary, so the history columns need no per row queries.'''
+        return super().get_queryset(request).with_history_stats()
+
+    @admin.display(description=_("Changes"), ordering="history_count")
+    def history_count(self, obj):
+        return obj.history_count
+
+    @admin.display(description=_("Last changed"), ordering="history_last_changed")
+    def history_last_changed(self, obj):
+        return obj.history_last_changed
+
+    @admin.display(description=_("Last changed by"), ordering="history_last_actor")
+    def history_last_actor(self, obj):
+        return obj.history_last_actor
+
 
 admin.site.register(CustomUser, CustomUserAdmin)
@@ -0,0 +1,49 @@
+""" Authentication backends for logins by email, using the (case insensitive) unique email index of CustomUser,
+and for the users of session authenticated requests, read from the user cache
+
+- see: common/indexes.py (soft_delete_unique) and accounts/models.py
+- see: accounts/user_cache.py
+- https://docs.allauth.org/en/latest/account/configuration.html
+"""
+from asgiref.sync import sync_to_async
+from django.contrib.auth import backends, get_user_model
+from allauth.account.auth_backends import AuthenticationBackend
+
+from .user_cache import get_cached_user
+
+
+class CachedUserMixin:
+    '''Get the user of a session authenticated request from the user cache (see accounts/user_cache.py).'''
+
+    def get_user(self, user_id):
+        user = get_cached_user(get_user_model(), user_id)
+        return user if user is not None and self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        return await sync_to_async(self.get_user)(user_id)
+
+
+class ModelBackend(CachedUserMixin, backends.ModelBackend):
+    '''Django's ModelBackend (e.g. admin logins), with the users of sessions read from the user cache.'''
+
+
+class EmailAuthenticationBackend(CachedUserMixin, AuthenticationBackend):
+    '''allauth's AuthenticationBackend, finding users by their (primary) email with one unique index lookup.
+
+    allauth finds users by email in the EmailAddress table and then (for unverified addresses) the user table.
+    Users are first found here with CustomUserManager.get_by_email, so a login is one index probe;
+    only an email that is not a user's primary email (e.g. a secondary EmailAddress) goes on to allauth's lookups.
+    The users of sessions are read from the user cache.
+    '''
+
+    def _authenticate_by_email(self, **credentials):
+        # (as allauth does, the email may be passed as the username, e.g. by other apps)
+        email = credentials.get('email', credentials.get('username'))
+        if not email:
+            return None
+        UserModel = get_user_model()
+        try:
+            user = UserModel._default_manager.get_by_email(email)
+        except UserModel.DoesNotExist:
+            return super()._authenticate_by_email(**credentials)
+        return user if self._check_password(user, credentials.get('password')) else None
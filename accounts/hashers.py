@@ -0,0 +1,75 @@
+""" Password hashing in a (bounded) process pool, so a burst of logins does not hold up the other requests
+
+PBKDF2 (with Django's 1,000,000 iterations) takes most of the time of a login or signup. With PASSWORD_HASH_WORKERS set,
+PooledPBKDF2PasswordHasher runs the PBKDF2 of each password hash or check in a pool of that many processes:
+- at most PASSWORD_HASH_WORKERS CPUs are ever busy hashing passwords, whatever the number of logins at once
+- (hashlib.pbkdf2_hmac releases the GIL by itself, so it is the bound on CPUs that the pool brings, when a process
+  serves many requests at once, e.g. under ASGI; under the default gunicorn sync workers it brings nothing)
+- the hashes are the same as Django's PBKDF2PasswordHasher (the same algorithm name), so no passwords need rehashing
+- see: PASSWORD_HASHERS in settings.py, and accounts/views.py for the login and signup views
+"""
+import base64
+import hashlib
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.utils.encoding import force_bytes
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def pbkdf2_sha256(password, salt, iterations):
+    '''Return the base64 PBKDF2 (HMAC SHA256) hash of password, as PBKDF2PasswordHasher does (run in the pool).'''
+    hash = hashlib.pbkdf2_hmac('sha256', password, salt, iterations)
+    return base64.b64encode(hash).decode('ascii').strip()
+
+
+def get_hash_pool():
+    '''Return the (process wide) password hashing pool, started on first use (None if PASSWORD_HASH_WORKERS is 0).'''
+    global _pool
+    if not settings.PASSWORD_HASH_WORKERS:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # spawned (not forked) workers, as the server process may be running threads
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS, mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _pool
+
+
+def shutdown_hash_pool():
+    '''Stop the password hashing pool (a new one is started when next needed).'''
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown()
+
+
+def _forget_hash_pool():
+    '''In a forked child (e.g. a gunicorn worker of a preloaded app), start its own pool rather than the parent's.'''
+    global _pool, _pool_lock
+    _pool = None
+    _pool_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_forget_hash_pool)
+
+
+class PooledPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    '''Django's PBKDF2PasswordHasher, with the PBKDF2 run in the password hashing pool (if PASSWORD_HASH_WORKERS).'''
+
+    def encode(self, password, salt, iterations=None):
+        pool = get_hash_pool()
+        if pool is None:
+            return super().encode(password, salt, iterations)
+        self._check_encode_args(password, salt)
+        iterations = iterations or self.iterations
+        hash = pool.submit(pbkdf2_sha256, force_bytes(password), force_bytes(salt), iterations).result()
+        return "%s$%d$%s$%s" % (self.algorithm, iterations, salt, hash)
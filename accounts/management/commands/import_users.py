@@ -0,0 +1,165 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - accounts/management/commands/import_users.py
+'''
+import csv
+import json
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+
+from django.contrib.auth.hashers import get_hasher, make_password
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.db.models.functions import Upper
+
+from accounts.hashers import pbkdf2_sha256
+from accounts.models import CustomUser
+
+FIELDS = ('email', 'first_name', 'last_name', 'password')
+# the user fields validated (as the model validates them, e.g. their max_length) before a row is imported
+VALIDATED_FIELDS = ('email', 'username', 'first_name', 'last_name')
+
+
+def read_rows(path, file_format):
+    '''Yield the rows (dictionaries) of a CSV (with a header line) or JSONL file, one at a time.'''
+    with open(path, newline='', encoding='utf-8') as file:
+        if file_format == 'csv':
+            yield from csv.DictReader(file)
+        else:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+class Command(BaseCommand):
+    help = (
+        'Import users from a CSV or JSONL file (columns: email, first_name, last_name, password), '
+        'in chunks with their passwords hashed in a process pool, resuming from the checkpoint file if it exists'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='the CSV (with a header line) or JSONL file of users')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='the file format (default: from the file name)')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='users inserted per transaction')
+        parser.add_argument(
+            '--workers', type=int, default=multiprocessing.cpu_count(), help='processes to hash passwords in',
+        )
+        parser.add_argument(
+            '--checkpoint', help='file recording the rows done, to resume from (default: the file path + .checkpoint)',
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        file_format = options['format'] or ('jsonl' if path.suffix.lower() in ('.jsonl', '.json') else 'csv')
+        checkpoint = Path(options['checkpoint'] or f'{path}.checkpoint')
+        done = int(checkpoint.read_text()) if checkpoint.exists() else 0
+        if done:
+            self.stdout.write(f'resuming after row {done}')
+
+        hasher = get_hasher('default')
+        pool = None
+        if hasher.algorithm == 'pbkdf2_sha256' and options['workers'] > 0:
+            pool = ProcessPoolExecutor(
+                max_workers=options['workers'], mp_context=multiprocessing.get_context('spawn'),
+            )
+        start = time.monotonic()
+        imported = skipped = 0
+        rows = read_rows(path, file_format)
+        try:
+            for _row in islice(rows, done):
+                pass
+            while chunk := list(islice(rows, options['chunk_size'])):
+                users, errors = self.valid_users(chunk, done)
+                for error in errors:
+                    self.stderr.write(error)
+                self.hash_passwords(users, hasher, pool, options['workers'])
+                with transaction.atomic():
+                    CustomUser.objects.bulk_create(users, batch_size=options['chunk_size'])
+                done += len(chunk)
+                checkpoint.write_text(str(done))
+                imported += len(users)
+                skipped += len(errors)
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'{done} rows: {imported / (time.monotonic() - start):.0f} users/s')
+        except (csv.Error, json.JSONDecodeError, UnicodeDecodeError) as error:
+            raise CommandError(f'{path}: row {done + 1}: {error} (the rows before it are imported)')
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        seconds = time.monotonic() - start
+        self.stdout.write(
+            f'{imported} users imported, {skipped} rows skipped, in {seconds:.1f}s '
+            f'({imported / seconds if seconds else 0:.0f} users/s)'
+        )
+
+    def valid_users(self, chunk, done):
+        '''Return the (unsaved, normalised) users of a chunk of rows, and the errors of the rows that are skipped.
+
+        The email is lower cased (the username is set to the email by CustomUser.bulk_normalize).
+        Rows without a valid email, with a value the user's fields do not take (e.g. longer than their max_length),
+        or with the email of an existing (or earlier) user in any case, are skipped.
+        '''
+        users, errors = [], []
+        exclude = [field.name for field in CustomUser._meta.concrete_fields if field.name not in VALIDATED_FIELDS]
+        for row_number, row in enumerate(chunk, start=done + 1):
+            values = {field: (row.get(field) or '').strip() for field in FIELDS}
+            values['email'] = values['email'].lower()
+            try:
+                validate_email(values['email'])
+            except ValidationError:
+                errors.append(f'row {row_number}: invalid email {values["email"]!r}, skipped')
+                continue
+            user = CustomUser(username=values['email'], **values)
+            try:
+                user.clean_fields(exclude=exclude)
+            except ValidationError as error:
+                invalid = '; '.join(
+                    f'{field} {" ".join(messages)}' for field, messages in sorted(error.message_dict.items())
+                )
+                errors.append(f'row {row_number}: invalid {invalid}, skipped')
+                continue
+            users.append((row_number, user))
+        # one query for the chunk's emails that are already in use (through the unique email index)
+        existing = set(
+            CustomUser.objects.alias(email_upper=Upper('email'))
+            .filter(email_upper__in=[user.email.upper() for _row_number, user in users])
+            .values_list('email', flat=True)
+        )
+        existing = {email.lower() for email in existing}
+        valid = []
+        for row_number, user in users:
+            if user.email in existing:
+                errors.append(f'row {row_number}: a user with the email {user.email!r} exists, skipped')
+                continue
+            existing.add(user.email)
+            valid.append(user)
+        return valid, errors
+
+    def hash_passwords(self, users, hasher, pool, workers):
+        '''Hash the users' passwords (in the pool if there is one), users without a password can not log in by password.'''
+        with_password = [user for user in users if user.password]
+        for user in users:
+            if not user.password:
+                user.password = make_password(None)
+        if pool is None:
+            for user in with_password:
+                user.password = make_password(user.password)
+            return
+        salts = [hasher.salt() for _user in with_password]
+        hashes = pool.map(
+            pbkdf2_sha256,
+            [user.password.encode() for user in with_password],
+            [salt.encode() for salt in salts],
+            [hasher.iterations] * len(with_password),
+            chunksize=max(len(with_password) // (workers * 4), 1),
+        )
+        for user, salt, hash in zip(with_password, salts, hashes):
+            user.password = f'{hasher.algorithm}${hasher.iterations}${salt}${hash}'
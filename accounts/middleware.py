@@ -0,0 +1,40 @@
+""" Authentication middleware that keeps the sessions logged in with the backends accounts/backends.py replaced
+
+Django only reads the user of a session if the session's backend (the path saved at login) is in
+settings.AUTHENTICATION_BACKENDS, so sessions logged in before the accounts/backends.py backends would be logged out.
+Their backend path is replaced with the path of the backend that replaced it (once, when the user is first read).
+"""
+from functools import partial
+
+from django.contrib.auth import BACKEND_SESSION_KEY
+from django.contrib.auth import middleware
+from django.utils.functional import SimpleLazyObject
+
+# the backend path saved in older sessions: the backend that replaced it
+LEGACY_BACKENDS = {
+    'django.contrib.auth.backends.ModelBackend': 'accounts.backends.ModelBackend',
+    'allauth.account.auth_backends.AuthenticationBackend': 'accounts.backends.EmailAuthenticationBackend',
+}
+
+
+def get_user(request):
+    backend_path = request.session.get(BACKEND_SESSION_KEY)
+    if backend_path in LEGACY_BACKENDS:
+        request.session[BACKEND_SESSION_KEY] = LEGACY_BACKENDS[backend_path]
+    return middleware.get_user(request)
+
+
+async def auser(request):
+    backend_path = await request.session.aget(BACKEND_SESSION_KEY)
+    if backend_path in LEGACY_BACKENDS:
+        await request.session.aset(BACKEND_SESSION_KEY, LEGACY_BACKENDS[backend_path])
+    return await middleware.auser(request)
+
+
+class AuthenticationMiddleware(middleware.AuthenticationMiddleware):
+    '''Django's AuthenticationMiddleware, reading the users of sessions saved with a LEGACY_BACKENDS backend path.'''
+
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: get_user(request))
+        request.auser = partial(auser, request)
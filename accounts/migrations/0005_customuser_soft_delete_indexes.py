@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:30
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_customuser_created_customuser_updated'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(django.db.models.functions.text.Upper('email'), condition=models.Q(('deleted__isnull', True)), name='accounts_cu_email_0dc00c_sdl'),
+        ),
+    ]
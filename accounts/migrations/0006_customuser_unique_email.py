@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:39
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+def check_duplicate_emails(apps, schema_editor):
+    '''Stop with the duplicate emails (in any case) of users that are not soft deleted, which must be fixed first.'''
+    CustomUser = apps.get_model('accounts', 'CustomUser')
+    duplicates = list(
+        CustomUser.objects.using(schema_editor.connection.alias)
+        .filter(deleted__isnull=True)
+        .values(email_upper=django.db.models.functions.text.Upper('email'))
+        .annotate(count=models.Count('pk'))
+        .filter(count__gt=1)
+        .values_list('email_upper', flat=True)[:20]
+    )
+    if duplicates:
+        raise RuntimeError(
+            f'users share these emails (in any case), soft delete or change them first: {", ".join(duplicates)}'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_customuser_soft_delete_indexes'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_emails, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='customuser',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Upper('email'), condition=models.Q(('deleted__isnull', True)), name='accounts_cu_email_04a025_sdu', violation_error_message='A custom user with this email already exists.'),
+        ),
+        migrations.RemoveIndex(
+            model_name='customuser',
+            name='accounts_cu_email_0dc00c_sdl',
+        ),
+    ]
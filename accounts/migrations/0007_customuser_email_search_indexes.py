@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:50
+
+import logging
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.db import migrations, models
+
+logger = logging.getLogger(__name__)
+
+TRIGRAM_INDEX = django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('email'), name='gin_trgm_ops'), condition=models.Q(('deleted__isnull', True)), name='accounts_cu_email_trgm')
+
+
+def add_trigram_index(apps, schema_editor):
+    '''Create the trigram index, if the pg_trgm extension is available (e.g. not in some hosted databases).
+
+    Without it, the admin's email (icontains) searches still work, by scanning the users.
+    '''
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            logger.warning(
+                'pg_trgm is not available, the user email trigram index is not created',
+                extra={'event': 'migration.trigram_index_skipped'},
+            )
+            return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.add_index(apps.get_model('accounts', 'CustomUser'), TRIGRAM_INDEX)
+
+
+def remove_trigram_index(apps, schema_editor):
+    schema_editor.execute('DROP INDEX IF EXISTS accounts_cu_email_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_customuser_unique_email'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='customuser',
+                    index=TRIGRAM_INDEX,
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(add_trigram_index, remove_trigram_index),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('email'), name='text_pattern_ops'), condition=models.Q(('deleted__isnull', True)), name='accounts_cu_email_88558a_sdl'),
+        ),
+    ]
@@ -6,16 +6,25 @@ Mix in SafeDeleteManager into CustomUserManager for Soft Deletes using safedelet
 - safe delete of custom users example found at;
 - https://codeberg.org/mvlaev/Cars/src/branch/main/cars/users_app/models.py"
 """
+import datetime
+import logging
+
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser, UserManager
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db.models import Q
+from django.db.models.functions import Upper
 from common.base_model import BaseModel
 # from safedelete.models import SafeDeleteModel
 # from safedelete.models import SOFT_DELETE_CASCADE
-from safedelete.managers import SafeDeleteManager
+from common.managers import BaseModelManager
 from auditlog.registry import auditlog
 # from auditlog.models import AuditlogHistoryField
 
+logger = logging.getLogger(__name__)
+
 
-class CustomUserManager(SafeDeleteManager, UserManager):
+class CustomUserManager(BaseModelManager, UserManager):
     """Custom User model Manager class ('objects').
 
     Manager class for CustomUsers (Accounts).  Access to this class is through the 'objects' instance attribute of the CustomUser Class.
@@ -23,12 +32,23 @@ class CustomUserManager(SafeDeleteManager, UserManager):
     Soft Delete of Users are implemented through SafeDelete.
     See: https://django-safedelete.readthedocs.io/en/latest/managers.html
 
+    History summaries for lists of users (with_history_stats) are implemented through BaseModelManager.
+    See: common/managers.py
+
     Args:
-        param1 (class): SafeDelete manager class mixin
+        param1 (class): BaseModelManager (SafeDelete manager) class mixin
         param2 (class): UserManager  for CustomUser Abstract Class
 
     """
 
+    def get_by_email(self, email):
+        '''Return the (not soft deleted) user with this email, in any case (one probe of the unique email index).'''
+        return self.get(email__iexact=email)
+
+    def get_by_natural_key(self, username):
+        '''Find users by email (the username is always the email, see accounts/signals.py), using its unique index.'''
+        return self.get_by_email(username)
+
 
 class CustomUser(BaseModel, AbstractUser):
     '''CustomUser model - Abstract User customized to allow login by email
@@ -38,15 +58,55 @@ class CustomUser(BaseModel, AbstractUser):
         - https://django-safedelete.readthedocs.io/en/latest/index.html
     - record history / versioning through django-auditlog
         - https://github.com/jazzband/django-auditlog
+    - a (case insensitive) unique email index for users that are not soft deleted, for the login by email lookups
+        - see: common/indexes.py and accounts/backends.py
+    - soft deleted users are purged (hard deleted) a year after they were deleted
+        - see: common/retention.py
+    - email prefix (istartswith) and trigram (icontains) indexes, for the admin's user search (see accounts/admin.py)
+        - the trigram index is only created if the database has the pg_trgm extension (see migration 0007)
     '''
     objects = CustomUserManager()
+    soft_delete_unique = [Upper('email')] # email__iexact (get_by_email) lookups, unique in any case
+    soft_delete_lookups = [OpClass(Upper('email'), name='text_pattern_ops')] # email__istartswith (prefix) lookups
+    soft_delete_retention = datetime.timedelta(days=365)
+
+    class Meta:
+        indexes = [
+            # email__icontains lookups (admin search), for users that are not soft deleted
+            GinIndex(
+                OpClass(Upper('email'), name='gin_trgm_ops'), name='accounts_cu_email_trgm',
+                condition=Q(deleted__isnull=True),
+            ),
+        ]
+
+    @classmethod
+    def bulk_normalize(cls, users):
+        '''Force the username of each user to be their email (see accounts/signals.py email_is_also_username).'''
+        for user in users:
+            user.username = user.email
+        return ['username']
+
+    def set_password(self, raw_password):
+        '''Set the password, dropping any session authentication hashes from the user cache (now out of date).'''
+        self.__dict__.pop('_cached_session_auth_hashes', None)
+        super().set_password(raw_password)
+
+    def _get_session_auth_hash(self, secret=None):
+        '''Return the session authentication hash, from the user cache if this user was read from it.
+
+        The cached hashes are for settings.SECRET_KEY, then each of settings.SECRET_KEY_FALLBACKS (see accounts/user_cache.py).
+        '''
+        cached_hashes = self.__dict__.get('_cached_session_auth_hashes')
+        if cached_hashes is None:
+            return super()._get_session_auth_hash(secret)
+        return cached_hashes[0 if secret is None else settings.SECRET_KEY_FALLBACKS.index(secret) + 1]
 
     def name_or_email(self):
         '''Return the user's full name, otherwise return their email.'''
         if self.first_name != '' and self.last_name != '':
             return "{fname} {lname}".format(fname=self.first_name, lname=self.last_name)
         else:
-            print(f'missing full name, using user email: {self.email}')
+            logger.info('missing full name, using user email', extra={'event': 'user.name_missing', 'user_id': self.pk})
             return self.email
     pass
 
@@ -1,6 +1,14 @@
-from django.db.models.signals import pre_save
+import logging
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
+from safedelete.signals import post_softdelete, post_undelete
+
 from .models import CustomUser
+from .user_cache import invalidate_cached_user
+
+logger = logging.getLogger(__name__)
 
 
 @receiver(pre_save, sender=CustomUser)
@@ -18,7 +26,33 @@ def email_is_also_username(sender, instance, **kwargs):
     We are using a pre_save signal decorator
     to force username field to be set to the records email field value for all CustomUser records
 
+    Note: the bulk_create and bulk_update of CustomUser.objects do not send pre_save signals,
+    so they do the same through CustomUser.bulk_normalize (see common/managers.py)
+
+    Note: saves of other fields only (update_fields, e.g. the last_login update of each login) are left alone
+
     '''
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and not {'email', 'username'} & set(update_fields):
+        return
     if instance.username != instance.email:
-        print(f"{instance.__class__.__name__} changed username from {instance.username} to {instance.email}")
-        instance.username = instance.email
+        logger.info(
+            'changed username to email',
+            extra={'event': 'user.username_normalized', 'model': sender._meta.label, 'user_id': instance.pk},
+        )
+        sender.bulk_normalize([instance])
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+@receiver(post_softdelete, sender=CustomUser)
+@receiver(post_undelete, sender=CustomUser)
+def invalidate_user_cache(sender, instance, **kwargs):
+    '''Stop using the user's cached record (see accounts/user_cache.py) once they are changed.
+
+    The cached record is dropped now, and again when the transaction commits
+    (in case another request cached the old record from the database in the meantime).
+    '''
+    pk = instance.pk # (a hard delete clears instance.pk before the commit)
+    invalidate_cached_user(pk)
+    transaction.on_commit(lambda: invalidate_cached_user(pk))
@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.urls import path, include
+
+from . import views
+
+# with PASSWORD_HASH_WORKERS, login and signup hash passwords off the request thread (see accounts/views.py)
+urlpatterns = [
+    path("login/", views.login, name="account_login"),
+    path("signup/", views.signup, name="account_signup"),
+] if settings.PASSWORD_HASH_WORKERS else []
+
+urlpatterns += [
+    path("", include("allauth.urls")),
+]
@@ -0,0 +1,75 @@
+""" A versioned cache of the logged in user's record, so session authenticated requests do not query the user table
+
+- AuthenticationMiddleware gets the user of each request from the authentication backend (see accounts/backends.py),
+  which reads it from the cache, and only from the database if it is not cached (or has changed)
+- the cached record is every field of the user except the password (which is left deferred, and read from the
+  database if it is used), with the session authentication hashes, so sessions are checked as Django checks them
+- a user's cache entry is keyed by their version token, which is replaced (so the entry is no longer used) when the
+  user is saved, soft deleted, undeleted or deleted, and again when that transaction commits (see accounts/signals.py)
+- cache entries expire after USER_CACHE_TIMEOUT seconds, which bounds how long changes that do not send
+  signals (e.g. QuerySet.update) can be missed
+Note: the cache must be shared by all server processes (e.g. redis), for a change in one process to be seen by the others,
+so USER_CACHE_TIMEOUT defaults to 0 (off) with a local memory cache, and a system check (common.W003) warns if it is set
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+from django.utils.crypto import salted_hmac
+
+USER_CACHE_PREFIX = 'auth-user'
+
+
+def user_version_key(pk):
+    return f'{USER_CACHE_PREFIX}:{pk}:version'
+
+
+def user_record_key(pk, version):
+    # the secret keys are part of the key, as the cached session authentication hashes depend on them
+    secrets = salted_hmac(USER_CACHE_PREFIX, ','.join(settings.SECRET_KEY_FALLBACKS)).hexdigest()[:12]
+    return f'{USER_CACHE_PREFIX}:{pk}:{version}:{secrets}'
+
+
+def invalidate_cached_user(pk):
+    '''Replace the user's version token, so their cached record is no longer used.'''
+    cache.set(user_version_key(pk), uuid.uuid4().hex, None)
+
+
+def get_cached_user(model, pk):
+    '''Return the (not soft deleted) user with primary key pk, from the cache if it holds them (else None).'''
+    if not settings.USER_CACHE_TIMEOUT:
+        return model._default_manager.filter(pk=pk).first()
+    version_key = user_version_key(pk)
+    version = cache.get(version_key)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(version_key, version, None):
+            version = cache.get(version_key)
+    record_key = user_record_key(pk, version)
+    record = cache.get(record_key)
+    if record is not None:
+        return user_from_record(model, record)
+    user = model._default_manager.filter(pk=pk).first()
+    if user is not None:
+        cache.set(record_key, user_record(user), settings.USER_CACHE_TIMEOUT)
+    return user
+
+
+def user_record(user):
+    '''Return the cached record of user: the field values (except the password) and the session authentication hashes.'''
+    return {
+        'fields': {
+            field.attname: getattr(user, field.attname)
+            for field in user._meta.concrete_fields if field.attname != 'password'
+        },
+        'session_auth_hashes': [user.get_session_auth_hash(), *user.get_session_auth_fallback_hash()],
+    }
+
+
+def user_from_record(model, record):
+    '''Return the user of a cached record (with the password deferred, as if loaded with QuerySet.defer('password')).'''
+    field_names = list(record['fields'])
+    user = model.from_db(router.db_for_read(model), field_names, [record['fields'][name] for name in field_names])
+    user._cached_session_auth_hashes = record['session_auth_hashes']
+    return user
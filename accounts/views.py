@@ -1,3 +1,55 @@
-# from django.shortcuts import render
+""" Login and signup views that hash passwords off the server's request thread, a bounded number at a time
 
-# # Create your views here.
+Under ASGI, Django runs each request's sync code in a thread of its own (per request thread sensitive context),
+and hashlib.pbkdf2_hmac releases the GIL while it hashes, so a login does not block other pages by itself. But a burst
+of logins would each take a thread and a CPU for the whole hash. These run allauth's login and signup views in the
+event loop's thread pool, at most PASSWORD_HASH_CONCURRENCY at a time (the rest wait their turn in the pool's
+threads, without using a CPU), so the other requests keep their share.
+- used when PASSWORD_HASH_WORKERS is set (see accounts/hashers.py and healthy_meals/urls.py)
+- under WSGI (the default gunicorn sync workers, one request at a time per worker) the views work as before, and
+  the process pool brings nothing, as pbkdf2_hmac already releases the GIL
+- the database connections the views open in the pool's threads are closed (returned to the connection pool) when
+  the view ends, as Django does for the request's thread when the request finishes
+"""
+import functools
+import threading
+
+from allauth.account import views as allauth_views
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+_hashing_slots = {} # PASSWORD_HASH_CONCURRENCY: its semaphore
+_hashing_slots_lock = threading.Lock()
+
+
+def hashing_slots():
+    '''Return the semaphore limiting the requests hashing passwords at once (PASSWORD_HASH_CONCURRENCY).'''
+    with _hashing_slots_lock:
+        concurrency = settings.PASSWORD_HASH_CONCURRENCY
+        if concurrency not in _hashing_slots:
+            _hashing_slots[concurrency] = threading.BoundedSemaphore(concurrency)
+        return _hashing_slots[concurrency]
+
+
+def off_thread_view(view):
+    '''Return an async view that runs the (sync) view in the thread pool, at most PASSWORD_HASH_CONCURRENCY at once.'''
+
+    def limited_view(request, *args, **kwargs):
+        try:
+            with hashing_slots():
+                return view(request, *args, **kwargs)
+        finally:
+            # (request_finished only closes the connections of the request's own thread)
+            close_old_connections()
+
+    @functools.wraps(view)
+    async def async_view(request, *args, **kwargs):
+        return await sync_to_async(limited_view, thread_sensitive=False)(request, *args, **kwargs)
+
+    assert not iscoroutinefunction(view)
+    return async_view
+
+
+login = off_thread_view(allauth_views.login)
+signup = off_thread_view(allauth_views.signup)
@@ -0,0 +1,134 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - common/admin.py
+
+Admin changelists for large tables (see accounts/admin.py CustomUserAdmin).
+
+- EstimatedCountPaginator counts with the database planner's estimate above ADMIN_ESTIMATED_COUNT_THRESHOLD rows
+  (PostgreSQL), in place of a COUNT(*) of the whole (filtered) table on every changelist page
+- KeysetChangeList pages through large (estimated) results by the last key of the page before
+  (WHERE key > last key ... LIMIT), in place of an OFFSET that reads (and throws away) every row before the page,
+  when the changelist is ordered by a unique field (e.g. the default ordering)
+- ScalableAdminMixin puts them together for a ModelAdmin
+'''
+import json
+
+from django.conf import settings
+from django.contrib.admin.views.main import ChangeList
+from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+KEYSET_VAR = 'after'
+
+
+def estimated_count(queryset):
+    '''Return the planner's estimate of the number of rows of queryset (None if not PostgreSQL).'''
+    if connections[queryset.db].vendor != 'postgresql':
+        return None
+    plan = queryset.order_by().explain(format='json')
+    return int(json.loads(plan)[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    '''A Paginator that counts with the planner's estimate (estimated is True), when it is above the threshold.
+
+    The count is kept on the queryset, so the paginators of one changelist's queryset count it once
+    (KeysetChangeList counts it before ChangeList.get_results makes its own paginator).
+    '''
+
+    estimated = False
+
+    @cached_property
+    def count(self):
+        counted = getattr(self.object_list, '_paginator_count', None)
+        if counted is None:
+            estimate = estimated_count(self.object_list)
+            if estimate is not None and estimate > settings.ADMIN_ESTIMATED_COUNT_THRESHOLD:
+                counted = (estimate, True)
+            else:
+                counted = (super().count, False)
+            self.object_list._paginator_count = counted
+        count, self.estimated = counted
+        return count
+
+
+class KeysetChangeList(ChangeList):
+    '''A ChangeList that pages by key (?after=<last key of the page before>) when the result count is estimated.
+
+    - keyset_field: the (unique) ordering field paged by (None when the results are paged by page number)
+    - keyset_first_url: the link to the first page (None on the first page)
+    - keyset_next_url: the link to the next page, after the last key of this page (None on the last page)
+    '''
+
+    keyset_field = None
+    keyset_first_url = None
+    keyset_next_url = None
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(KEYSET_VAR, None)
+        return lookup_params
+
+    def get_keyset_ordering(self):
+        '''Return (field name, descending) if the results are ordered by one unique field, otherwise None.'''
+        # (the ModelAdmin ordering may be repeated, e.g. from ModelAdmin.get_queryset)
+        ordering = list(dict.fromkeys(self.queryset.query.order_by))
+        if len(ordering) != 1 or not isinstance(ordering[0], str):
+            return None
+        name = ordering[0].lstrip('-')
+        if name == 'pk':
+            name = self.lookup_opts.pk.name
+        try:
+            field = self.lookup_opts.get_field(name)
+        except FieldDoesNotExist:
+            return None # e.g. an annotation
+        if not (field.primary_key or field.unique):
+            return None
+        return field.name, ordering[0].startswith('-')
+
+    def get_results(self, request):
+        # (not kept in the changelist's other links, e.g. the sort and filter links start again from the first page)
+        after = self.params.pop(KEYSET_VAR, None)
+        self.filter_params.pop(KEYSET_VAR, None)
+        keyset_ordering = self.get_keyset_ordering()
+        if keyset_ordering is None:
+            return super().get_results(request)
+        paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        result_count = paginator.count
+        if not getattr(paginator, 'estimated', False):
+            return super().get_results(request) # (an exact count below the threshold, paged by page number, not counted again)
+
+        field, descending = keyset_ordering
+        queryset = self.queryset
+        if after is not None:
+            queryset = queryset.filter(**{f'{field}__{"lt" if descending else "gt"}': after})
+        result_list = list(queryset[:self.list_per_page])
+        self.keyset_field = field
+        if after is not None:
+            self.keyset_first_url = self.get_query_string()
+        if len(result_list) == self.list_per_page:
+            self.keyset_next_url = self.get_query_string({KEYSET_VAR: getattr(result_list[-1], field)})
+        self.result_count = result_count
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.full_result_count = None
+        self.result_list = result_list
+        self.can_show_all = False
+        self.multi_page = True
+        self.paginator = paginator
+
+
+class ScalableAdminMixin:
+    '''ModelAdmin changelists with estimated counts and keyset paging for large tables.'''
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    change_list_template = 'admin/keyset_change_list.html'
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
@@ -0,0 +1,11 @@
+'''Common App (shared BaseModel functionality) Configuration'''
+from django.apps import AppConfig
+
+
+class CommonConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'common'
+
+    def ready(self):
+        import common.checks
+        import common.signals
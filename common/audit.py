@@ -0,0 +1,224 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - common/audit.py
+
+Batched writing of auditlog LogEntry records for BaseModel records.
+
+- build_log_entry builds an (unsaved) LogEntry, as auditlog's LogEntry.objects.log_create would
+- AuditlogBuffer collects LogEntry records and writes them with one bulk_create
+- buffered_auditlog is a context manager that makes BaseModel saves write their history through a buffer
+    (see: common/middleware.py BufferedAuditlogMiddleware for the request scoped buffer), abuffered_auditlog in async code
+- log_changes writes the history of many changes at once (e.g. for set based updates, see: common/cascade.py)
+- log_update replaces auditlog's pre_save receiver, skipping the saves of only fields that are not audited
+'''
+import contextlib
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import router, transaction
+from django.db.models.signals import pre_save
+from django.utils.encoding import smart_str
+from auditlog.cid import get_cid
+from auditlog.context import auditlog_disabled, disable_auditlog
+from auditlog import receivers
+from auditlog.models import LogEntry
+from auditlog.registry import auditlog
+from auditlog.signals import pre_log
+
+from common.metrics import record_auditlog_writes
+
+# the audit log buffer of the current request (or buffered_auditlog block), None if not buffering
+_audit_buffer = ContextVar('audit_buffer', default=None)
+# set while a buffered save has disabled auditlog's own receivers (so nested saves are still buffered)
+_buffered_save = ContextVar('buffered_save', default=False)
+
+
+def build_log_entry(instance, action, changes, actor=None, remote_addr=None):
+    '''Return an unsaved LogEntry for a change to instance, filled in as auditlog's LogEntry.objects.log_create does.'''
+    pk = LogEntry.objects._get_pk_value(instance)
+    try:
+        object_repr = smart_str(instance)
+    except ObjectDoesNotExist:
+        object_repr = '<error forming object repr>'
+    get_additional_data = getattr(instance, 'get_additional_data', None)
+    return LogEntry(
+        content_type=auditlog_content_type(type(instance)),
+        object_pk=pk,
+        object_id=pk if isinstance(pk, int) else None,
+        object_repr=object_repr,
+        serialized_data=LogEntry.objects._get_serialized_data_or_none(instance),
+        additional_data=get_additional_data() if callable(get_additional_data) else None,
+        action=action,
+        changes=changes,
+        actor=actor,
+        remote_addr=remote_addr,
+        cid=get_cid(),
+    )
+
+
+def auditlog_content_type(model):
+    '''Return the (cached) ContentType that auditlog uses for model's history.'''
+    return ContentType.objects.get_for_model(model)
+
+
+def auditlog_is_active(model):
+    '''Return True if changes to model are being logged (registered, and auditlog not disabled by the caller).'''
+    return auditlog.contains(model) and (not auditlog_disabled.get() or _buffered_save.get())
+
+
+def is_audited_update(model, update_fields):
+    '''Return True if saving model's update_fields (None for all fields) may write a history record.
+
+    False if model is not being logged, or every one of update_fields is left out of its history
+    (exclude_fields, or not in include_fields, when registered), e.g. the last_login update of a login.
+    '''
+    if not auditlog_is_active(model):
+        return False
+    if update_fields is None:
+        return True
+    model_fields = auditlog.get_model_fields(model)
+    include_fields = set(model_fields['include_fields'])
+    exclude_fields = set(model_fields['exclude_fields'])
+    for name in update_fields:
+        name = model._meta.get_field(name).name # (update_fields may hold attnames, e.g. user_id)
+        if (not include_fields or name in include_fields) and name not in exclude_fields:
+            return True
+    return False
+
+
+def log_update(sender, instance, **kwargs):
+    '''auditlog's pre_save receiver (log_update), except for a save of only update_fields that are not audited.
+
+    auditlog would read the old record to find there are no changes to log (e.g. the last_login update of each login),
+    this skips that for the instance being saved only (other saves, e.g. by its post_save receivers, are still logged).
+    '''
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and not is_audited_update(sender, update_fields):
+        return
+    receivers.log_update(sender, instance=instance, **kwargs)
+
+
+# connected by auditlog.register in place of its own log_update (this module is imported, through common/base_model.py,
+# before any model is registered), as the custom signals of an AuditlogModelRegistry are
+auditlog._signals[pre_save] = log_update
+
+
+class AuditlogBuffer:
+    '''Collects LogEntry records, and writes them to the database in batches (with bulk_create).
+
+    - entries added inside a transaction are only kept if the transaction commits (transaction.on_commit)
+    - committed entries are written when max_size of them are waiting (early flush), or on flush()
+    - actor and remote_addr are set on every entry (bulk_create skips auditlog's set_actor pre_save receiver)
+    '''
+
+    def __init__(self, actor=None, remote_addr=None, max_size=None):
+        self.actor = actor
+        self.remote_addr = remote_addr
+        self.max_size = max_size if max_size is not None else settings.AUDITLOG_BUFFER_SIZE
+        self.pending = []
+        self.flush_count = 0
+        self.written_count = 0
+
+    def add(self, instance, action, changes):
+        '''Build a LogEntry for a change to instance, to be written once the current transaction commits.
+
+        Note: as with auditlog, the entry is not made if a pre_log signal receiver returns False.
+        '''
+        pre_log_results = pre_log.send(type(instance), instance=instance, action=action)
+        if any(result is False for _receiver, result in pre_log_results):
+            return
+        log_entry = build_log_entry(instance, action, changes, actor=self.actor, remote_addr=self.remote_addr)
+        transaction.on_commit(lambda: self._committed(log_entry))
+
+    def _committed(self, log_entry):
+        self.pending.append(log_entry)
+        if len(self.pending) >= self.max_size:
+            self.flush()
+
+    def flush(self):
+        '''Write all of the committed (pending) entries with one bulk_create.'''
+        if self.pending:
+            log_entries, self.pending = self.pending, []
+            LogEntry.objects.bulk_create(log_entries)
+            record_auditlog_writes(len(log_entries))
+            self.flush_count += 1
+            self.written_count += len(log_entries)
+
+
+def log_changes(changes, batch_size=None):
+    '''Write the history records for many changes at once, a list of (instance, action, changes dictionary).
+
+    - through the audit log buffer if one is in use, otherwise with bulk_create in batches of batch_size
+      (default: settings.AUDITLOG_BUFFER_SIZE)
+    - changes without any changed fields are skipped, and as with auditlog a pre_log receiver can veto an entry
+    - LogEntry's pre_save signal is sent for each entry, so auditlog's set_actor fills in the actor and remote_addr
+      (as it does when an entry is saved)
+    '''
+    audit_buffer = get_audit_buffer()
+    log_entries = []
+    for instance, action, instance_changes in changes:
+        if not instance_changes:
+            continue
+        if audit_buffer is not None:
+            audit_buffer.add(instance, action, instance_changes)
+            continue
+        pre_log_results = pre_log.send(type(instance), instance=instance, action=action)
+        if any(result is False for _receiver, result in pre_log_results):
+            continue
+        log_entry = build_log_entry(instance, action, instance_changes)
+        pre_save.send(LogEntry, instance=log_entry, raw=False, using=router.db_for_write(LogEntry), update_fields=None)
+        log_entries.append(log_entry)
+    if log_entries:
+        LogEntry.objects.bulk_create(log_entries, batch_size=batch_size or settings.AUDITLOG_BUFFER_SIZE)
+        record_auditlog_writes(len(log_entries))
+
+
+def get_audit_buffer():
+    '''Return the audit log buffer in use (None if BaseModel history is being written directly by auditlog).'''
+    return _audit_buffer.get()
+
+
+@contextlib.contextmanager
+def buffered_auditlog(actor=None, remote_addr=None, max_size=None):
+    '''Write the history of BaseModel saves in this block through an AuditlogBuffer (flushed at the end of the block).
+
+    For Example:
+        with buffered_auditlog(actor=request.user) as buffer:
+            ... save BaseModel records ...
+    '''
+    buffer = AuditlogBuffer(actor=actor, remote_addr=remote_addr, max_size=max_size)
+    token = _audit_buffer.set(buffer)
+    try:
+        yield buffer
+    finally:
+        _audit_buffer.reset(token)
+        buffer.flush()
+
+
+@contextlib.asynccontextmanager
+async def abuffered_auditlog(actor=None, remote_addr=None, max_size=None):
+    '''buffered_auditlog for async code (e.g. async middleware), the buffer is written (flushed) in a thread.'''
+    buffer = AuditlogBuffer(actor=actor, remote_addr=remote_addr, max_size=max_size)
+    token = _audit_buffer.set(buffer)
+    try:
+        yield buffer
+    finally:
+        _audit_buffer.reset(token)
+        await sync_to_async(buffer.flush)()
+
+
+@contextlib.contextmanager
+def buffered_save():
+    '''Disable auditlog's own receivers while a BaseModel save is logged through the buffer.'''
+    token = _buffered_save.set(True)
+    try:
+        with disable_auditlog():
+            yield
+    finally:
+        _buffered_save.reset(token)
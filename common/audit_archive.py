@@ -0,0 +1,174 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - common/audit_archive.py
+
+Archives of old auditlog LogEntry records (detached monthly partitions, see common/partitions.py).
+
+- each archived partition is a gzip compressed JSONL file (one LogEntry row per line, by record and then oldest first),
+  written as a series of gzip members of about ARCHIVE_MEMBER_ROWS rows, each holding the whole history of its records
+- with a small JSON manifest of the number of history records per record ("<content type id>:<object pk>"),
+  and the (compressed) offset of the gzip member holding them
+- the manifests are read to count (and find) archived history without opening the archives, and a record's history
+  is read by decompressing only its own member
+- the archived history is replayed by rec_as_of / as_of for times without a checkpoint after it (see common/history.py)
+- see: python manage.py auditlog_partitions --help
+'''
+import datetime
+import gzip
+import json
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+from auditlog.models import LogEntry
+
+ARCHIVE_SUFFIX = '.jsonl.gz'
+MANIFEST_SUFFIX = '.manifest.json'
+# start a new gzip member (at the next record) after this many rows
+ARCHIVE_MEMBER_ROWS = 1000
+
+# the manifests read so far, by archive directory, kept until the directory changes
+_manifest_cache = {}
+
+
+def archive_dir():
+    '''Return the directory the auditlog archives are kept in (settings.AUDITLOG_ARCHIVE_DIR).'''
+    return Path(settings.AUDITLOG_ARCHIVE_DIR)
+
+
+def archive_key(content_type_id, object_pk):
+    '''Return the manifest key for a record's history.'''
+    return f'{content_type_id}:{object_pk}'
+
+
+def write_archive(partition, start, end):
+    '''Stream the rows of the partition (table) to a compressed JSONL archive, and write its manifest.
+
+    Returns the manifest (a dictionary), including the number of rows written.
+    '''
+    directory = archive_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    archive_path = directory / f'{partition}{ARCHIVE_SUFFIX}'
+    objects = {} # manifest key: [number of rows, offset of the gzip member holding them]
+    rows = 0
+    with open(f'{archive_path}.tmp', 'wb') as archive_file:
+        member = None
+        member_rows = 0
+        try:
+            # server side cursor, so the partition is not loaded into memory
+            with connection.chunked_cursor() as cursor:
+                cursor.execute(
+                    f'SELECT row_to_json(entry)::text, content_type_id, object_pk FROM {partition} entry '
+                    f'ORDER BY content_type_id, object_pk, "timestamp", id'
+                )
+                for row_json, content_type_id, object_pk in cursor:
+                    key = archive_key(content_type_id, object_pk)
+                    if key not in objects:
+                        if member is None or member_rows >= ARCHIVE_MEMBER_ROWS:
+                            if member is not None:
+                                member.close()
+                            member_offset = archive_file.tell()
+                            member = gzip.GzipFile(fileobj=archive_file, mode='wb')
+                            member_rows = 0
+                        objects[key] = [0, member_offset]
+                    member.write(row_json.encode('utf-8') + b'\n')
+                    objects[key][0] += 1
+                    member_rows += 1
+                    rows += 1
+        finally:
+            if member is not None:
+                member.close()
+    os.replace(f'{archive_path}.tmp', archive_path)
+    manifest = {
+        'partition': partition,
+        'archive': archive_path.name,
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'rows': rows,
+        'objects': objects,
+    }
+    manifest_path = directory / f'{partition}{MANIFEST_SUFFIX}'
+    with open(f'{manifest_path}.tmp', 'w', encoding='utf-8') as manifest_file:
+        json.dump(manifest, manifest_file)
+    os.replace(f'{manifest_path}.tmp', manifest_path)
+    return manifest
+
+
+def remove_archive(manifest):
+    '''Remove an archive and its manifest (e.g. when its partition could not be dropped).'''
+    directory = archive_dir()
+    for name in (manifest['archive'], f"{manifest['partition']}{MANIFEST_SUFFIX}"):
+        (directory / name).unlink(missing_ok=True)
+
+
+def archive_manifests():
+    '''Return the manifests of all of the archives, latest first (cached until the archive directory changes).'''
+    directory = archive_dir()
+    try:
+        modified = directory.stat().st_mtime_ns
+    except FileNotFoundError:
+        return []
+    cached = _manifest_cache.get(directory)
+    if cached is None or cached[0] != modified:
+        manifests = []
+        for manifest_path in directory.glob(f'*{MANIFEST_SUFFIX}'):
+            with open(manifest_path, encoding='utf-8') as manifest_file:
+                manifests.append(json.load(manifest_file))
+        manifests.sort(key=lambda manifest: manifest['from'], reverse=True)
+        cached = (modified, manifests)
+        _manifest_cache[directory] = cached
+    return cached[1]
+
+
+def archived_history_count(content_type_id, object_pk):
+    '''Return the number of archived history records for a record (from the manifests only).'''
+    key = archive_key(content_type_id, object_pk)
+    return sum(manifest_rows(manifest, key)[0] for manifest in archive_manifests())
+
+
+def manifest_rows(manifest, key):
+    '''Return (the number of archived rows, the offset of the gzip member holding them) of a record in an archive.'''
+    entry = manifest['objects'].get(key, 0)
+    return (entry, 0) if isinstance(entry, int) else tuple(entry)
+
+
+def archived_history(content_type_id, object_pk):
+    '''Return the archived history of a record, as a list of unsaved LogEntry records (latest first).
+
+    Only the archives whose manifest lists the record are read, from the gzip member holding the record's rows.
+    '''
+    key = archive_key(content_type_id, object_pk)
+    object_pk = str(object_pk)
+    log_entries = []
+    for manifest in archive_manifests():
+        count, offset = manifest_rows(manifest, key)
+        if not count:
+            continue
+        entries = []
+        with open(archive_dir() / manifest['archive'], 'rb') as archive_file:
+            archive_file.seek(offset)
+            with gzip.GzipFile(fileobj=archive_file, mode='rb') as archive:
+                for line in archive:
+                    row = json.loads(line)
+                    if row['content_type_id'] == content_type_id and row['object_pk'] == object_pk:
+                        entries.append(LogEntry(
+                            id=row['id'],
+                            content_type_id=row['content_type_id'],
+                            object_pk=row['object_pk'],
+                            object_id=row['object_id'],
+                            object_repr=row['object_repr'],
+                            action=row['action'],
+                            changes=row['changes'],
+                            changes_text=row['changes_text'],
+                            actor_id=row['actor_id'],
+                            timestamp=datetime.datetime.fromisoformat(row['timestamp']),
+                        ))
+                        if len(entries) == count:
+                            break
+        entries.sort(key=lambda entry: (entry.timestamp, entry.id))
+        log_entries.extend(reversed(entries))
+    return log_entries
@@ -6,14 +6,33 @@ Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
 https://github.com/tayloredwebsites/healthy-meals - healthy_meals/base_model.py
 '''
 
-from django.db import models
+import logging
+from collections import namedtuple
+from django.db import models, router
+from django.db.models.signals import class_prepared
+from django.dispatch import receiver
 from safedelete.models import SafeDeleteModel
 from safedelete.models import SOFT_DELETE_CASCADE
+from safedelete.config import DELETED_BY_CASCADE_FIELD_NAME, FIELD_NAME
 from safedelete.managers import SafeDeleteManager
+from common.managers import BaseModelManager, BaseModelAllManager, BaseModelDeletedManager
+from common.history import rebuild_as_of
+from common.audit import auditlog_content_type, auditlog_is_active, buffered_save, get_audit_buffer, is_audited_update
+from common.audit_archive import archived_history, archived_history_count
+from common.cascade import soft_delete_cascade, undelete_cascade
+from common.indexes import add_soft_delete_indexes, check_soft_delete_lookups
+from common.routers import pin_database, pinned_database
 from auditlog.registry import auditlog
-from auditlog.models import AuditlogHistoryField
+from auditlog.models import AuditlogHistoryField, LogEntry
+from auditlog.diff import model_instance_diff
 from django.utils import timezone
 
+logger = logging.getLogger(__name__)
+
+HistorySnapshotEntry = namedtuple('HistorySnapshotEntry', ['timestamp', 'action', 'actor_id', 'changes'])
+HistorySnapshotEntry.__doc__ = '''One (parsed) auditlog history record for a BaseModel record, as held in the history snapshot.'''
+
+
 class BaseModel(SafeDeleteModel):
     """ BaseModel is abstract class to base all models in this project
 
@@ -26,16 +45,37 @@ class BaseModel(SafeDeleteModel):
     Note: The customized functions for soft deletion are only found in model manager classes
     Thus??: to use the methods found in 'objects', their models must declare their custom manager based off of SafeDeleteManager (This should be validated!!!)
     See: accounts/models.py for an example
+    Note: BaseModel declares 'objects', 'all_objects' and 'deleted_objects' using BaseModelManager (see common/managers.py)
+        - custom managers should mix in BaseModelManager (a SafeDeleteManager), as CustomUserManager does
 
     - all_with_deleted() # Show all model records including the soft deleted models.
     - deleted_only() # Only show the soft deleted model records.
     - all(**kwargs) -> django.db.models.query.QuerySet # Show deleted model records. (default: {None})
     - update_or_create(defaults=None, **kwargs) -> Tuple[django.db.models.base.Model, bool] # https://django-safedelete.readthedocs.io/en/latest/managers.html#safedelete.managers.SafeDeleteManager.update_or_create
+    - with_history_stats() # annotate history count, last change timestamp and last actor in the same query
+    - bulk_create() and bulk_update() # normalised (see bulk_normalize) and with history records written in batches
+    - soft_delete_lookups # the lookup keys of the model, indexed only for records that are not soft deleted
+        - e.g. soft_delete_lookups = [Upper('email'), ('last_name', 'first_name')], see common/indexes.py
+    - soft_delete_unique # the lookup keys that are unique among the records that are not soft deleted (also indexed)
+        - e.g. soft_delete_unique = [Upper('email')], see common/indexes.py
+    - soft_delete_retention # how long soft deleted records are kept, before purge_soft_deleted hard deletes them
+        - e.g. soft_delete_retention = datetime.timedelta(days=365), see common/retention.py
+    - delete() and undelete() (of records and querysets) cascade a table at a time, see common/cascade.py
+        - one UPDATE per related table, and the history records written in batches
 
     AUDITLOG VERSIONING HISTORY FUNCTIONALITY
     - has record history / versioning through django-auditlog (https://github.com/jazzband/django-auditlog)
         - this provides the ability to see all of the changes to fields (except fields excluded when registered in the model)
         - see: https://django-auditlog.readthedocs.io/en/latest/usage.html
+    - rec_history_* accessors read from a per instance history snapshot (see rec_history)
+        - loaded with one query on first use, and dropped on save, soft delete, undelete and refresh_from_db
+        - read from the database the record came from, with a read replica (see rec_history_using, common/routers.py)
+        - history older than the (partitioned) LogEntry table holds is read from the auditlog archives when asked for
+            - see: common/audit_archive.py and python manage.py auditlog_partitions
+    - saves inside a request (with AUDITLOG_BUFFERED) or a buffered_auditlog block write their history in batches
+        - see: common/audit.py and common/middleware.py
+    - rec_as_of(when) rebuilds the record's (audited) field values as they were at a point in time
+        - objects.as_of(when) does the same for many records at once (see common/history.py)
     Note: To register auditlog to automatically log all changes to a model, it must be registered in the model
     To register auditlog, the last line of the model should have the auditlog.register statement.
     For Example (as can be seen in accounts/models.py): 
@@ -49,39 +89,204 @@ class BaseModel(SafeDeleteModel):
     history = AuditlogHistoryField() # audit log to maintain record history
     _safedelete_policy = SOFT_DELETE_CASCADE # cascade soft deletes of records as well as child records.
 
+    # lookup keys to index "WHERE deleted IS NULL" (added to Meta indexes, see common/indexes.py)
+    soft_delete_lookups = ()
+    # lookup keys that are unique "WHERE deleted IS NULL" (added to Meta constraints, see common/indexes.py)
+    soft_delete_unique = ()
+    # how long to keep soft deleted records before they are purged (a timedelta, None: keep them, see common/retention.py)
+    soft_delete_retention = None
+
+    objects = BaseModelManager()
+    all_objects = BaseModelAllManager()
+    deleted_objects = BaseModelDeletedManager()
+
     class Meta:
         abstract = True
 
+    @classmethod
+    def bulk_normalize(cls, instances):
+        '''Normalise field values of the (unsaved) instances, and return the names of the fields it sets.
+
+        - run by the bulk_create and bulk_update of BaseModel managers (which do not send save signals)
+        - models should also run it from their save (pre_save) normalisation, so both give the same results
+        - e.g. CustomUser sets username to email (see accounts/signals.py)
+        '''
+        return []
+
+    @classmethod
+    def check(cls, **kwargs):
+        '''Run the model checks, including that the soft_delete_lookups and soft_delete_unique name fields of this model.'''
+        return [*super().check(**kwargs), *check_soft_delete_lookups(cls)]
+
+    # per instance cache of this record's history (see rec_history), reset by save, delete, undelete and refresh_from_db
+    _rec_history_snapshot = None
+    # per instance cache of this record's archived history (see rec_history_archived)
+    _rec_history_archived = None
+
+    def save(self, *args, **kwargs):
+        '''Save the record, and drop the (now stale) history snapshot.
+
+        Note: soft deletes and undeletes are done through save, so they also drop the history snapshot.
+        Note: when an audit log buffer is in use (see common/audit.py), the history record is added to the buffer
+        instead of being inserted by auditlog during the save.
+        Note: a save of only update_fields that are not audited (e.g. last_login on each login) skips auditlog's
+        diff of this record (see common/audit.py log_update), which would read the old record to find no changes.
+        '''
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and not is_audited_update(type(self), update_fields):
+            return super().save(*args, **kwargs)
+        try:
+            audit_buffer = get_audit_buffer()
+            if audit_buffer is None or not auditlog_is_active(type(self)):
+                return super().save(*args, **kwargs)
+            return self.__buffered_save(audit_buffer, *args, **kwargs)
+        finally:
+            self.rec_history_reset()
+
+    def __buffered_save(self, audit_buffer, *args, **kwargs):
+        '''Save the record with auditlog's receivers disabled, and add its history record to audit_buffer.
+
+        The changes are worked out as auditlog does them:
+        - updates are compared to the (non deleted) database record before the save, for the update_fields if given
+        - creates are compared to nothing, after the save
+        '''
+        adding = self._state.adding
+        changes = None
+        if not adding:
+            old = type(self).objects.filter(pk=self.pk).first()
+            changes = model_instance_diff(old, self, fields_to_check=kwargs.get('update_fields'))
+        with buffered_save():
+            result = super().save(*args, **kwargs)
+        if adding:
+            changes = model_instance_diff(None, self)
+        if changes:
+            audit_buffer.add(self, LogEntry.Action.CREATE if adding else LogEntry.Action.UPDATE, changes)
+        return result
+
+    def delete(self, *args, **kwargs):
+        '''Delete the record (using the safedelete policy), and drop the (now stale) history snapshot.'''
+        try:
+            return super().delete(*args, **kwargs)
+        finally:
+            self.rec_history_reset()
+
+    def soft_delete_cascade_policy_action(self, **kwargs):
+        '''Soft delete the record and its related records a table at a time (in place of safedelete's record at a time).'''
+        result = soft_delete_cascade(type(self), [self.pk], using=kwargs.get('using'))
+        self.refresh_from_db(fields=[FIELD_NAME, DELETED_BY_CASCADE_FIELD_NAME, 'updated'])
+        return result
+
+    def undelete(self, force_policy=None, **kwargs):
+        '''Undelete the record, and the related records soft deleted with it, a table at a time (SOFT_DELETE_CASCADE).'''
+        if (force_policy or self._safedelete_policy) != SOFT_DELETE_CASCADE:
+            return super().undelete(force_policy=force_policy, **kwargs)
+        result = undelete_cascade(type(self), [self.pk], using=kwargs.get('using'))
+        self.refresh_from_db(fields=[FIELD_NAME, DELETED_BY_CASCADE_FIELD_NAME, 'updated'])
+        return result
+
+    def refresh_from_db(self, *args, **kwargs):
+        '''Reload the record from the database, and drop the (possibly stale) history snapshot.'''
+        super().refresh_from_db(*args, **kwargs)
+        self.rec_history_reset()
+
+    def rec_history(self):
+        '''Return the history snapshot for this record, a tuple of HistorySnapshotEntry (latest first).
+
+        - the history is loaded with one query and the changes are parsed once, the first time it is needed
+        - it is then held on this instance until the record is saved, (soft) deleted, undeleted or refreshed
+        - all of the rec_history_* accessors read from this snapshot
+        '''
+        if self._rec_history_snapshot is None:
+            self._rec_history_snapshot = tuple(
+                HistorySnapshotEntry(rec.timestamp, rec.action, rec.actor_id, rec.changes_dict)
+                for rec in self.history.all().using(self.rec_history_using()).only(
+                    'timestamp', 'action', 'actor_id', 'changes', 'changes_text',
+                )
+            )
+        return self._rec_history_snapshot
+
+    def rec_history_using(self):
+        '''Return the database the rec_history_* accessors (and rec_as_of) read this record's history from.
+
+        - the database reads are pinned to (see common/routers.py pin_database), if they are
+        - else the database the record was read from (or saved to), so a record just saved (to the primary)
+          reads its new history from the primary, not from a read replica that may not have it yet
+        '''
+        return pinned_database() or self._state.db or router.db_for_read(LogEntry)
+
+    def rec_history_reset(self):
+        '''Drop the history snapshot for this record, so the next rec_history_* call reloads it.'''
+        self._rec_history_snapshot = None
+        self._rec_history_archived = None
+
+    def rec_history_archived_count(self):
+        '''Return the number of this record's history records that have been archived (read from the manifests).'''
+        return archived_history_count(auditlog_content_type(type(self)).pk, self.pk)
+
+    def rec_history_archived(self):
+        '''Return this record's archived history, a tuple of HistorySnapshotEntry (latest first, older than rec_history).
+
+        - read from the archive files the first time it is needed, then held on this instance as rec_history is
+        '''
+        if self._rec_history_archived is None:
+            self._rec_history_archived = tuple(
+                HistorySnapshotEntry(rec.timestamp, rec.action, rec.actor_id, rec.changes_dict)
+                for rec in archived_history(auditlog_content_type(type(self)).pk, self.pk)
+            )
+        return self._rec_history_archived
+
+    def __history_rec(self, user_rec):
+        '''Return the user_rec'th history record (latest first), from the archived history if it is older than rec_history.'''
+        history = self.rec_history()
+        if (user_rec < 0 or user_rec >= len(history)) and self.rec_history_archived_count():
+            history = history + self.rec_history_archived()
+        return history[user_rec]
+
+    def rec_as_of(self, when):
+        '''Return this record's field values (as stored in the auditlog) as of the time 'when'.
+
+        - returns None if the record did not exist at that time
+        - fields excluded from the auditlog (e.g. password) are not included
+        - see: common/history.py rebuild_as_of
+        '''
+        with pin_database(self.rec_history_using()):
+            return rebuild_as_of(type(self), [self.pk], when)[self.pk]
 
     def rec_history_count(self):
-        '''Return the count of all of the history records for this user.'''
-        return self.history.all().count()
+        '''Return the count of all of the history records for this user (including archived history).'''
+        return len(self.rec_history()) + self.rec_history_archived_count()
 
     def rec_history_field_was(self, user_rec, field_name):
         '''Return a dictionary of the previous values for this field, for this record.'''
-        rec = self.history.all()[user_rec]
-        return self.__get_field_changes(rec,field_name)[0]
+        return self.__get_field_changes(self.__history_rec(user_rec), field_name)[0]
 
     def rec_history_field_is_now(self, user_rec, field_name):
         '''Return the latest history record value for this field (should be identical to current field value)'''
-        rec = self.history.all()[user_rec]
-        return self.__get_field_changes(rec,field_name)[1]
+        return self.__get_field_changes(self.__history_rec(user_rec), field_name)[1]
 
     def rec_history_field_changed(self, user_rec, field_name):
         '''Return the number of records that are maintained in CustomUser's history table.'''
-        rec = self.history.all()[user_rec]
-        changes = self.__get_field_changes(rec,field_name)
+        changes = self.__get_field_changes(self.__history_rec(user_rec), field_name)
         # print(f'changes: {changes}')
         return changes[0] != changes[1]
 
     def __get_field_changes(self, hist_rec, field_name):
         '''Return a dictionary of the history for this record's field values.'''
         try:
-            changes = hist_rec.changes_dict[field_name]
+            changes = hist_rec.changes[field_name]
             # print(f'changes: {changes}')
             return changes
         except KeyError as e:
             # there was no change, audit log does not log values that do not change, so return array of None strings
-            print(f'expected key error auditlog - no changes for field: {e}')
+            logger.debug(
+                'expected key error auditlog - no changes for field',
+                extra={'event': 'history.field_unchanged', 'field': str(e)},
+            )
             return ['None', 'None']
 
+
+@receiver(class_prepared)
+def add_base_model_indexes(sender, **kwargs):
+    '''Add the soft delete indexes (see common/indexes.py) to each BaseModel model as it is created.'''
+    if issubclass(sender, BaseModel):
+        add_soft_delete_indexes(sender)
@@ -0,0 +1,67 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - common/cache.py
+
+Django cache backends that count their hits and misses in the request metrics (see common/metrics.py).
+
+Use these in settings.CACHES in place of the Django backends of the same name, e.g.
+    "BACKEND": "common.cache.RedisCache",
+'''
+from contextvars import ContextVar
+
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache.backends import db, filebased, locmem, redis
+
+from common.metrics import record_cache_lookup
+
+# set while get_many runs (its default implementation calls get for each key, which should not be counted twice)
+_in_get_many = ContextVar('in_get_many', default=False)
+_missing = object()
+
+
+class MetricsCacheMixin:
+    '''Count cache get and get_many lookups as hits or misses.'''
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _missing, version=version)
+        if not _in_get_many.get():
+            record_cache_lookup(hits=int(value is not _missing), misses=int(value is _missing))
+        return default if value is _missing else value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        token = _in_get_many.set(True)
+        try:
+            values = super().get_many(keys, version=version)
+        finally:
+            _in_get_many.reset(token)
+        record_cache_lookup(hits=len(values), misses=len(keys) - len(values))
+        return values
+
+
+class LocMemCache(MetricsCacheMixin, locmem.LocMemCache):
+    pass
+
+
+class FileBasedCache(MetricsCacheMixin, filebased.FileBasedCache):
+    pass
+
+
+class DatabaseCache(MetricsCacheMixin, db.DatabaseCache):
+    pass
+
+
+class RedisCache(MetricsCacheMixin, redis.RedisCache):
+    pass
+
+
+def cache_is_shared(alias=DEFAULT_CACHE_ALIAS):
+    '''Return True if the cache is shared by the server processes (not a per process local memory cache).
+
+    Data that one process changes (or deletes) and others must see at once, e.g. the user cache
+    (accounts/user_cache.py), needs a shared cache.
+    '''
+    return not isinstance(caches[alias], locmem.LocMemCache)
@@ -0,0 +1,247 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - common/cascade.py
+
+Set based (bulk) cascading soft delete and undelete, for the SOFT_DELETE_CASCADE policy of BaseModel.
+
+safedelete walks the related records with NestedObjects, and soft deletes (saves) them one at a time. These do the
+same work a table at a time:
+- related records are found a foreign key at a time, following each foreign key's on_delete rule as Django does
+  (CASCADE is followed, PROTECT and RESTRICT stop a delete, SET_NULL, SET_DEFAULT and SET are applied)
+- each table is changed with one UPDATE, and the history records are written in batches (see: common/audit.py)
+- pre_softdelete, post_softdelete and post_undelete signals are sent for each record,
+  but (as with QuerySet.update) the records are not saved, so pre_save and post_save are not sent
+'''
+import copy
+from collections import Counter
+from itertools import chain
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import router, transaction
+from django.db.models import DO_NOTHING, ProtectedError
+from django.db.models.deletion import get_candidate_relations_to_delete
+from django.utils import timezone
+from auditlog.diff import model_instance_diff
+from auditlog.models import LogEntry
+from safedelete.config import DELETED_BY_CASCADE_FIELD_NAME, FIELD_NAME
+from safedelete.models import is_safedelete_cls
+from safedelete.signals import post_softdelete, post_undelete, pre_softdelete
+
+from common.audit import auditlog_is_active, log_changes
+
+
+class RelationCollector:
+    '''Stands in for Django's deletion Collector, to record what a foreign key's on_delete rule asks for.'''
+
+    def __init__(self):
+        self.cascaded = False
+        self.field_updates = []
+        self.protected = []
+
+    def collect(self, sub_objs, **kwargs):
+        self.cascaded = True
+
+    def add_field_update(self, field, value, sub_objs):
+        self.field_updates.append((field, value, sub_objs))
+
+    def add_restricted_objects(self, field, sub_objs):
+        self.protected.append(sub_objs)
+
+    def add_dependency(self, model, dependency, **kwargs):
+        pass
+
+
+def has_cascade_field(model):
+    '''Return True if model keeps the deleted_by_cascade field (safedelete models may remove it).'''
+    try:
+        model._meta.get_field(DELETED_BY_CASCADE_FIELD_NAME)
+    except FieldDoesNotExist:
+        return False
+    return True
+
+
+def collect_related(model, pks, using):
+    '''Return the records that a cascading delete of model's records (pks) reaches, by following their foreign keys.
+
+    Returns (records, collector):
+    - records: a dictionary of model to the set of pks reached (including the starting records)
+    - collector: the RelationCollector with the field updates and the protected records
+    '''
+    collector = RelationCollector()
+    records = {}
+    pending = [(model, set(pks))]
+    while pending:
+        model, pks = pending.pop()
+        pks = pks - records.setdefault(model, set())
+        if not pks:
+            continue
+        records[model] |= pks
+        for related in get_candidate_relations_to_delete(model._meta):
+            field = related.field
+            on_delete = field.remote_field.on_delete
+            if on_delete is DO_NOTHING:
+                continue
+            sub_objs = related.related_model._base_manager.using(using).filter(**{f'{field.name}__in': pks})
+            if getattr(on_delete, 'lazy_sub_objs', False):
+                on_delete(collector, field, sub_objs, using) # field updates, applied with one UPDATE
+                continue
+            sub_pks = set(sub_objs.values_list('pk', flat=True))
+            if not sub_pks:
+                continue
+            collector.cascaded = False
+            try:
+                on_delete(collector, field, sub_objs, using)
+            except ProtectedError as error:
+                collector.protected.append(error.protected_objects)
+            if collector.cascaded:
+                pending.append((related.related_model, sub_pks))
+    return records, collector
+
+
+def changed_records(model, pks, values, now, using):
+    '''Return the (old, new) records for setting values on model's records (pks) at the time now, without saving them.
+
+    - old is the record as auditlog compares against (None if it is not visible through model.objects)
+    - new is a copy of the record with the values set
+    Also returns the auto_now field values (set on the new records by apply_changes, as a save would).
+    '''
+    auto_now = {field.attname: now for field in model._meta.concrete_fields if getattr(field, 'auto_now', False)}
+    changes = []
+    for old in model._base_manager.using(using).filter(pk__in=pks).order_by('pk'):
+        new = copy.copy(old)
+        for attname, value in values.items():
+            setattr(new, attname, value)
+        changes.append((old if getattr(old, FIELD_NAME) is None else None, new))
+    return changes, auto_now
+
+
+def apply_changes(model, changes, values, auto_now, using):
+    '''Update model's changed records with one UPDATE, and log their history records in batches.
+
+    Note: as auditlog logs a save's changes before the auto_now fields are set, they are not in the history records.
+    '''
+    model._base_manager.using(using).filter(pk__in=[new.pk for _old, new in changes]).update(**values, **auto_now)
+    if auditlog_is_active(model):
+        log_changes([
+            (new, LogEntry.Action.UPDATE, model_instance_diff(old, new))
+            for old, new in changes
+        ])
+    for _old, new in changes:
+        for attname, value in auto_now.items():
+            setattr(new, attname, value)
+
+
+def soft_delete_cascade(model, pks, using=None):
+    '''Soft delete model's records (pks), and cascade the soft delete to their related records, a table at a time.
+
+    As safedelete's SOFT_DELETE_CASCADE policy:
+    - raises ProtectedError if any (not soft deleted) record is protected from the delete
+    - the records are soft deleted, and the related records that were not already soft deleted are soft deleted
+      with deleted_by_cascade set (so they are undeleted with their parent)
+    - the SET_NULL, SET_DEFAULT and SET foreign key updates are made
+    - returns (count, {model label: count}) of the soft deleted records
+    '''
+    using = using or router.db_for_write(model)
+    pks = set(pks)
+    with transaction.atomic(using=using):
+        records, collector = collect_related(model, pks, using)
+        protected = [
+            obj for obj in chain.from_iterable(collector.protected)
+            if getattr(obj, FIELD_NAME, None) is None
+        ]
+        if protected:
+            raise ProtectedError(
+                'Cannot delete some instances of model %r because they are '
+                'referenced through protected foreign keys: %s.' % (
+                    model.__name__,
+                    ', '.join(sorted({obj.__class__.__name__ for obj in protected})),
+                ),
+                set(protected),
+            )
+
+        now = timezone.now()
+        deleted_counter = Counter()
+        for related_model, related_pks in records.items():
+            if not is_safedelete_cls(related_model):
+                continue
+            # the starting records are always (re)deleted, the related records only if not already soft deleted
+            related_pks = list(related_pks - pks) if related_model is model else list(related_pks)
+            if related_pks:
+                values = {FIELD_NAME: now}
+                if has_cascade_field(related_model):
+                    values[DELETED_BY_CASCADE_FIELD_NAME] = True
+                changes, auto_now = changed_records(related_model, related_pks, values, now, using)
+                changes = [(old, new) for old, new in changes if old is not None]
+                soft_delete_changes(related_model, changes, values, auto_now, using, deleted_counter)
+        if pks:
+            values = {FIELD_NAME: now}
+            changes, auto_now = changed_records(model, pks, values, now, using)
+            soft_delete_changes(model, changes, values, auto_now, using, deleted_counter)
+
+        for field, value, sub_objs in collector.field_updates:
+            sub_objs.update(**{field.name: value})
+    return sum(deleted_counter.values()), dict(deleted_counter)
+
+
+def soft_delete_changes(model, changes, values, auto_now, using, deleted_counter):
+    '''Soft delete model's changed records, sending the pre_softdelete and post_softdelete signals for each.'''
+    if not changes:
+        return
+    for _old, new in changes:
+        pre_softdelete.send(sender=model, instance=new, using=using)
+    apply_changes(model, changes, values, auto_now, using)
+    for _old, new in changes:
+        post_softdelete.send(sender=model, instance=new, using=using)
+    deleted_counter[model._meta.label] += len(changes)
+
+
+def undelete_cascade(model, pks, using=None):
+    '''Undelete model's (soft deleted) records (pks), and the related records that were soft deleted with them.
+
+    As safedelete's SOFT_DELETE_CASCADE policy:
+    - the records must be soft deleted (AssertionError if not)
+    - the cascade only follows related records with deleted_by_cascade set
+    - returns (count, {model label: count}) of the undeleted records
+    '''
+    using = using or router.db_for_write(model)
+    with transaction.atomic(using=using):
+        pks = set(pks)
+        assert not model._base_manager.using(using).filter(pk__in=pks, **{f'{FIELD_NAME}__isnull': True}).exists()
+
+        # the records deleted by cascade (and so to be undeleted with their parents)
+        records = {}
+        pending = [(model, set(pks))]
+        while pending:
+            parent_model, parent_pks = pending.pop()
+            parent_pks = parent_pks - records.setdefault(parent_model, set())
+            if not parent_pks:
+                continue
+            records[parent_model] |= parent_pks
+            for related in get_candidate_relations_to_delete(parent_model._meta):
+                related_model = related.related_model
+                if not (is_safedelete_cls(related_model) and has_cascade_field(related_model)):
+                    continue
+                sub_pks = set(related_model._base_manager.using(using).filter(**{
+                    f'{related.field.name}__in': parent_pks, DELETED_BY_CASCADE_FIELD_NAME: True,
+                }).values_list('pk', flat=True))
+                if sub_pks:
+                    pending.append((related_model, sub_pks))
+
+        now = timezone.now()
+        undeleted_counter = Counter()
+        for related_model, related_pks in records.items():
+            values = {FIELD_NAME: None}
+            if has_cascade_field(related_model):
+                values[DELETED_BY_CASCADE_FIELD_NAME] = False
+            changes, auto_now = changed_records(related_model, related_pks, values, now, using)
+            # only soft deleted records are undeleted (auditlog compares them to nothing, as they are not visible)
+            changes = [(old, new) for old, new in changes if old is None]
+            if changes:
+                apply_changes(related_model, changes, values, auto_now, using)
+                for _old, new in changes:
+                    post_undelete.send(sender=related_model, instance=new, using=using)
+                undeleted_counter[related_model._meta.label] += len(changes)
+    return sum(undeleted_counter.values()), dict(undeleted_counter)
@@ -0,0 +1,88 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - common/checks.py
+
+System checks for BaseModel models, the serving mode and the cache (registered in common/apps.py).
+'''
+from django.apps import apps
+from django.conf import settings
+from django.core import checks
+from django.utils.module_loading import import_string
+
+from common.cache import cache_is_shared
+from common.indexes import missing_soft_delete_indexes
+
+
+@checks.register(checks.Tags.database)
+def check_soft_delete_indexes(app_configs=None, databases=None, **kwargs):
+    '''Warn about soft delete indexes (see common/indexes.py) that are not in the database.
+
+    As a database check, this is only run by: python manage.py check --database default (and by migrate).
+    '''
+    from common.base_model import BaseModel
+    if not databases or 'default' not in databases:
+        return []
+    configs = app_configs or apps.get_app_configs()
+    models = [
+        model for app_config in configs for model in app_config.get_models()
+        if issubclass(model, BaseModel)
+    ]
+    return [
+        checks.Warning(
+            f"The soft delete index '{index_name}' is not in the database.",
+            hint='Run makemigrations and migrate.',
+            obj=model,
+            id='common.W001',
+        )
+        for model, index_name in missing_soft_delete_indexes(models)
+    ]
+
+
+@checks.register()
+def check_async_middleware(app_configs=None, **kwargs):
+    '''Warn about middleware that is not async capable, when serving with ASGI (settings.SERVER_MODE 'asgi').
+
+    Django runs sync only middleware in a thread, so each request switches between the event loop and a thread
+    (and back) around it, and the middleware and views below it.
+    '''
+    if settings.SERVER_MODE != 'asgi':
+        return []
+    return [
+        checks.Warning(
+            f"The middleware '{middleware_path}' is not async capable.",
+            hint='Under ASGI each request switches to a thread (and back) around it, leave it out if it is not needed.',
+            obj=middleware_path,
+            id='common.W002',
+        )
+        for middleware_path in settings.MIDDLEWARE
+        if not getattr(import_string(middleware_path), 'async_capable', False)
+    ]
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_cache(app_configs=None, **kwargs):
+    '''Warn about (or refuse) data kept in a cache that is not shared by the server processes (a local memory cache).
+
+    What one process changes or deletes in such a cache is not seen by the others, e.g. a user deactivated (or whose
+    password changed) would stay logged in with the other processes until their cached copy expires, and a session
+    logged out (or flushed) in one process would stay valid in the others (so cached_db sessions are an error).
+    '''
+    messages = []
+    if settings.SESSION_ENGINE == 'common.sessions.cached_db' and not cache_is_shared(settings.SESSION_CACHE_ALIAS):
+        messages.append(checks.Error(
+            "SESSION_MODE is 'cached_db', but the cache is local to each server process.",
+            hint="Use a shared CACHE_BACKEND (e.g. common.cache.RedisCache), or set SESSION_MODE='db'.",
+            id='common.E002',
+        ))
+    if cache_is_shared():
+        return messages
+    if settings.USER_CACHE_TIMEOUT:
+        messages.append(checks.Warning(
+            'USER_CACHE_TIMEOUT is set, but the cache is local to each server process.',
+            hint='Use a shared CACHE_BACKEND (e.g. common.cache.RedisCache), or set USER_CACHE_TIMEOUT=0.',
+            id='common.W003',
+        ))
+    return messages
@@ -0,0 +1,26 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - common/context_processors.py
+'''
+from django.conf import settings
+from django.utils.functional import cached_property
+
+from common.page_cache import page_cache_version
+
+
+class PageCacheContext:
+    '''The timeout and version for the {% cache %} fragments of templates (the version is only read if used).'''
+
+    timeout = property(lambda self: settings.PAGE_CACHE_TIMEOUT)
+
+    @cached_property
+    def version(self):
+        return page_cache_version()
+
+
+def page_cache(request):
+    '''Add page_cache (see common/page_cache.py) to the template context.'''
+    return {'page_cache': PageCacheContext()}
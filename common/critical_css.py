@@ -0,0 +1,80 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - common/critical_css.py
+
+Critical (above the fold) css of the _base.html layout, inlined in its head (see templates/_base.html),
+so the page is drawn without waiting for the (then asynchronously loaded) stylesheet.
+
+- the critical css is the rules of the stylesheet whose selectors match an element of a rendered layout page
+  (a page with an (almost) empty page_body, e.g. pages/home.html), and the @media blocks of them
+- it is built with python manage.py critical_css (see nox -s setupEnv), after the scss is compiled
+- the css parsing is simple (comments, rules, statements and nested at-rule blocks), enough for the site's own css
+'''
+import re
+
+from bs4 import BeautifulSoup
+from rcssmin import cssmin
+from soupsieve import SelectorSyntaxError
+
+COMMENT_RE = re.compile(r'/\*.*?\*/', re.DOTALL)
+# pseudo classes and elements (:hover, ::before, :not(...)), which do not change whether a selector is in the layout
+PSEUDO_RE = re.compile(r'::?[a-zA-Z-]+(\([^)]*\))?')
+# at-rules holding rules, which are kept for the critical rules in them
+NESTED_AT_RULES = ('@media', '@supports', '@layer')
+
+
+def css_rules(css):
+    '''Return the top level (prelude, block) rules of css (the block is None for statements, e.g. @import).'''
+    css = COMMENT_RE.sub('', css)
+    rules = []
+    depth = start = block_start = 0
+    prelude = ''
+    for index, char in enumerate(css):
+        if char == '{':
+            if depth == 0:
+                prelude = css[start:index].strip()
+                block_start = index + 1
+            depth += 1
+        elif char == '}' and depth:
+            depth -= 1
+            if depth == 0:
+                rules.append((prelude, css[block_start:index]))
+                start = index + 1
+        elif char == ';' and depth == 0:
+            rules.append((css[start:index].strip(), None))
+            start = index + 1
+    return rules
+
+
+def selector_matches(soup, selector):
+    '''Return True if selector (without its pseudo classes) matches an element of soup (or can not be checked).'''
+    selector = PSEUDO_RE.sub('', selector).strip() or '*'
+    try:
+        return soup.select_one(selector) is not None
+    except SelectorSyntaxError:
+        return True
+
+
+def critical_rules(rules, soup):
+    '''Yield the rules (as css) needed to draw the page of soup.'''
+    for prelude, block in rules:
+        if block is None:
+            if not prelude.startswith('@charset'): # (only allowed at the start of a stylesheet)
+                yield f'{prelude};'
+        elif prelude.startswith(NESTED_AT_RULES):
+            nested = ''.join(critical_rules(css_rules(block), soup))
+            if nested:
+                yield f'{prelude}{{{nested}}}'
+        elif prelude.startswith('@'): # e.g. @font-face
+            yield f'{prelude}{{{block}}}'
+        elif any(selector_matches(soup, selector) for selector in prelude.split(',')):
+            yield f'{prelude}{{{block}}}'
+
+
+def critical_css(css, html):
+    '''Return the (minified) rules of css needed to draw the page html.'''
+    soup = BeautifulSoup(html, 'html.parser')
+    return cssmin(''.join(critical_rules(css_rules(css), soup)))
@@ -0,0 +1,137 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - common/history.py
+'''
+import datetime
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from auditlog.models import LogEntry
+from auditlog.registry import auditlog
+
+from common.audit_archive import archive_key, archive_manifests, archived_history, manifest_rows
+from common.models import HistoryCheckpoint
+
+
+def history_field_names(model):
+    '''Return the names of the fields of model that are kept in its auditlog history.
+
+    - these are the (concrete) model fields, less the fields excluded (or not included) when registering with auditlog
+    '''
+    names = [field.name for field in model._meta.concrete_fields]
+    if auditlog.contains(model):
+        model_fields = auditlog.get_model_fields(model)
+        if model_fields['include_fields']:
+            names = [name for name in names if name in model_fields['include_fields']]
+        names = [name for name in names if name not in model_fields['exclude_fields']]
+    return names
+
+
+def replay_history(model, state, log_entries):
+    '''Apply log_entries (oldest first) to state, and return the resulting state.
+
+    - state is a dictionary of field name to value (as stored in the auditlog), or None if the record does not exist
+    - a create starts a new state (fields without a logged value are 'None', as auditlog does not log None values)
+    - an update changes only the logged fields
+    - a (hard) delete ends the state (None)
+    '''
+    for log_entry in log_entries:
+        if log_entry.action == LogEntry.Action.CREATE or (state is None and log_entry.action == LogEntry.Action.UPDATE):
+            state = dict.fromkeys(history_field_names(model), 'None')
+        if log_entry.action in (LogEntry.Action.CREATE, LogEntry.Action.UPDATE):
+            for field_name, (_was, is_now) in log_entry.changes_dict.items():
+                state[field_name] = is_now
+        elif log_entry.action == LogEntry.Action.DELETE:
+            state = None
+    return state
+
+
+def has_archived_history(content_type_id, object_id, checkpoint, when):
+    '''Return True if the record has archived history at or before 'when' that is not included in the checkpoint.'''
+    key = archive_key(content_type_id, object_id)
+    for manifest in archive_manifests():
+        if (
+            manifest_rows(manifest, key)[0]
+            and datetime.datetime.fromisoformat(manifest['from']) <= when
+            and (checkpoint is None or checkpoint.timestamp < datetime.datetime.fromisoformat(manifest['to']))
+        ):
+            return True
+    return False
+
+
+def rebuild_as_of(model, object_ids, when, checkpoint_interval=None):
+    '''Rebuild the field state of the model's records (object_ids) as of the time 'when'.
+
+    Returns a dictionary of object id to state, see replay_history (None if the record did not exist at that time).
+
+    - the latest checkpoint at or before 'when' is loaded for all records in one query
+    - the archived history (see common/audit_archive.py) before 'when' that is not included in those checkpoints
+      is read from the archives (only for the records that have some, as listed in the archive manifests)
+    - the history after those checkpoints (up to 'when') is loaded for all records in one query, and replayed
+    - if more than checkpoint_interval (default: settings.HISTORY_CHECKPOINT_INTERVAL) history records were
+      replayed for a record, a new checkpoint is saved, so the next rebuild for that record does less work
+    '''
+    if checkpoint_interval is None:
+        checkpoint_interval = settings.HISTORY_CHECKPOINT_INTERVAL
+    object_ids = list(object_ids)
+    content_type = ContentType.objects.get_for_model(model, for_concrete_model=False)
+
+    # the latest checkpoint for each record (postgresql DISTINCT ON)
+    checkpoints = {
+        checkpoint.object_id: checkpoint
+        for checkpoint in HistoryCheckpoint.objects.filter(
+            content_type=content_type, object_id__in=object_ids, timestamp__lte=when,
+        ).order_by('object_id', '-timestamp', '-log_entry_id').distinct('object_id')
+    }
+    states = {object_id: None for object_id in object_ids}
+    for object_id, checkpoint in checkpoints.items():
+        states[object_id] = checkpoint.state
+
+    # the history after the checkpoints, oldest first
+    log_entries = LogEntry.objects.filter(
+        content_type=content_type, object_id__in=object_ids, timestamp__lte=when,
+    ).exclude(action=LogEntry.Action.ACCESS)
+    if checkpoints and len(checkpoints) == len(object_ids):
+        log_entries = log_entries.filter(timestamp__gte=min(checkpoint.timestamp for checkpoint in checkpoints.values()))
+    log_entries = log_entries.only(
+        'id', 'object_id', 'timestamp', 'action', 'changes', 'changes_text',
+    ).order_by('object_id', 'timestamp', 'id')
+
+    replayed = {}
+
+    def replay(log_entry):
+        checkpoint = checkpoints.get(log_entry.object_id)
+        if checkpoint and (log_entry.timestamp, log_entry.id) <= (checkpoint.timestamp, checkpoint.log_entry_id):
+            return # already included in the checkpoint
+        states[log_entry.object_id] = replay_history(model, states[log_entry.object_id], [log_entry])
+        count, _last = replayed.get(log_entry.object_id, (0, None))
+        replayed[log_entry.object_id] = (count + 1, log_entry)
+
+    # the archived history first (the archived months are older than the history still in the database)
+    for object_id in object_ids:
+        if has_archived_history(content_type.pk, object_id, checkpoints.get(object_id), when):
+            for log_entry in reversed(archived_history(content_type.pk, object_id)):
+                if log_entry.timestamp > when:
+                    break
+                if log_entry.action != LogEntry.Action.ACCESS:
+                    replay(log_entry)
+    for log_entry in log_entries.iterator(chunk_size=2000):
+        replay(log_entry)
+
+    new_checkpoints = [
+        HistoryCheckpoint(
+            content_type=content_type,
+            object_id=object_id,
+            timestamp=last_entry.timestamp,
+            log_entry_id=last_entry.id,
+            state=states[object_id],
+        )
+        for object_id, (count, last_entry) in replayed.items()
+        if count >= checkpoint_interval
+    ]
+    if new_checkpoints:
+        HistoryCheckpoint.objects.bulk_create(new_checkpoints, ignore_conflicts=True)
+    return states
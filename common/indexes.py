@@ -0,0 +1,169 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - common/indexes.py
+
+Partial (soft delete aware) indexes for the lookup keys of BaseModel models.
+
+The default ('objects') manager of BaseModel models adds "deleted IS NULL" to every query, so lookups are best served
+by indexes that only hold the records that are not soft deleted. A BaseModel model lists its lookup keys in
+soft_delete_lookups, and an index "WHERE deleted IS NULL" is added to the model for each of them
+(so makemigrations creates them). Each lookup key is one of:
+- a field name, e.g. 'email'
+- a tuple of field names (a composite index), e.g. ('last_name', 'first_name')
+- an expression, e.g. Upper('email') (for case insensitive (iexact) lookups)
+
+Lookup keys that must also be unique among the records that are not soft deleted are listed in soft_delete_unique
+instead, and a unique constraint "WHERE deleted IS NULL" (a unique partial index, which also serves the lookups)
+is added to the model for each of them. Soft deleted records do not hold on to their keys, so e.g. a user can sign up
+again with the email of a soft deleted user.
+
+see: python manage.py soft_delete_indexes (reports missing and unused soft delete indexes)
+'''
+from django.core import checks
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connection, connections
+from django.db.backends.utils import names_digest, split_identifier
+from django.db.models import F, Index, Q, UniqueConstraint
+from django.db.models.expressions import BaseExpression
+from safedelete.config import FIELD_NAME
+
+SOFT_DELETE_INDEX_SUFFIX = 'sdl'
+SOFT_DELETE_UNIQUE_SUFFIX = 'sdu'
+
+
+def lookup_field_names(lookup):
+    '''Return the field names used by a soft_delete_lookups entry.'''
+    if isinstance(lookup, BaseExpression):
+        return [expression.name for expression in lookup.flatten() if isinstance(expression, F)]
+    if isinstance(lookup, str):
+        return [lookup.lstrip('-')]
+    return [name.lstrip('-') for name in lookup]
+
+
+def soft_delete_name(model, lookup, suffix):
+    '''Return the name for a soft delete index of model, made as Django names indexes (table, first column, hash).'''
+    _, table_name = split_identifier(model._meta.db_table)
+    first_column = model._meta.get_field(lookup_field_names(lookup)[0]).column
+    if isinstance(lookup, BaseExpression):
+        hash_data = [table_name, str(lookup)]
+    else:
+        hash_data = [table_name] + ([lookup] if isinstance(lookup, str) else list(lookup))
+    return '%s_%s_%s_%s' % (table_name[:11], first_column[:7], names_digest(*hash_data, suffix, length=6), suffix)
+
+
+def soft_delete_index(model, lookup):
+    '''Return the partial index ("WHERE deleted IS NULL") for a soft_delete_lookups entry of model (an 'sdl' suffix).'''
+    name = soft_delete_name(model, lookup, SOFT_DELETE_INDEX_SUFFIX)
+    condition = Q(**{f'{FIELD_NAME}__isnull': True})
+    if isinstance(lookup, BaseExpression):
+        return Index(lookup, name=name, condition=condition)
+    return Index(fields=[lookup] if isinstance(lookup, str) else list(lookup), name=name, condition=condition)
+
+
+def soft_delete_constraint(model, lookup):
+    '''Return the unique constraint ("WHERE deleted IS NULL") for a soft_delete_unique entry of model (an 'sdu' suffix).'''
+    name = soft_delete_name(model, lookup, SOFT_DELETE_UNIQUE_SUFFIX)
+    condition = Q(**{f'{FIELD_NAME}__isnull': True})
+    field_names = ', '.join(lookup_field_names(lookup))
+    violation_error_message = f'A {model._meta.verbose_name} with this {field_names} already exists.'
+    if isinstance(lookup, BaseExpression):
+        return UniqueConstraint(
+            lookup, name=name, condition=condition, violation_error_message=violation_error_message,
+        )
+    return UniqueConstraint(
+        fields=[lookup] if isinstance(lookup, str) else list(lookup), name=name, condition=condition,
+        violation_error_message=violation_error_message,
+    )
+
+
+def soft_delete_indexes(model):
+    '''Return the partial indexes for model's soft_delete_lookups (none if one names a missing field, see check).'''
+    if check_soft_delete_lookups(model):
+        return []
+    return [soft_delete_index(model, lookup) for lookup in getattr(model, 'soft_delete_lookups', ())]
+
+
+def soft_delete_constraints(model):
+    '''Return the unique constraints for model's soft_delete_unique (none if one names a missing field, see check).'''
+    if check_soft_delete_lookups(model):
+        return []
+    return [soft_delete_constraint(model, lookup) for lookup in getattr(model, 'soft_delete_unique', ())]
+
+
+def soft_delete_index_names(model):
+    '''Return the names of model's soft delete indexes, including those of its unique constraints.'''
+    return [index.name for index in [*soft_delete_indexes(model), *soft_delete_constraints(model)]]
+
+
+def add_soft_delete_indexes(model):
+    '''Add the partial indexes and unique constraints for model's soft_delete_lookups and soft_delete_unique
+    to its Meta indexes and constraints (if not already there).
+
+    Note: they are also added to the Meta options that migrations read (original_attrs).
+    '''
+    if model._meta.abstract or model._meta.proxy:
+        return
+    for option, new in (('indexes', soft_delete_indexes(model)), ('constraints', soft_delete_constraints(model))):
+        existing = getattr(model._meta, option)
+        names = {item.name for item in existing}
+        new = [item for item in new if item.name not in names]
+        if new:
+            # a new list, as the Meta list may be shared with an abstract parent
+            setattr(model._meta, option, [*existing, *new])
+            model._meta.original_attrs[option] = getattr(model._meta, option)
+
+
+def check_soft_delete_lookups(model):
+    '''Return check errors for soft_delete_lookups and soft_delete_unique entries that name fields model does not have.'''
+    errors = []
+    for attribute in ('soft_delete_lookups', 'soft_delete_unique'):
+        for lookup in getattr(model, attribute, ()):
+            for name in lookup_field_names(lookup):
+                try:
+                    model._meta.get_field(name)
+                except FieldDoesNotExist:
+                    errors.append(checks.Error(
+                        f"{attribute} refers to the nonexistent field '{name}'.",
+                        obj=model,
+                        id='common.E001',
+                    ))
+    return errors
+
+
+def missing_soft_delete_indexes(models, using='default'):
+    '''Return a list of (model, index name) of the soft delete indexes that are not in the database.'''
+    missing = []
+    with connections[using].cursor() as cursor:
+        for model in models:
+            names = soft_delete_index_names(model)
+            if not names:
+                continue
+            existing = connections[using].introspection.get_constraints(cursor, model._meta.db_table)
+            missing.extend((model, name) for name in names if name not in existing)
+    return missing
+
+
+def soft_delete_index_report(models):
+    '''Return a report of the soft delete indexes of models (from the database statistics).
+
+    Returns a list of (model, index name, status, scans) (PostgreSQL only), where status is one of:
+    - 'missing': declared, but not in the database (run makemigrations / migrate)
+    - 'unused': in the database, but never used since the statistics were last reset
+    - 'ok': in the database and used
+    '''
+    missing = set(missing_soft_delete_indexes(models))
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT indexrelname, idx_scan FROM pg_stat_user_indexes')
+        scans = dict(cursor.fetchall())
+    report = []
+    for model in models:
+        for name in soft_delete_index_names(model):
+            if (model, name) in missing:
+                report.append((model, name, 'missing', None))
+            else:
+                scan_count = scans.get(name, 0)
+                report.append((model, name, 'ok' if scan_count else 'unused', scan_count))
+    return report
@@ -0,0 +1,99 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - common/log.py
+
+Structured (JSON lines), rate limited and non blocking logging (see LOGGING in settings.py).
+
+- JsonFormatter writes each log record as one JSON object, with any extra fields (e.g. extra={'event': 'user.name_missing'})
+- RateLimitFilter lets through at most rate records per interval for each event (or message), and counts the rest
+  (warnings and errors, e.g. the tracebacks of django.request, are never dropped)
+- QueueStreamHandler hands the records to a background thread that writes them to stderr,
+  so a request does not wait on the log output
+'''
+import atexit
+import datetime
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+# the attributes every LogRecord has (anything else was passed in extra)
+STANDARD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    '''Format a log record as one line of JSON.'''
+
+    def format(self, record):
+        entry = {
+            'time': datetime.datetime.fromtimestamp(record.created, tz=datetime.timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update((name, value) for name, value in vars(record).items() if name not in STANDARD_ATTRS)
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    '''Let through at most rate records per interval (seconds) for each logger and event (or message).
+
+    The first record let through after some were dropped has the number dropped in its suppressed field.
+    A rate of 0 turns off the limit. Warnings and errors are always let through: the many different failures logged
+    with one message (e.g. django.request's 'Internal Server Error: %s') must not hide each other.
+    '''
+
+    def __init__(self, rate=10, interval=60):
+        super().__init__()
+        self.rate = rate
+        self.interval = interval
+        self.windows = {} # key: [window start time, records let through, records dropped]
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        if not self.rate or record.levelno >= logging.WARNING:
+            return True
+        key = (record.name, getattr(record, 'event', None) or record.msg)
+        now = time.monotonic()
+        with self.lock:
+            window = self.windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                if window is not None and window[2]:
+                    record.suppressed = window[2]
+                self.windows[key] = [now, 1, 0]
+                return True
+            if window[1] < self.rate:
+                window[1] += 1
+                return True
+            window[2] += 1
+            return False
+
+
+class StderrHandler(logging.StreamHandler):
+    '''A StreamHandler that writes to the current sys.stderr (which may be replaced, e.g. by test output capture).'''
+
+    @property
+    def stream(self):
+        return sys.stderr
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+class QueueStreamHandler(QueueHandler):
+    '''Queue the (formatted) records, and write them to stderr from a background thread.'''
+
+    def __init__(self):
+        super().__init__(queue.SimpleQueue())
+        self.listener = QueueListener(self.queue, StderrHandler())
+        self.listener.start()
+        atexit.register(self.listener.stop)
@@ -0,0 +1,106 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - common/management/commands/auditlog_partitions.py
+'''
+import datetime
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from common.audit_archive import remove_archive, write_archive
+from common.base_model import BaseModel
+from common.history import rebuild_as_of
+from common.partitions import (
+    DEFAULT_PARTITION, LOG_ENTRY_TABLE, ensure_monthly_partitions, is_partitioned, month_start, monthly_partitions,
+    next_month,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Create the upcoming monthly auditlog partitions, '
+        'and (with --keep-months) archive older partitions to compressed JSONL files in AUDITLOG_ARCHIVE_DIR'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months-ahead', type=int, default=None,
+            help='create partitions this many months ahead (default: AUDITLOG_PARTITION_MONTHS_AHEAD)',
+        )
+        parser.add_argument(
+            '--keep-months', type=int, default=None,
+            help='archive (detach, write and drop) the partitions older than this many months before this month',
+        )
+
+    def handle(self, *args, **options):
+        if not is_partitioned():
+            raise CommandError(f'{LOG_ENTRY_TABLE} is not partitioned (PostgreSQL only, see migration common 0002)')
+        now = timezone.now()
+        months_ahead = options['months_ahead']
+        if months_ahead is None:
+            months_ahead = settings.AUDITLOG_PARTITION_MONTHS_AHEAD
+
+        # monthly partitions up to months_ahead, and for any older records that ended up in the default partition
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT min("timestamp") FROM {DEFAULT_PARTITION}')
+            oldest = cursor.fetchone()[0]
+        with transaction.atomic():
+            created = ensure_monthly_partitions(min(oldest or now, now), months_ahead, now)
+        self.stdout.write(f'{len(created)} partitions created' + (f': {", ".join(created)}' if created else ''))
+
+        if options['keep_months'] is None:
+            return
+        cutoff = month_start(now)
+        for _ in range(options['keep_months']):
+            cutoff = month_start(cutoff - datetime.timedelta(days=1))
+        for start, partition in monthly_partitions():
+            end = next_month(start)
+            if end > cutoff:
+                break
+            self.archive_partition(partition, start, end)
+
+    def archive_partition(self, partition, start, end):
+        '''Checkpoint, archive, detach and drop one monthly partition.'''
+        self.checkpoint_partition(partition, end)
+        # the rows are streamed out while the partition is still attached (no locks held on the LogEntry table)
+        manifest = write_archive(partition, start, end)
+        try:
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.execute(f'ALTER TABLE {LOG_ENTRY_TABLE} DETACH PARTITION {partition}')
+                    cursor.execute(f'SELECT count(*) FROM {partition}')
+                    if cursor.fetchone()[0] != manifest['rows']:
+                        raise CommandError(f'{partition} changed while it was being archived, not archived')
+                    cursor.execute(f'DROP TABLE {partition}')
+        except Exception:
+            remove_archive(manifest)
+            raise
+        if not manifest['rows']:
+            remove_archive(manifest) # nothing to keep for an empty month
+            return
+        self.stdout.write(f"{partition}: {manifest['rows']} history records archived to {manifest['archive']}")
+
+    def checkpoint_partition(self, partition, end):
+        '''Save history checkpoints (see common/history.py) as of the end of the partition's month.
+
+        So rec_as_of / as_of for times after the archived month do not need the archived history.
+        '''
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT DISTINCT content_type_id, object_id FROM {partition} WHERE object_id IS NOT NULL '
+                f'ORDER BY content_type_id, object_id'
+            )
+            records = cursor.fetchall()
+        object_ids = {}
+        for content_type_id, object_id in records:
+            object_ids.setdefault(content_type_id, []).append(object_id)
+        for content_type_id, ids in object_ids.items():
+            model = ContentType.objects.get_for_id(content_type_id).model_class()
+            if model is not None and issubclass(model, BaseModel):
+                rebuild_as_of(model, ids, end - datetime.timedelta(microseconds=1), checkpoint_interval=1)
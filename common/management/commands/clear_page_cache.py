@@ -0,0 +1,30 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - common/management/commands/clear_page_cache.py
+'''
+from django.core.management.base import BaseCommand, CommandError
+
+from common.cache import cache_is_shared
+from common.page_cache import clear_page_cache
+
+
+class Command(BaseCommand):
+    help = 'Render every cached page and template fragment again (e.g. after a deploy), see common/page_cache.py'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--local', action='store_true',
+            help="clear a local memory cache anyway (only this process's own, e.g. in tests)",
+        )
+
+    def handle(self, *args, **options):
+        if not cache_is_shared() and not options['local']:
+            raise CommandError(
+                'the cache is local to each process (CACHE_BACKEND), so the running server processes would keep '
+                'their cached pages: restart them instead (or use a shared cache)'
+            )
+        clear_page_cache()
+        self.stdout.write('page cache cleared')
@@ -0,0 +1,47 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - common/management/commands/critical_css.py
+'''
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.staticfiles import finders
+from django.core.management.base import BaseCommand, CommandError
+from django.http import HttpRequest
+from django.template.loader import render_to_string
+from django.test import override_settings
+
+
+class Command(BaseCommand):
+    help = 'Write the critical (above the fold) css of the _base.html layout, inlined in its head (see common/critical_css.py)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page', default='pages/home.html', help='a template of the layout, with little page body')
+        parser.add_argument('--css', default='css/base.css', help='the (compiled) stylesheet of the layout')
+        parser.add_argument(
+            '--output', default=str(Path(settings.STATICFILES_DIRS[0]) / 'css' / 'critical.css'),
+            help='the critical css file written (css/critical.css of the static files)',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            from common.critical_css import critical_css
+        except ImportError as error: # (beautifulsoup4 is a development dependency)
+            raise CommandError(f'critical_css needs the development dependencies: {error}')
+        css_path = finders.find(options['css'])
+        if css_path is None:
+            raise CommandError(f"static file {options['css']} not found (compile the scss first)")
+        request = HttpRequest()
+        request.path = '/'
+        request.user = AnonymousUser()
+        # (the page as linked in development, the bundles may not be built yet)
+        with override_settings(COMPRESS_ENABLED=False, COMPRESS_OFFLINE=False):
+            html = render_to_string(options['page'], request=request)
+        css = Path(css_path).read_text()
+        critical = critical_css(css, html)
+        Path(options['output']).write_text(critical + '\n')
+        self.stdout.write(f"{options['output']}: {len(critical)} of {len(css)} bytes of {options['css']}")
@@ -0,0 +1,47 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - common/management/commands/history_checkpoints.py
+'''
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from auditlog.registry import auditlog
+
+from common.base_model import BaseModel
+from common.history import rebuild_as_of
+
+
+class Command(BaseCommand):
+    help = 'Save history checkpoints for all audited BaseModel records (bounds the cost of rec_as_of / as_of)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='records rebuilt per batch')
+        parser.add_argument(
+            '--min-entries', type=int, default=1,
+            help='only checkpoint records with at least this many history records since their last checkpoint',
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        for model in auditlog.get_models():
+            if not issubclass(model, BaseModel):
+                continue
+            start = time.monotonic()
+            count = 0
+            last_pk = None
+            while True:
+                # keyset batches of the records (including soft deleted records)
+                pks = model.all_objects.order_by('pk')
+                if last_pk is not None:
+                    pks = pks.filter(pk__gt=last_pk)
+                pks = list(pks.values_list('pk', flat=True)[:options['batch_size']])
+                if not pks:
+                    break
+                rebuild_as_of(model, pks, now, checkpoint_interval=options['min_entries'])
+                count += len(pks)
+                last_pk = pks[-1]
+            self.stdout.write(f'{model._meta.label}: {count} records checked in {time.monotonic() - start:.1f}s')
@@ -0,0 +1,27 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - common/management/commands/purge_expired_sessions.py
+'''
+import time
+
+from django.core.management.base import BaseCommand
+
+from common.sessions import purge_expired_sessions
+
+
+class Command(BaseCommand):
+    help = 'Delete the expired sessions from the database in batches (run e.g. nightly, in place of clearsessions)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='sessions deleted per statement')
+        parser.add_argument('--pause', type=float, default=0.1, help='seconds to wait between batches')
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        purged, batches = purge_expired_sessions(batch_size=options['batch_size'], pause=options['pause'])
+        self.stdout.write(
+            f'{purged} expired sessions purged in {batches} batches, in {time.monotonic() - start:.1f}s'
+        )
@@ -0,0 +1,52 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - common/management/commands/purge_soft_deleted.py
+'''
+import time
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from common.base_model import BaseModel
+from common.retention import purge_soft_deleted
+
+
+class Command(BaseCommand):
+    help = 'Hard delete BaseModel records soft deleted for longer than their soft_delete_retention (run e.g. nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('models', nargs='*', help='model labels to purge (default: all with a retention period)')
+        parser.add_argument('--batch-size', type=int, default=500, help='records deleted per transaction')
+        parser.add_argument('--pause', type=float, default=0.1, help='seconds to wait between batches')
+        parser.add_argument(
+            '--lock-timeout', type=int, default=1000,
+            help='milliseconds a batch waits for its locks, before it is skipped until the next run',
+        )
+
+    def handle(self, *args, **options):
+        models = [
+            model for model in apps.get_models()
+            if issubclass(model, BaseModel) and model.soft_delete_retention is not None
+        ]
+        if options['models']:
+            labels = {model._meta.label_lower: model for model in models}
+            unknown = [label for label in options['models'] if label.lower() not in labels]
+            if unknown:
+                raise CommandError(f'no retention period for: {", ".join(unknown)}')
+            models = [labels[label.lower()] for label in options['models']]
+        for model in models:
+            start = time.monotonic()
+            summary = purge_soft_deleted(
+                model,
+                batch_size=options['batch_size'],
+                pause=options['pause'],
+                lock_timeout=options['lock_timeout'],
+            )
+            self.stdout.write(
+                f'{model._meta.label}: {summary.purged} records purged '
+                f'({sum(summary.deleted.values())} including related records) in {summary.batches} batches, '
+                f'{summary.skipped_batches} skipped, in {time.monotonic() - start:.1f}s'
+            )
@@ -0,0 +1,34 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - common/management/commands/soft_delete_indexes.py
+'''
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from common.base_model import BaseModel
+from common.indexes import soft_delete_index_report
+
+
+class Command(BaseCommand):
+    help = 'Report the missing and unused soft delete (WHERE deleted IS NULL) indexes of BaseModel models'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fail', action='store_true', help='exit with an error if any soft delete index is missing',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('the index statistics are only available on PostgreSQL')
+        models = [model for model in apps.get_models() if issubclass(model, BaseModel)]
+        report = soft_delete_index_report(models)
+        for model, index_name, status, scans in report:
+            scans = '' if scans is None else f' ({scans} scans)'
+            self.stdout.write(f'{model._meta.label}: {index_name} {status}{scans}')
+        missing = [index_name for _model, index_name, status, _scans in report if status == 'missing']
+        if missing and options['fail']:
+            raise CommandError(f'missing soft delete indexes: {", ".join(missing)}')
@@ -0,0 +1,176 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - common/managers.py
+'''
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from auditlog.diff import model_instance_diff
+from safedelete.config import SOFT_DELETE_CASCADE
+from safedelete.managers import SafeDeleteManager, SafeDeleteAllManager, SafeDeleteDeletedManager
+from safedelete.queryset import SafeDeleteQueryset
+from auditlog.models import LogEntry
+
+from common.audit import auditlog_is_active, log_changes
+from common.cascade import soft_delete_cascade, undelete_cascade
+from common.history import rebuild_as_of
+
+
+class BaseModelQuerySet(SafeDeleteQueryset):
+    """ BaseModelQuerySet is the queryset class for all BaseModel managers
+
+    - soft delete functionality from SafeDeleteQueryset
+    - record history (auditlog) annotations for lists of records, without a history query per record
+    - point in time ("as of") field values for lists of records
+    - cascading soft deletes and undeletes a table at a time, rather than a record at a time (see common/cascade.py)
+    - bulk_create and bulk_update that normalise the records (BaseModel.bulk_normalize) and write their history
+    """
+
+    def bulk_create(self, objs, batch_size=None, **kwargs):
+        '''Insert the records in batches (as QuerySet.bulk_create), normalised and with their history records.
+
+        - the model's bulk_normalize is run on all of the records first (as its save signals would)
+        - the history records (as auditlog's create records) are written in batches after the insert
+        Note: records without a pk after the insert (e.g. with ignore_conflicts) get no history record,
+        and records updated by update_conflicts are logged as creates.
+        '''
+        objs = list(objs)
+        self.model.bulk_normalize(objs)
+        objs = super().bulk_create(objs, batch_size=batch_size, **kwargs)
+        if auditlog_is_active(self.model):
+            log_changes(
+                [(obj, LogEntry.Action.CREATE, model_instance_diff(None, obj)) for obj in objs if obj.pk is not None],
+                batch_size=batch_size,
+            )
+        return objs
+    bulk_create.alters_data = True
+
+    def bulk_update(self, objs, fields, batch_size=None):
+        '''Update the fields of the records in batches (as QuerySet.bulk_update), normalised and with their history records.
+
+        - the model's bulk_normalize is run on all of the records first, and the fields it sets are also updated
+        - auto_now fields (e.g. updated) are set to now and updated, as save() does (so Last-Modified and ETag change)
+        - the changes are worked out as auditlog does for save(update_fields=fields), from one query for the old records
+          (so, as with save(), the auto_now fields are not in them)
+        - the history records are written in batches after the update
+        '''
+        objs = list(objs)
+        fields = list(fields)
+        fields += [name for name in self.model.bulk_normalize(objs) if name not in fields]
+        fields_to_check = list(fields)
+        now = timezone.now()
+        for field in self.model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False) and field.name not in fields:
+                for obj in objs:
+                    setattr(obj, field.attname, now)
+                fields.append(field.name)
+        old_records = {}
+        if auditlog_is_active(self.model):
+            old_records = self.model.objects.using(self.db).in_bulk([obj.pk for obj in objs])
+        rows = super().bulk_update(objs, fields, batch_size=batch_size)
+        if auditlog_is_active(self.model):
+            log_changes(
+                [
+                    (obj, LogEntry.Action.UPDATE, model_instance_diff(
+                        old_records.get(obj.pk), obj, fields_to_check=fields_to_check,
+                    ))
+                    for obj in objs
+                ],
+                batch_size=batch_size,
+            )
+        for obj in objs:
+            obj.rec_history_reset()
+        return rows
+    bulk_update.alters_data = True
+
+    def delete(self, force_policy=None):
+        '''Soft delete the records, cascading to their related records a table at a time (SOFT_DELETE_CASCADE policy).
+
+        Other delete policies are left to safedelete.
+        '''
+        policy = self.model._safedelete_policy if force_policy is None else force_policy
+        if policy != SOFT_DELETE_CASCADE:
+            return super().delete(force_policy=force_policy)
+        assert self.query.can_filter(), "Cannot use 'limit' or 'offset' with delete."
+        result = soft_delete_cascade(self.model, self.values_list('pk', flat=True), using=self.db)
+        self._result_cache = None
+        return result
+    delete.alters_data = True
+
+    def undelete(self, force_policy=None):
+        '''Undelete the (soft deleted) records, and the related records soft deleted with them, a table at a time.
+
+        Other delete policies are left to safedelete.
+        '''
+        policy = self.model._safedelete_policy if force_policy is None else force_policy
+        if policy != SOFT_DELETE_CASCADE:
+            return super().undelete(force_policy=force_policy)
+        assert self.query.can_filter(), "Cannot use 'limit' or 'offset' with undelete."
+        result = undelete_cascade(self.model, self.values_list('pk', flat=True), using=self.db)
+        self._result_cache = None
+        return result
+    undelete.alters_data = True
+
+    def as_of(self, when):
+        '''Return a dictionary of record pk to its field values as of the time 'when' (see BaseModel.rec_as_of).
+
+        - all of the records are rebuilt together, with one checkpoint query and one history query
+        - use all_objects.as_of to include records that have been soft deleted since
+        '''
+        return rebuild_as_of(self.model, self.values_list('pk', flat=True), when)
+
+    def with_history_stats(self):
+        '''Annotate each record with a summary of its auditlog history, in the same (single) query.
+
+        - history_count: the number of history records for the record (0 if none)
+        - history_last_changed: the timestamp of the latest history record (None if none)
+        - history_last_actor_id: the id of the user that made the latest change (None if unknown)
+        - history_last_actor: the login name (USERNAME_FIELD) of that user (None if unknown)
+
+        Note: the annotations are correlated subqueries, so they can be sorted on and combined with
+        other filters and annotations without changing the number of rows returned.
+        '''
+        history = LogEntry.objects.filter(
+            content_type=ContentType.objects.get_for_model(self.model, for_concrete_model=False),
+            object_id=OuterRef('pk'),
+        )
+        latest = history.order_by('-timestamp', '-pk')
+        counts = history.order_by().values('object_id').annotate(count=Count('pk')).values('count')
+        actor_name = f'actor__{get_user_model().USERNAME_FIELD}'
+        return self.annotate(
+            history_count=Coalesce(Subquery(counts, output_field=IntegerField()), Value(0)),
+            history_last_changed=Subquery(latest.values('timestamp')[:1]),
+            history_last_actor_id=Subquery(latest.values('actor_id')[:1]),
+            history_last_actor=Subquery(latest.values(actor_name)[:1]),
+        )
+
+
+class BaseModelManager(SafeDeleteManager):
+    """ BaseModelManager is the base class for the 'objects' managers of all BaseModel models
+
+    - provides BaseModelQuerySet methods (e.g. with_history_stats) from the manager
+    - custom managers (e.g. CustomUserManager) should mix this in ahead of any other manager classes
+    """
+    _queryset_class = BaseModelQuerySet
+
+    def as_of(self, when):
+        '''Return (non deleted) records' field values as of the time 'when', see BaseModelQuerySet.'''
+        return self.get_queryset().as_of(when)
+
+    def with_history_stats(self):
+        '''Return (non deleted) records annotated with their history summary, see BaseModelQuerySet.'''
+        return self.get_queryset().with_history_stats()
+
+
+class BaseModelAllManager(BaseModelManager, SafeDeleteAllManager):
+    '''BaseModelManager including the soft deleted records ('all_objects').'''
+
+
+class BaseModelDeletedManager(BaseModelManager, SafeDeleteDeletedManager):
+    '''BaseModelManager with only the soft deleted records ('deleted_objects').'''
@@ -0,0 +1,246 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - common/metrics.py
+
+In memory (per process) request metrics, in the Prometheus text exposition format.
+
+- RequestMetrics collects the costs of one request (see common/middleware.py MetricsMiddleware)
+    - wall time, SQL query count and time, template render time, auditlog writes, cache hits and misses
+    - the SQL queries are counted by record_query, on every database connection (see common/signals.py),
+      as the queries of async views run in other threads than the middleware
+- the costs of each request are added to histograms and counters by view, in the (process wide) REGISTRY
+- the /metrics/ view (see common/views.py) returns the REGISTRY in the Prometheus text format
+- with the metrics of the database connection pools (settings.DATABASE_POOL), read as they are shown:
+  open and available connections, requests waiting for a connection (the pool is exhausted),
+  and the totals of the requests that had to wait, their wait time, and those that timed out
+Note: each server process (e.g. gunicorn worker) has its own metrics, scrape each process or sum them.
+'''
+import threading
+import time
+from contextvars import ContextVar
+
+from django.db import connections
+
+METRIC_PREFIX = 'healthy_meals'
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# the metrics of the current request (None outside of the MetricsMiddleware)
+_request_metrics = ContextVar('request_metrics', default=None)
+
+
+class Histogram:
+    '''A Prometheus histogram (cumulative buckets, sum and count), by label value.'''
+
+    def __init__(self, name, documentation, buckets, label='view'):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.label = label
+        self.values = {} # label value: [bucket counts..., sum, count]
+
+    def observe(self, label_value, value):
+        values = self.values.setdefault(label_value, [0] * len(self.buckets) + [0, 0])
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                values[index] += 1
+        values[-2] += value
+        values[-1] += 1
+
+    def exposition(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for label_value, values in sorted(self.values.items()):
+            label = f'{self.label}="{escape_label(label_value)}"'
+            for bound, count in zip(self.buckets, values):
+                lines.append(f'{self.name}_bucket{{{label},le="{format_value(bound)}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {values[-1]}')
+            lines.append(f'{self.name}_sum{{{label}}} {format_value(values[-2])}')
+            lines.append(f'{self.name}_count{{{label}}} {values[-1]}')
+        return lines
+
+
+class Counter:
+    '''A Prometheus counter, by label value.'''
+
+    metric_type = 'counter'
+
+    def __init__(self, name, documentation, label='view'):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self.values = {}
+
+    def inc(self, label_value, amount=1):
+        self.values[label_value] = self.values.get(label_value, 0) + amount
+
+    def exposition(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.metric_type}']
+        for label_value, value in sorted(self.values.items()):
+            lines.append(f'{self.name}{{{self.label}="{escape_label(label_value)}"}} {format_value(value)}')
+        return lines
+
+
+class Gauge(Counter):
+    '''A Prometheus gauge, by label value.'''
+
+    metric_type = 'gauge'
+
+
+# the database connection pool metrics: (name, psycopg_pool statistic, metric class, documentation, scale)
+POOL_METRICS = (
+    ('db_pool_connections', 'pool_size', Gauge, 'Open connections in the database pool.', 1),
+    ('db_pool_connections_available', 'pool_available', Gauge, 'Unused connections in the database pool.', 1),
+    ('db_pool_connections_max', 'pool_max', Gauge, 'Most connections the database pool opens.', 1),
+    ('db_pool_requests_waiting', 'requests_waiting', Gauge,
+     'Requests waiting for a database connection (the pool is exhausted).', 1),
+    ('db_pool_requests_total', 'requests_num', Counter, 'Connections taken from the database pool.', 1),
+    ('db_pool_requests_queued_total', 'requests_queued', Counter,
+     'Connections taken from the database pool after waiting (the pool was exhausted).', 1),
+    ('db_pool_wait_seconds_total', 'requests_wait_ms', Counter, 'Time spent waiting for a database connection.', 0.001),
+    ('db_pool_timeouts_total', 'requests_errors', Counter, 'Requests for a database connection that timed out.', 1),
+    ('db_pool_connects_total', 'connections_num', Counter, 'Connections opened by the database pool.', 1),
+    ('db_pool_connections_lost_total', 'connections_lost', Counter,
+     'Connections closed by the database pool as they failed their health check.', 1),
+)
+
+
+def database_pool_metrics():
+    '''Return the metrics of this process's database connection pools, by database alias.'''
+    metrics = [
+        metric_class(f'{METRIC_PREFIX}_{name}', documentation, label='database')
+        for name, _, metric_class, documentation, _ in POOL_METRICS
+    ]
+    for alias in connections:
+        if not connections.settings[alias].get('OPTIONS', {}).get('pool'):
+            continue
+        stats = connections[alias].pool.get_stats()
+        for metric, (_, statistic, _, _, scale) in zip(metrics, POOL_METRICS):
+            metric.inc(alias, stats.get(statistic, 0) * scale)
+    return metrics
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_value(value):
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    '''The (thread safe) request metrics of this process.'''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        '''Clear all of the metrics (e.g. between tests).'''
+        with self.lock:
+            self.request_seconds = Histogram(
+                f'{METRIC_PREFIX}_request_duration_seconds', 'Request wall time.', SECONDS_BUCKETS)
+            self.db_queries = Histogram(
+                f'{METRIC_PREFIX}_request_db_queries', 'SQL queries per request.', COUNT_BUCKETS)
+            self.db_seconds = Histogram(
+                f'{METRIC_PREFIX}_request_db_seconds', 'SQL query time per request.', SECONDS_BUCKETS)
+            self.template_seconds = Histogram(
+                f'{METRIC_PREFIX}_request_template_seconds', 'Template render time per request.', SECONDS_BUCKETS)
+            self.requests = Counter(f'{METRIC_PREFIX}_requests_total', 'Requests handled.')
+            self.auditlog_writes = Counter(f'{METRIC_PREFIX}_auditlog_writes_total', 'Audit log records written.')
+            self.cache_hits = Counter(f'{METRIC_PREFIX}_cache_hits_total', 'Cache lookups that found a value.')
+            self.cache_misses = Counter(f'{METRIC_PREFIX}_cache_misses_total', 'Cache lookups that found no value.')
+
+    def record(self, request_metrics):
+        '''Add the costs of one request to the metrics.'''
+        view = request_metrics.view
+        with self.lock:
+            self.requests.inc(view)
+            self.request_seconds.observe(view, request_metrics.seconds)
+            self.db_queries.observe(view, request_metrics.db_queries)
+            self.db_seconds.observe(view, request_metrics.db_seconds)
+            if request_metrics.template_seconds is not None:
+                self.template_seconds.observe(view, request_metrics.template_seconds)
+            self.auditlog_writes.inc(view, request_metrics.auditlog_writes)
+            self.cache_hits.inc(view, request_metrics.cache_hits)
+            self.cache_misses.inc(view, request_metrics.cache_misses)
+
+    def exposition(self):
+        '''Return the metrics in the Prometheus text exposition format.'''
+        with self.lock:
+            metrics = [
+                self.requests, self.request_seconds, self.db_queries, self.db_seconds, self.template_seconds,
+                self.auditlog_writes, self.cache_hits, self.cache_misses,
+            ]
+            lines = [line for metric in metrics for line in metric.exposition()]
+        lines += [line for metric in database_pool_metrics() for line in metric.exposition()]
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+
+class RequestMetrics:
+    '''The costs of one request, collected while it is handled.'''
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.view = 'unknown'
+        self.seconds = 0.0
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = None
+        self.auditlog_writes = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        '''Database execute wrapper (connection.execute_wrapper), counting and timing the queries.'''
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_queries += 1
+            self.db_seconds += time.perf_counter() - start
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self.start
+
+
+def get_request_metrics():
+    '''Return the metrics of the current request (None if not collecting metrics).'''
+    return _request_metrics.get()
+
+
+def set_request_metrics(request_metrics):
+    '''Set the metrics of the current request, returning a token for reset_request_metrics.'''
+    return _request_metrics.set(request_metrics)
+
+
+def reset_request_metrics(token):
+    _request_metrics.reset(token)
+
+
+def record_query(execute, sql, params, many, context):
+    '''Database execute wrapper (of every connection), counting and timing the queries of the current request.'''
+    request_metrics = _request_metrics.get()
+    if request_metrics is None:
+        return execute(sql, params, many, context)
+    return request_metrics(execute, sql, params, many, context)
+
+
+def record_auditlog_writes(count):
+    '''Count audit log records written during the current request.'''
+    request_metrics = _request_metrics.get()
+    if request_metrics is not None:
+        request_metrics.auditlog_writes += count
+
+
+def record_cache_lookup(hits, misses):
+    '''Count cache lookups during the current request (see common/cache.py).'''
+    request_metrics = _request_metrics.get()
+    if request_metrics is not None:
+        request_metrics.cache_hits += hits
+        request_metrics.cache_misses += misses
@@ -0,0 +1,128 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - common/middleware.py
+'''
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import MiddlewareNotUsed
+from auditlog.cid import set_cid
+from auditlog.context import set_actor
+from auditlog.middleware import AuditlogMiddleware
+
+from common.audit import abuffered_auditlog, buffered_auditlog
+from common.metrics import REGISTRY, RequestMetrics, get_request_metrics, reset_request_metrics, set_request_metrics
+
+
+class BufferedAuditlogMiddleware(AuditlogMiddleware):
+    """ AuditlogMiddleware with an (optional) request scoped audit log buffer
+
+    - the actor (request user), remote address and correlation id are set as AuditlogMiddleware sets them
+    - if settings.AUDITLOG_BUFFERED is True, the history records of BaseModel saves in the request are collected
+      and written with one bulk_create once their transaction has committed (see: common/audit.py)
+        - settings.AUDITLOG_BUFFER_SIZE committed history records are written early (flushed) if reached
+    - if settings.AUDITLOG_BUFFERED is False, this is the same as AuditlogMiddleware
+    - async capable (under ASGI): the actor is read with request.auser(), and the buffer is written in a thread
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None):
+        super().__init__(get_response)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not settings.AUDITLOG_BUFFERED:
+            return super().__call__(request)
+        with buffered_auditlog(actor=self._get_actor(request), remote_addr=self._get_remote_addr(request)):
+            return super().__call__(request)
+
+    async def __acall__(self, request):
+        remote_addr = self._get_remote_addr(request)
+        actor = await self._aget_actor(request)
+        set_cid(request)
+        with set_actor(actor=actor, remote_addr=remote_addr):
+            if not settings.AUDITLOG_BUFFERED:
+                return await self.get_response(request)
+            async with abuffered_auditlog(actor=actor, remote_addr=remote_addr):
+                return await self.get_response(request)
+
+    @staticmethod
+    async def _aget_actor(request):
+        auser = getattr(request, 'auser', None)
+        user = await auser() if auser else None
+        if isinstance(user, get_user_model()) and user.is_authenticated:
+            return user
+        return None
+
+
+class MetricsMiddleware:
+    """ Records the costs of each request in the (in memory) request metrics (see: common/metrics.py)
+
+    - wall time, SQL query count and time (all database connections), template render time (TemplateResponse views)
+    - auditlog writes and cache hits and misses (see common/cache.py) are counted as they happen
+    - the metrics are by view name, and can be read at /metrics/ (see common/views.py)
+    - place this near the top of settings.MIDDLEWARE, so the other middleware costs are included
+    - not used if settings.METRICS_ENABLED is False
+    - async capable (under ASGI), the costs are collected in the request's context (contextvars)
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        request_metrics = RequestMetrics()
+        token = set_request_metrics(request_metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            reset_request_metrics(token)
+        self.record(request, request_metrics)
+        return response
+
+    async def __acall__(self, request):
+        request_metrics = RequestMetrics()
+        token = set_request_metrics(request_metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            reset_request_metrics(token)
+        self.record(request, request_metrics)
+        return response
+
+    def record(self, request, request_metrics):
+        request_metrics.finish()
+        resolver_match = getattr(request, 'resolver_match', None)
+        request_metrics.view = resolver_match.view_name if resolver_match else 'unresolved'
+        REGISTRY.record(request_metrics)
+
+    def process_template_response(self, request, response):
+        '''Time the template render, which follows this (as the outermost middleware) right away.'''
+        request_metrics = get_request_metrics()
+        if request_metrics is not None:
+            start = time.perf_counter()
+
+            def rendered(response):
+                request_metrics.template_seconds = time.perf_counter() - start
+            response.add_post_render_callback(rendered)
+        return response
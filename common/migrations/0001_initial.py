@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistoryCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.BigIntegerField()),
+                ('timestamp', models.DateTimeField()),
+                ('log_entry_id', models.BigIntegerField()),
+                ('state', models.JSONField(null=True)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='contenttypes.contenttype')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['content_type', 'object_id', '-timestamp'], name='common_hist_chkpt_obj_ts_idx')],
+                'constraints': [models.UniqueConstraint(fields=('content_type', 'object_id', 'log_entry_id'), name='common_hist_chkpt_unique')],
+            },
+        ),
+    ]
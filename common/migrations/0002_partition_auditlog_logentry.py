@@ -0,0 +1,100 @@
+'''
+Convert the auditlog LogEntry table into a table partitioned by month (of timestamp), on PostgreSQL only.
+
+- the id identity column becomes an (owned) sequence, as identity columns are not supported on partitioned tables
+- the primary key becomes (id, timestamp), as it must include the partition key (id values stay unique)
+- the indexes and foreign keys are copied from the existing table (keeping auditlog's names)
+- monthly partitions are created from the oldest record to AUDITLOG_PARTITION_MONTHS_AHEAD months from now,
+  with a default partition for anything outside of them
+- the existing records are copied across, so this can take a while on a large table
+'''
+from django.conf import settings
+from django.db import migrations
+from django.utils import timezone
+
+from common.partitions import DEFAULT_PARTITION, LOG_ENTRY_TABLE, ensure_monthly_partitions
+
+
+def table_definitions(cursor, table):
+    '''Return the (index definitions, foreign key constraint definitions) of table, less its primary key.'''
+    cursor.execute('''
+        SELECT indexdef FROM pg_indexes
+        WHERE tablename = %s AND indexname NOT IN (
+            SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'p'
+        )
+    ''', [table, table])
+    indexes = [row[0] for row in cursor.fetchall()]
+    cursor.execute('''
+        SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+        WHERE conrelid = %s::regclass AND contype = 'f'
+    ''', [table])
+    foreign_keys = cursor.fetchall()
+    return indexes, foreign_keys
+
+
+def restore_definitions(cursor, table, indexes, foreign_keys):
+    for index in indexes:
+        cursor.execute(index.replace(' ONLY ', ' '))
+    for name, definition in foreign_keys:
+        cursor.execute(f'ALTER TABLE {table} ADD CONSTRAINT {name} {definition}')
+
+
+def partition_logentry(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    old_table = f'{LOG_ENTRY_TABLE}_unpartitioned'
+    with schema_editor.connection.cursor() as cursor:
+        indexes, foreign_keys = table_definitions(cursor, LOG_ENTRY_TABLE)
+        cursor.execute(f'ALTER TABLE {LOG_ENTRY_TABLE} RENAME TO {old_table}')
+        cursor.execute(f'ALTER TABLE {old_table} ALTER COLUMN id DROP IDENTITY')
+        cursor.execute(
+            f'CREATE TABLE {LOG_ENTRY_TABLE} (LIKE {old_table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+            f'PARTITION BY RANGE ("timestamp")'
+        )
+        cursor.execute(f'CREATE SEQUENCE {LOG_ENTRY_TABLE}_id_seq AS integer OWNED BY {LOG_ENTRY_TABLE}.id')
+        cursor.execute(f"ALTER TABLE {LOG_ENTRY_TABLE} ALTER COLUMN id SET DEFAULT nextval('{LOG_ENTRY_TABLE}_id_seq')")
+        cursor.execute(f'CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {LOG_ENTRY_TABLE} DEFAULT')
+        cursor.execute(f'SELECT min("timestamp") FROM {old_table}')
+        now = timezone.now()
+        ensure_monthly_partitions(
+            cursor.fetchone()[0] or now, settings.AUDITLOG_PARTITION_MONTHS_AHEAD, now,
+            connection=schema_editor.connection,
+        )
+        cursor.execute(f'INSERT INTO {LOG_ENTRY_TABLE} SELECT * FROM {old_table}')
+        cursor.execute(f"SELECT setval('{LOG_ENTRY_TABLE}_id_seq', coalesce(max(id), 0) + 1, false) FROM {old_table}")
+        cursor.execute(f'DROP TABLE {old_table}')
+        cursor.execute(f'ALTER TABLE {LOG_ENTRY_TABLE} ADD CONSTRAINT {LOG_ENTRY_TABLE}_pkey PRIMARY KEY (id, "timestamp")')
+        restore_definitions(cursor, LOG_ENTRY_TABLE, indexes, foreign_keys)
+
+
+def unpartition_logentry(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    old_table = f'{LOG_ENTRY_TABLE}_partitioned'
+    with schema_editor.connection.cursor() as cursor:
+        indexes, foreign_keys = table_definitions(cursor, LOG_ENTRY_TABLE)
+        cursor.execute(f'ALTER TABLE {LOG_ENTRY_TABLE} RENAME TO {old_table}')
+        cursor.execute(f'ALTER TABLE {old_table} ALTER COLUMN id DROP DEFAULT')
+        cursor.execute(f'DROP SEQUENCE {LOG_ENTRY_TABLE}_id_seq')
+        cursor.execute(f'CREATE TABLE {LOG_ENTRY_TABLE} (LIKE {old_table} INCLUDING CONSTRAINTS)')
+        cursor.execute(f'ALTER TABLE {LOG_ENTRY_TABLE} ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY')
+        cursor.execute(f'INSERT INTO {LOG_ENTRY_TABLE} SELECT * FROM {old_table}')
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence('{LOG_ENTRY_TABLE}', 'id'), coalesce(max(id), 0) + 1, false) "
+            f'FROM {LOG_ENTRY_TABLE}'
+        )
+        cursor.execute(f'DROP TABLE {old_table} CASCADE')
+        cursor.execute(f'ALTER TABLE {LOG_ENTRY_TABLE} ADD CONSTRAINT {LOG_ENTRY_TABLE}_pkey PRIMARY KEY (id)')
+        restore_definitions(cursor, LOG_ENTRY_TABLE, indexes, foreign_keys)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auditlog', '0015_alter_logentry_changes'),
+        ('common', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_logentry, unpartition_logentry, elidable=False),
+    ]
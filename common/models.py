@@ -0,0 +1,40 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - common/models.py
+'''
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+
+
+class HistoryCheckpoint(models.Model):
+    '''HistoryCheckpoint - the full (auditlog) field state of a BaseModel record at one history record
+
+    Checkpoints bound the cost of rebuilding a record "as of" a point in time (see common/history.py):
+    - the rebuild starts from the latest checkpoint at or before that time, and only replays the history after it
+    - checkpoints are written automatically when a rebuild had to replay many history records,
+      and can be written in bulk with: python manage.py history_checkpoints
+
+    Note: this is not a BaseModel (checkpoints are derived data, and are not soft deleted or audited)
+    '''
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, related_name='+')
+    object_id = models.BigIntegerField()
+    # the timestamp and id of the last auditlog LogEntry included in this checkpoint
+    timestamp = models.DateTimeField()
+    log_entry_id = models.BigIntegerField()
+    # field name to value (as stored in the auditlog), or None if the record did not exist (hard deleted)
+    state = models.JSONField(null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['content_type', 'object_id', '-timestamp'], name='common_hist_chkpt_obj_ts_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['content_type', 'object_id', 'log_entry_id'], name='common_hist_chkpt_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.content_type.model} {self.object_id} @ {self.timestamp}'
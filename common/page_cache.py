@@ -0,0 +1,236 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - common/page_cache.py
+
+Caching of rendered pages, in the default cache (see CACHES in settings.py).
+
+- AnonymousPageCacheMixin caches the whole page of a TemplateView for anonymous users, by path and language
+  (see pages/views.py)
+- pages of logged in users are rendered, with the header and navigation of _base.html cached as template fragments
+  (by language, and for the header by user and page), see templates/_base.html and common/context_processors.py
+- cached pages and fragments are keyed on the page cache version, which changes:
+    - when the templates, translations (.mo files) or the css and js (inlined or linked in the pages) change,
+      e.g. with a deploy (see templates_fingerprint)
+    - with python manage.py clear_page_cache (e.g. after a deploy that changed only settings), with a cache shared
+      by the server processes only: a local memory cache (the default) is per process, so the command can not
+      reach the running workers' caches (restart the workers instead)
+- settings.PAGE_CACHE_TIMEOUT: seconds pages and fragments are kept (0 to render every page)
+- both mixins also serve async views (see common/views.py AsyncTemplateView), reading the cache, user and data
+  with Django's async APIs (cache.aget, request.auser(), aaggregate)
+
+ConditionalPageMixin answers conditional GETs (If-None-Match / If-Modified-Since) with 304 Not Modified, before
+the page is rendered (or read from the page cache):
+- the ETag is a hash of the page cache version, language, path and the user (anonymous, or their id and last update)
+- pages of BaseModel data also list the models shown (last_modified_models), and their latest update
+  (including soft deletes) is the Last-Modified time, and part of the ETag
+'''
+import functools
+import hashlib
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+from django.http import HttpResponse
+from django.template.autoreload import get_template_directories
+from django.utils.cache import patch_cache_control
+from django.utils.translation import get_language
+from django.views.decorators.http import condition
+
+PAGE_CACHE_VERSION_KEY = 'page_cache:version'
+# files that change the rendered pages (the templates, compiled translations, and the css and js they inline or link)
+PAGE_SOURCE_SUFFIXES = ('.html', '.txt', '.mo', '.css', '.js')
+
+
+@functools.cache
+def templates_fingerprint():
+    '''Return a hash of the names, sizes and modification times of the page sources (once per process).'''
+    digest = hashlib.md5(usedforsecurity=False)
+    directories = [*get_template_directories(), *map(Path, settings.LOCALE_PATHS), *map(Path, settings.STATICFILES_DIRS)]
+    for directory in sorted(set(directories)):
+        for path in sorted(directory.rglob('*')):
+            if path.suffix in PAGE_SOURCE_SUFFIXES and path.is_file():
+                stat = path.stat()
+                digest.update(f'{path}:{stat.st_size}:{stat.st_mtime_ns}\n'.encode())
+    return digest.hexdigest()[:12]
+
+
+def page_cache_version():
+    '''Return the current page cache version (the templates fingerprint and the clear_page_cache token).'''
+    token = cache.get(PAGE_CACHE_VERSION_KEY)
+    if token is None:
+        token = uuid.uuid4().hex[:12]
+        if not cache.add(PAGE_CACHE_VERSION_KEY, token, None):
+            token = cache.get(PAGE_CACHE_VERSION_KEY, token) # (set by another process meanwhile)
+    return f'{templates_fingerprint()}.{token}'
+
+
+async def apage_cache_version():
+    '''page_cache_version for async code.'''
+    token = await cache.aget(PAGE_CACHE_VERSION_KEY)
+    if token is None:
+        token = uuid.uuid4().hex[:12]
+        if not await cache.aadd(PAGE_CACHE_VERSION_KEY, token, None):
+            token = await cache.aget(PAGE_CACHE_VERSION_KEY, token) # (set by another process meanwhile)
+    return f'{templates_fingerprint()}.{token}'
+
+
+def clear_page_cache():
+    '''Change the page cache version, so every cached page and fragment is rendered again.'''
+    cache.set(PAGE_CACHE_VERSION_KEY, uuid.uuid4().hex[:12], None)
+
+
+def page_cache_key(request, version=None):
+    '''Return the cache key of the page for request (by page cache version, language and path).'''
+    language = getattr(request, 'LANGUAGE_CODE', None) or get_language()
+    path = hashlib.md5(request.path.encode(), usedforsecurity=False).hexdigest()
+    return f'page_cache:page:{version or page_cache_version()}:{language}:{path}'
+
+
+def page_cacheable(request, user=None):
+    '''Return True if the page for request may be served from (and stored in) the page cache.
+
+    Only GET (and HEAD) requests without a query string of anonymous users are cached.
+    user: the request's user (default request.user), async code passes await request.auser()
+    '''
+    return bool(
+        settings.PAGE_CACHE_TIMEOUT
+        and request.method in ('GET', 'HEAD')
+        and not request.GET
+        and not (user or request.user).is_authenticated
+    )
+
+
+class AnonymousPageCacheMixin:
+    '''Serve a TemplateView's page to anonymous users from the page cache, storing it after it is first rendered.
+
+    Pages that set a cookie (e.g. use a CSRF token) or are not OK (200) are not stored.
+    '''
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.view_is_async:
+            return self.page_cache_adispatch(request, *args, **kwargs)
+        if not page_cacheable(request):
+            return super().dispatch(request, *args, **kwargs)
+        key = page_cache_key(request)
+        cached = cache.get(key)
+        if cached is not None:
+            return self.cached_response(cached)
+        response = super().dispatch(request, *args, **kwargs)
+        self.store_when_rendered(request, response, key)
+        return response
+
+    async def page_cache_adispatch(self, request, *args, **kwargs):
+        '''dispatch for async views.'''
+        dispatch = super().dispatch
+        if not page_cacheable(request, await request.auser()):
+            return await dispatch(request, *args, **kwargs)
+        key = page_cache_key(request, await apage_cache_version())
+        cached = await cache.aget(key)
+        if cached is not None:
+            return self.cached_response(cached)
+        response = await dispatch(request, *args, **kwargs)
+        self.store_when_rendered(request, response, key) # (rendered in a thread, after the view)
+        return response
+
+    @staticmethod
+    def cached_response(cached):
+        content, content_type = cached
+        return HttpResponse(content, content_type=content_type)
+
+    @staticmethod
+    def store_when_rendered(request, response, key):
+        '''Store the response in the page cache once it is rendered.'''
+
+        def store(response):
+            if response.status_code == 200 and not response.cookies and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE'):
+                cache.set(key, (response.content, response['Content-Type']), settings.PAGE_CACHE_TIMEOUT)
+
+        if hasattr(response, 'add_post_render_callback'):
+            response.add_post_render_callback(store)
+        else:
+            store(response)
+
+
+def last_updated(*models):
+    '''Return the latest updated time of the records of BaseModel models (including soft deleted), None if none.'''
+    times = [model.all_objects.aggregate(last_updated=Max('updated'))['last_updated'] for model in models]
+    return max((time for time in times if time is not None), default=None)
+
+
+async def alast_updated(*models):
+    '''last_updated for async code.'''
+    times = [(await model.all_objects.aaggregate(last_updated=Max('updated')))['last_updated'] for model in models]
+    return max((time for time in times if time is not None), default=None)
+
+
+def page_etag(request, user, version, last_modified):
+    '''Return the ETag of a page: a hash of the page cache version, language, path, user and data updates.'''
+    user_state = f'{user.pk}:{user.updated.isoformat()}' if user.is_authenticated else 'anonymous'
+    language = getattr(request, 'LANGUAGE_CODE', None) or get_language()
+    validators = [version, language, request.path, user_state, last_modified and last_modified.isoformat()]
+    return hashlib.md5(repr(validators).encode(), usedforsecurity=False).hexdigest()
+
+
+class ConditionalPageMixin:
+    '''Answer conditional GETs of a view with 304 Not Modified, from its ETag (and Last-Modified) validators.
+
+    - last_modified_models: the BaseModel models whose records the page shows
+    - responses are marked Cache-Control: no-cache, so browsers check them again (conditionally) on each visit
+    '''
+
+    last_modified_models = ()
+
+    def get_last_modified(self, request, *args, **kwargs):
+        '''Return the time the page last changed (None if it does not depend on data).'''
+        if not self.last_modified_models:
+            return None
+        if not hasattr(request, '_page_last_modified'): # (once per request, it is also part of the ETag)
+            request._page_last_modified = last_updated(*self.last_modified_models)
+        return request._page_last_modified
+
+    async def aget_last_modified(self, request, *args, **kwargs):
+        '''get_last_modified for async views.'''
+        if not self.last_modified_models:
+            return None
+        if not hasattr(request, '_page_last_modified'):
+            request._page_last_modified = await alast_updated(*self.last_modified_models)
+        return request._page_last_modified
+
+    def get_etag(self, request, *args, **kwargs):
+        '''Return the ETag of the page (see page_etag).'''
+        last_modified = self.get_last_modified(request, *args, **kwargs)
+        return page_etag(request, request.user, page_cache_version(), last_modified)
+
+    async def aget_etag(self, request, *args, **kwargs):
+        '''get_etag for async views.'''
+        last_modified = await self.aget_last_modified(request, *args, **kwargs)
+        return page_etag(request, await request.auser(), await apage_cache_version(), last_modified)
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.view_is_async:
+            return self.conditional_adispatch(request, *args, **kwargs)
+        view = condition(etag_func=self.get_etag, last_modified_func=self.get_last_modified)(super().dispatch)
+        response = view(request, *args, **kwargs)
+        patch_cache_control(response, no_cache=True)
+        return response
+
+    async def conditional_adispatch(self, request, *args, **kwargs):
+        '''dispatch for async views, with the validators read before (condition calls its functions synchronously).'''
+        dispatch = super().dispatch
+        last_modified = await self.aget_last_modified(request, *args, **kwargs)
+        etag = await self.aget_etag(request, *args, **kwargs)
+
+        async def view(request, *args, **kwargs):
+            return await dispatch(request, *args, **kwargs)
+
+        view = condition(
+            etag_func=lambda *args, **kwargs: etag, last_modified_func=lambda *args, **kwargs: last_modified,
+        )(view)
+        response = await view(request, *args, **kwargs)
+        patch_cache_control(response, no_cache=True)
+        return response
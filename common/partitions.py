@@ -0,0 +1,112 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - common/partitions.py
+
+Monthly (range) partitions of the auditlog LogEntry table on PostgreSQL.
+
+- the table is converted to a partitioned table by migration common/0002_partition_auditlog_logentry
+- partitions are named auditlog_logentry_pYYYY_MM, and hold the LogEntry records with timestamps in that month
+- records outside of the monthly partitions go to the auditlog_logentry_default partition
+- the functions use the default database's connection, unless given another (e.g. a migration's schema_editor.connection)
+- see: python manage.py auditlog_partitions --help
+'''
+import datetime
+import re
+
+from django.db import connection as default_connection
+
+LOG_ENTRY_TABLE = 'auditlog_logentry'
+DEFAULT_PARTITION = f'{LOG_ENTRY_TABLE}_default'
+PARTITION_NAME_RE = re.compile(rf'^{LOG_ENTRY_TABLE}_p(\d{{4}})_(\d{{2}})$')
+
+
+def month_start(value):
+    '''Return the first moment (UTC) of the month of value (a date or datetime).'''
+    return datetime.datetime(value.year, value.month, 1, tzinfo=datetime.timezone.utc)
+
+
+def next_month(value):
+    '''Return the first moment (UTC) of the month after the month of value.'''
+    return month_start(month_start(value) + datetime.timedelta(days=32))
+
+
+def partition_name(month):
+    '''Return the name of the partition for the month of month.'''
+    return f'{LOG_ENTRY_TABLE}_p{month.year:04d}_{month.month:02d}'
+
+
+def is_partitioned(connection=default_connection):
+    '''Return True if the LogEntry table is a partitioned table (PostgreSQL only).'''
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE relname = %s AND relkind = 'p'", [LOG_ENTRY_TABLE])
+        return cursor.fetchone() is not None
+
+
+def monthly_partitions(connection=default_connection):
+    '''Return a sorted list of (month start, partition name) for the attached monthly partitions.'''
+    with connection.cursor() as cursor:
+        cursor.execute('''
+            SELECT child.relname FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = %s
+        ''', [LOG_ENTRY_TABLE])
+        names = [row[0] for row in cursor.fetchall()]
+    partitions = []
+    for name in names:
+        match = PARTITION_NAME_RE.match(name)
+        if match:
+            partitions.append((datetime.datetime(int(match[1]), int(match[2]), 1, tzinfo=datetime.timezone.utc), name))
+    return sorted(partitions)
+
+
+def create_monthly_partition(month, connection=default_connection):
+    '''Create the partition for the month of month (if missing), and return its name.
+
+    Any records for that month already in the default partition are moved into the new partition.
+    '''
+    start, end = month_start(month), next_month(month)
+    name = partition_name(start)
+    if name in {partition for _month, partition in monthly_partitions(connection)}:
+        return name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE "timestamp" >= %s AND "timestamp" < %s)',
+            [start, end],
+        )
+        in_default = cursor.fetchone()[0]
+        if in_default:
+            # the default partition cannot hold rows for a new partition's range, so move them across
+            cursor.execute(f'ALTER TABLE {LOG_ENTRY_TABLE} DETACH PARTITION {DEFAULT_PARTITION}')
+        cursor.execute(
+            f'CREATE TABLE {name} PARTITION OF {LOG_ENTRY_TABLE} FOR VALUES FROM (%s) TO (%s)',
+            [start, end],
+        )
+        if in_default:
+            cursor.execute(
+                f'WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE "timestamp" >= %s AND "timestamp" < %s RETURNING *) '
+                f'INSERT INTO {LOG_ENTRY_TABLE} SELECT * FROM moved',
+                [start, end],
+            )
+            cursor.execute(f'ALTER TABLE {LOG_ENTRY_TABLE} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT')
+    return name
+
+
+def ensure_monthly_partitions(first_month, months_ahead, now, connection=default_connection):
+    '''Create the monthly partitions from first_month to months_ahead months after now, returning the names created.'''
+    created = []
+    existing = {partition for _month, partition in monthly_partitions(connection)}
+    month = month_start(first_month)
+    last = month_start(now)
+    for _ in range(months_ahead):
+        last = next_month(last)
+    while month <= last:
+        if partition_name(month) not in existing:
+            created.append(create_monthly_partition(month, connection))
+        month = next_month(month)
+    return created
@@ -0,0 +1,100 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - common/retention.py
+
+Hard delete (purge) of BaseModel records that have been soft deleted for longer than their model's retention period.
+
+- a model sets its retention period with soft_delete_retention (a timedelta, None to keep soft deleted records)
+- records are purged in small batches (in pk order), each in its own short transaction, with a pause between batches
+- a batch waits at most lock_timeout for its locks, and is skipped (left for the next run) if it can not get them
+- related records are deleted (or updated) by Django's delete cascade, as for any hard delete
+- auditlog is not written per record: one summary history record (action delete) is written per model purged
+- see: python manage.py purge_soft_deleted --help
+'''
+import time
+from collections import Counter
+
+from django.db import OperationalError, connection, transaction
+from django.utils import timezone
+from auditlog.cid import get_cid
+from auditlog.context import disable_auditlog
+from auditlog.models import LogEntry
+from auditlog.registry import auditlog
+from safedelete.config import HARD_DELETE
+
+from common.audit import auditlog_content_type
+from common.models import HistoryCheckpoint
+
+# postgresql error code for a lock_timeout
+LOCK_NOT_AVAILABLE = '55P03'
+
+
+class PurgeSummary:
+    '''The results of purging one model's expired soft deleted records.'''
+
+    def __init__(self, model, cutoff):
+        self.model = model
+        self.cutoff = cutoff
+        self.deleted = Counter() # model label: number of records deleted (including cascades)
+        self.batches = 0
+        self.skipped_batches = 0
+
+    @property
+    def purged(self):
+        '''The number of the model's own records purged.'''
+        return self.deleted[self.model._meta.label]
+
+
+def purge_soft_deleted(model, batch_size=500, pause=0.1, lock_timeout=1000, now=None):
+    '''Hard delete model's records that were soft deleted before now - model.soft_delete_retention.
+
+    Returns a PurgeSummary (also recorded in a summary history record if the model is audited and anything was purged).
+    '''
+    now = now or timezone.now()
+    summary = PurgeSummary(model, now - model.soft_delete_retention)
+    expired = model.deleted_objects.filter(deleted__lt=summary.cutoff).order_by('pk')
+    last_pk = None
+    while True:
+        batch = expired if last_pk is None else expired.filter(pk__gt=last_pk)
+        pks = list(batch.values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            break
+        if summary.batches or summary.skipped_batches:
+            time.sleep(pause)
+        try:
+            with transaction.atomic(), disable_auditlog():
+                if connection.vendor == 'postgresql':
+                    with connection.cursor() as cursor:
+                        cursor.execute(f"SET LOCAL lock_timeout = '{int(lock_timeout)}ms'")
+                # recheck the deleted time, in case a record was undeleted since the pks were read
+                _count, deleted = model.all_objects.filter(pk__in=pks, deleted__lt=summary.cutoff).delete(
+                    force_policy=HARD_DELETE,
+                )
+                HistoryCheckpoint.objects.filter(content_type=auditlog_content_type(model), object_id__in=pks).delete()
+            summary.deleted.update(deleted)
+            summary.batches += 1
+        except OperationalError as error:
+            if getattr(error.__cause__, 'sqlstate', None) != LOCK_NOT_AVAILABLE:
+                raise
+            # could not get the locks in time (e.g. the records are in use), leave this batch for the next run
+            summary.skipped_batches += 1
+        last_pk = pks[-1]
+
+    if summary.purged and auditlog.contains(model):
+        LogEntry.objects.create(
+            content_type=auditlog_content_type(model),
+            object_pk='',
+            object_repr=f'purged {summary.purged} soft deleted {model._meta.verbose_name_plural}',
+            action=LogEntry.Action.DELETE,
+            additional_data={
+                'purged': dict(summary.deleted),
+                'soft_deleted_before': summary.cutoff.isoformat(),
+                'batches': summary.batches,
+                'skipped_batches': summary.skipped_batches,
+            },
+            cid=get_cid(),
+        )
+    return summary
@@ -0,0 +1,177 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - common/routers.py
+
+Routing of reads to a read replica of the database (the 'replica' alias, see DATABASE_REPLICA in settings.py).
+
+ReplicaRouter sends writes to the primary ('default'), and reads to the replica, except:
+- reads pinned to a database (pin_database), e.g. with pin_database('default') to read data just written elsewhere
+- reads of records related to a record (its relations and history) go to the database the record was read from
+  (or saved to), so a record and its history are consistent (see BaseModel.rec_history_using)
+- reads in a transaction on the primary stay on the primary
+- reads soon after a write (for settings.DATABASE_REPLICA_STICKY_SECONDS) go to the primary, so a user sees their own
+  changes (read your writes) while the replica catches up:
+    - ReplicaStickinessMiddleware keeps this per user, with a cookie set on the responses of requests that wrote
+    - outside of requests (e.g. management commands), per thread
+Without a 'replica' database, the router leaves every query on 'default'.
+'''
+import contextlib
+import math
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_DB_ALIAS = 'replica'
+# the cookie holding the time (seconds since the epoch) until which the user's reads go to the primary
+STICKY_COOKIE_NAME = 'primary_db_until'
+
+# the database reads are pinned to (None: routed)
+_pinned_database = ContextVar('pinned_database', default=None)
+# the read your writes state of the current request (None outside of requests, see _thread_stickiness)
+_request_stickiness = ContextVar('request_stickiness', default=None)
+# the read your writes state outside of requests (per thread, each has its own context)
+_thread_stickiness = ContextVar('thread_stickiness', default=None)
+
+
+class Stickiness:
+    '''Until when reads go to the primary (after a write), and if there was a write.'''
+
+    def __init__(self, primary_until=0.0):
+        self.primary_until = primary_until
+        self.wrote = False
+
+    def write(self):
+        self.wrote = True
+        self.primary_until = time.time() + settings.DATABASE_REPLICA_STICKY_SECONDS
+
+    def sticky(self):
+        return time.time() < self.primary_until
+
+
+def current_stickiness():
+    '''Return the read your writes state of the current request (or of this thread, outside of requests).'''
+    stickiness = _request_stickiness.get()
+    if stickiness is None:
+        stickiness = _thread_stickiness.get()
+        if stickiness is None:
+            stickiness = Stickiness()
+            _thread_stickiness.set(stickiness)
+    return stickiness
+
+
+def has_replica():
+    return REPLICA_DB_ALIAS in connections.settings
+
+
+def pinned_database():
+    '''Return the database reads are pinned to (None if they are routed).'''
+    return _pinned_database.get()
+
+
+@contextlib.contextmanager
+def pin_database(alias=DEFAULT_DB_ALIAS):
+    '''Read from the database alias (default: the primary) in this block.
+
+    For Example:
+        with pin_database():
+            ... reads that must see the latest data ...
+    '''
+    token = _pinned_database.set(alias)
+    try:
+        yield
+    finally:
+        _pinned_database.reset(token)
+
+
+class ReplicaRouter:
+    '''Send reads to the replica (if there is one) and writes to the primary (see the module docstring).'''
+
+    def db_for_read(self, model, **hints):
+        if not has_replica():
+            return None
+        pinned = pinned_database()
+        if pinned is not None:
+            return pinned
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db is not None:
+            return instance._state.db
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block or current_stickiness().sticky():
+            return DEFAULT_DB_ALIAS
+        return REPLICA_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        if not has_replica():
+            return None
+        current_stickiness().write()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        '''Allow relations between records of the primary and the replica (they hold the same data).'''
+        databases = {DEFAULT_DB_ALIAS, REPLICA_DB_ALIAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaStickinessMiddleware:
+    """ Keeps a user's reads on the primary database for a while after they write (see common/routers.py)
+
+    - the time is kept in a cookie, set on the responses of requests that wrote to the database
+    - not used if there is no 'replica' database
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not has_replica():
+            return self.get_response(request)
+        stickiness = self.request_stickiness(request)
+        token = _request_stickiness.set(stickiness)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_stickiness.reset(token)
+        return self.set_cookie(response, stickiness)
+
+    async def __acall__(self, request):
+        if not has_replica():
+            return await self.get_response(request)
+        stickiness = self.request_stickiness(request)
+        token = _request_stickiness.set(stickiness)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_stickiness.reset(token)
+        return self.set_cookie(response, stickiness)
+
+    @staticmethod
+    def request_stickiness(request):
+        try:
+            primary_until = float(request.COOKIES.get(STICKY_COOKIE_NAME, 0))
+        except ValueError:
+            primary_until = 0.0
+        return Stickiness(primary_until)
+
+    @staticmethod
+    def set_cookie(response, stickiness):
+        if stickiness.wrote:
+            response.set_cookie(
+                STICKY_COOKIE_NAME, f'{stickiness.primary_until:.3f}',
+                max_age=math.ceil(settings.DATABASE_REPLICA_STICKY_SECONDS), httponly=True, samesite='Lax',
+            )
+        return response
@@ -0,0 +1,94 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - common/sessions/__init__.py
+
+Session engines that only write a session when its data has changed, or its expiry is due to be refreshed.
+
+Use these in settings.SESSION_ENGINE in place of the Django engines of the same name (see SESSION_MODE in settings.py):
+- common.sessions.db: the sessions in the database (django_session)
+- common.sessions.cached_db: the sessions in the database, read through the cache (so most requests do not query it)
+  (only with a cache shared by the server processes, see the common.E002 check in common/checks.py)
+- common.sessions.signed_cookies: the session data in a signed cookie (no database or cache use)
+
+Sessions expire SESSION_COOKIE_AGE after the user's last request (settings.SESSION_SAVE_EVERY_REQUEST), but:
+- a session is saved (its expiry refreshed) only when its data has changed since it was loaded, or it was last saved
+  at least settings.SESSION_REFRESH_SECONDS ago (the time is kept in the session, as SAVED_AT_KEY)
+- so an idle session may expire up to SESSION_REFRESH_SECONDS before SESSION_COOKIE_AGE after its last request
+Expired sessions are deleted from the database by: python manage.py purge_expired_sessions
+'''
+import copy
+import time
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.utils import timezone
+
+# the session data key holding the time (seconds since the epoch) the session was last saved
+SAVED_AT_KEY = '_session_saved_at'
+
+
+class LazySaveSessionMixin:
+    '''Skip saving a session that has not changed since it was loaded, until its expiry is due to be refreshed.'''
+
+    def load(self):
+        data = super().load()
+        self._loaded_data = copy.deepcopy(data)
+        return data
+
+    async def aload(self):
+        data = await super().aload()
+        self._loaded_data = copy.deepcopy(data)
+        return data
+
+    def save(self, must_create=False):
+        data = self._get_session(no_load=must_create)
+        if self.save_needed(data, must_create):
+            self.saving(data)
+            super().save(must_create=must_create)
+
+    async def asave(self, must_create=False):
+        data = await self._aget_session(no_load=must_create)
+        if self.save_needed(data, must_create):
+            self.saving(data)
+            await super().asave(must_create=must_create)
+
+    def save_needed(self, data, must_create):
+        '''Return True unless this is a loaded session, unchanged, and saved less than SESSION_REFRESH_SECONDS ago.'''
+        loaded = getattr(self, '_loaded_data', None)
+        if must_create or not self.session_key or loaded is None:
+            return True
+        if without_saved_at(data) != without_saved_at(loaded):
+            return True
+        return time.time() - loaded.get(SAVED_AT_KEY, 0) >= settings.SESSION_REFRESH_SECONDS
+
+    def saving(self, data):
+        data[SAVED_AT_KEY] = int(time.time())
+        self._loaded_data = copy.deepcopy(data)
+
+
+def without_saved_at(data):
+    return {key: value for key, value in data.items() if key != SAVED_AT_KEY}
+
+
+def purge_expired_sessions(batch_size=1000, pause=0.1, now=None):
+    '''Delete the sessions in the database that expired before now, batch_size at a time (pausing between batches).
+
+    Returns (the number of sessions deleted, the number of batches).
+    '''
+    now = now or timezone.now()
+    expired = Session.objects.filter(expire_date__lt=now)
+    purged = batches = 0
+    while True:
+        keys = list(expired.values_list('pk', flat=True)[:batch_size])
+        if not keys:
+            break
+        if batches:
+            time.sleep(pause)
+        # recheck the expiry, in case a session was saved since the keys were read
+        count, _deleted = expired.filter(pk__in=keys).delete()
+        purged += count
+        batches += 1
+    return purged, batches
@@ -0,0 +1,16 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - common/sessions/cached_db.py
+
+Django's cached_db session engine, saving only changed sessions (see common/sessions/__init__.py).
+'''
+from django.contrib.sessions.backends import cached_db
+
+from common.sessions import LazySaveSessionMixin
+
+
+class SessionStore(LazySaveSessionMixin, cached_db.SessionStore):
+    pass
@@ -0,0 +1,16 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - common/sessions/signed_cookies.py
+
+Django's signed_cookies session engine, saving only changed sessions (see common/sessions/__init__.py).
+'''
+from django.contrib.sessions.backends import signed_cookies
+
+from common.sessions import LazySaveSessionMixin
+
+
+class SessionStore(LazySaveSessionMixin, signed_cookies.SessionStore):
+    pass
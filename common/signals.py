@@ -0,0 +1,39 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - common/signals.py
+'''
+from pathlib import Path
+
+from auditlog.models import LogEntry
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils.autoreload import file_changed
+
+from common.metrics import record_auditlog_writes, record_query
+from common.page_cache import PAGE_SOURCE_SUFFIXES, templates_fingerprint
+
+
+@receiver(post_save, sender=LogEntry)
+def count_auditlog_write(sender, instance, created, **kwargs):
+    '''Count the history records saved (one at a time) in the request metrics (bulk writes are counted in common/audit.py).'''
+    if created:
+        record_auditlog_writes(1)
+
+
+@receiver(connection_created, dispatch_uid='count_request_queries')
+def count_request_queries(sender, connection, **kwargs):
+    '''Count the queries of requests on each database connection, as it connects (see common/metrics.py).'''
+    if record_query not in connection.execute_wrappers:
+        # first, so it is not removed by the end of an execute_wrapper() block it is connected in
+        connection.execute_wrappers.insert(0, record_query)
+
+
+@receiver(file_changed, dispatch_uid='page_cache_source_changed')
+def page_cache_source_changed(sender, file_path, **kwargs):
+    '''Change the page cache version when a template or translation changes under runserver (see common/page_cache.py).'''
+    if Path(file_path).suffix in PAGE_SOURCE_SUFFIXES:
+        templates_fingerprint.cache_clear()
@@ -0,0 +1,25 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - common/storage.py
+
+Storage of the css and js bundles built by django-compressor (see COMPRESS_STORAGE in settings.py).
+
+The bundles (e.g. CACHE/css/output.<content hash>.css) are written under STATIC_ROOT by python manage.py compress,
+after collectstatic, so WhiteNoise's CompressedManifestStaticFilesStorage does not see them. This storage writes
+their Brotli (.br, if the brotli package is installed) and gzip (.gz) variants, as WhiteNoise does for the other
+static files, so WhiteNoise serves them compressed (and, with their content hashed names, as immutable).
+'''
+from compressor.storage import CompressorFileStorage
+from whitenoise.compress import Compressor
+
+
+class PrecompressedCompressorFileStorage(CompressorFileStorage):
+    '''django-compressor's file storage, also writing Brotli and gzip variants of each file saved.'''
+
+    def save(self, filename, content):
+        filename = super().save(filename, content)
+        Compressor(quiet=True).compress(self.path(filename))
+        return filename
@@ -0,0 +1,44 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - common/templates.py
+
+Compile the site's templates as a server process starts (production template mode, see TEMPLATES in settings.py).
+
+With the cached template loader, each template is read and compiled on its first use, in each server process,
+so the first requests of every page pay for it. precompile_templates compiles (and caches) all of the templates
+in the project's template directories (templates/) up front.
+'''
+import logging
+from pathlib import Path
+
+from django.template import TemplateSyntaxError, engines
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_SUFFIXES = ('.html', '.txt')
+
+
+def precompile_templates(engine=None):
+    '''Compile the templates under the engine's template directories (DIRS) into its cached loader.
+
+    Returns the number of templates compiled. Templates that do not compile are logged (and compiled,
+    with the error, when first used).
+    '''
+    engine = engine or engines['django'].engine
+    if engine.debug:
+        return 0 # (development: templates are reloaded as they change)
+    count = 0
+    for directory in map(Path, engine.dirs):
+        for path in sorted(directory.rglob('*')):
+            if path.suffix not in TEMPLATE_SUFFIXES or not path.is_file():
+                continue
+            name = path.relative_to(directory).as_posix()
+            try:
+                engine.get_template(name)
+                count += 1
+            except TemplateSyntaxError as error:
+                logger.warning('template %s does not compile: %s', name, error, extra={'event': 'templates.invalid'})
+    return count
@@ -0,0 +1,33 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - common/templatetags/static_inline.py
+'''
+import functools
+from pathlib import Path
+
+from django import template
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.utils.safestring import mark_safe
+
+register = template.Library()
+
+
+@functools.cache
+def _static_content(path):
+    found = finders.find(path)
+    return Path(found).read_text().strip() if found else ''
+
+
+@register.simple_tag
+def inline_static(path):
+    '''Return the content of the static file path, to inline in a page ('' if there is no such file).
+
+    The content is read once per process (unless DEBUG), e.g. {% inline_static 'css/critical.css' as critical_css %}
+    '''
+    if settings.DEBUG:
+        _static_content.cache_clear()
+    return mark_safe(_static_content(path))
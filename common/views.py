@@ -0,0 +1,42 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - common/views.py
+'''
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.views.decorators.cache import never_cache
+from django.views.generic import TemplateView
+
+from common.metrics import REGISTRY
+
+
+@never_cache
+def metrics(request):
+    '''Return the request metrics of this process in the Prometheus text format (see common/metrics.py).
+
+    Allowed for staff users, requests with the header "Authorization: Bearer <settings.METRICS_TOKEN>"
+    (if METRICS_TOKEN is set), and requests from settings.METRICS_ALLOWED_IPS (none by default, as behind a reverse
+    proxy every request comes from the proxy's address).
+    '''
+    authorization = request.headers.get('Authorization', '')
+    token_ok = bool(settings.METRICS_TOKEN) and hmac.compare_digest(authorization, f'Bearer {settings.METRICS_TOKEN}')
+    if not (token_ok or request.user.is_staff or request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS):
+        return HttpResponseForbidden()
+    return HttpResponse(REGISTRY.exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class AsyncTemplateView(TemplateView):
+    '''A TemplateView that is an async view, for serving with ASGI (see settings.ASYNC_VIEWS and pages/urls.py).
+
+    The view (and the async dispatch of its mixins, e.g. common/page_cache.py) runs in the event loop,
+    and Django renders its TemplateResponse in a thread afterwards.
+    '''
+
+    async def get(self, request, *args, **kwargs):
+        context = self.get_context_data(**kwargs)
+        return self.render_to_response(context)
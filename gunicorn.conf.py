@@ -0,0 +1,30 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - gunicorn.conf.py
+
+gunicorn settings (read by gunicorn from the working directory, see the Dockerfile), by SERVER_MODE:
+- 'wsgi' (default): sync workers running healthy_meals/wsgi.py, each handling one request at a time
+- 'asgi': uvicorn workers running healthy_meals/asgi.py, each handling many requests at a time
+  (with the async page views, see ASYNC_VIEWS in settings.py), so a slow request does not hold up a whole worker
+
+- WEB_CONCURRENCY: the number of worker processes (default 2)
+- GUNICORN_BIND: the address to listen on (default :8000)
+- GUNICORN_TIMEOUT: seconds a worker may be silent before it is restarted (default 30)
+'''
+import decouple # (not 'from decouple import config', gunicorn would read config as its setting of that name)
+
+SERVER_MODE = decouple.config('SERVER_MODE', default='wsgi', cast=decouple.Choices(['wsgi', 'asgi']))
+
+if SERVER_MODE == 'asgi':
+    wsgi_app = 'healthy_meals.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+else:
+    wsgi_app = 'healthy_meals.wsgi:application'
+    worker_class = 'sync'
+
+bind = decouple.config('GUNICORN_BIND', default=':8000')
+workers = decouple.config('WEB_CONCURRENCY', default=2, cast=int)
+timeout = decouple.config('GUNICORN_TIMEOUT', default=30, cast=int)
@@ -5,3 +5,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "healthy_meals.settings")
 
 application = get_asgi_application()
+
+# compile the templates now, rather than in the first requests (production template mode, see common/templates.py)
+from common.templates import precompile_templates  # noqa: E402 (needs the Django setup above)
+
+precompile_templates()
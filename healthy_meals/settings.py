@@ -1,5 +1,5 @@
 from pathlib import Path
-from decouple import config
+from decouple import Choices, Csv, config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -36,6 +36,7 @@ INSTALLED_APPS = [
     "whitenoise.runserver_nostatic",
     "django.contrib.staticfiles",
     "django.contrib.sites",
+    "django.contrib.postgres", # PostgreSQL index operator classes (OpClass), see accounts/models.py
     # Third-party
     "allauth",
     "allauth.account",
@@ -46,6 +47,7 @@ INSTALLED_APPS = [
     "compressor", # https://www.accordbox.com/blog/how-use-scss-sass-your-django-project-python-way/
     "auditlog", # https://django-auditlog.readthedocs.io/en/latest/installation.html
     # Local
+    "common",
     "accounts",
     "pages",
 ]
@@ -53,18 +55,21 @@ INSTALLED_APPS = [
 # https://docs.djangoproject.com/en/dev/ref/settings/#middleware
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "common.middleware.MetricsMiddleware", # per request metrics (see METRICS_ENABLED below)
+    "common.routers.ReplicaStickinessMiddleware", # read your writes with a read replica (see DATABASE_REPLICA below)
     "whitenoise.middleware.WhiteNoiseMiddleware",  # WhiteNoise
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.locale.LocaleMiddleware",
     "django.middleware.common.CommonMiddleware",
     "debug_toolbar.middleware.DebugToolbarMiddleware",  # Django Debug Toolbar
     "django.middleware.csrf.CsrfViewMiddleware",
-    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "accounts.middleware.AuthenticationMiddleware", # Django's, keeping the sessions of the replaced auth backends
     "django.contrib.messages.middleware.MessageMiddleware",
     # "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "allauth.account.middleware.AccountMiddleware",  # django-allauth
     # all Request altering middleware need to be registered above/before auditlog middleware, e.g., Django's default middleware classes
-    "auditlog.middleware.AuditlogMiddleware", # https://django-auditlog.readthedocs.io/en/latest/installation.html
+    # AuditlogMiddleware with an optional request scoped audit log buffer (see AUDITLOG_BUFFERED below)
+    "common.middleware.BufferedAuditlogMiddleware", # https://django-auditlog.readthedocs.io/en/latest/installation.html
 ]
 
 # https://docs.djangoproject.com/en/dev/ref/settings/#root-urlconf
@@ -73,23 +78,55 @@ ROOT_URLCONF = "healthy_meals.urls"
 # https://docs.djangoproject.com/en/dev/ref/settings/#wsgi-application
 WSGI_APPLICATION = "healthy_meals.wsgi.application"
 
+# how gunicorn serves the site (see gunicorn.conf.py): 'wsgi' (sync workers, healthy_meals/wsgi.py)
+# or 'asgi' (uvicorn workers, healthy_meals/asgi.py, with the middleware checked for async support, see common/checks.py)
+SERVER_MODE = config('SERVER_MODE', default='wsgi', cast=Choices(['wsgi', 'asgi']))
+# serve the pages with async views (see pages/urls.py), which wait on the database and cache without holding a thread
+ASYNC_VIEWS = config('ASYNC_VIEWS', default=SERVER_MODE == 'asgi', cast=bool)
+
 # https://docs.djangoproject.com/en/dev/ref/settings/#templates
-TEMPLATES = [
-    {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
-        "DIRS": [BASE_DIR / "templates"],
-        "APP_DIRS": True,
-        "OPTIONS": {
-            "context_processors": [
-                "django.template.context_processors.debug",
-                "django.template.context_processors.request",
-                "django.contrib.auth.context_processors.auth",
-                "django.contrib.messages.context_processors.messages",
-            ],
-            "debug": True, # needed for https://github.com/nedbat/django_coverage_plugin
-        },
-    },
+# template debug information (node origins and line numbers) is needed for template error pages and for
+# https://github.com/nedbat/django_coverage_plugin (nox -s testing_cov sets TEMPLATE_DEBUG=True)
+TEMPLATE_DEBUG = config('TEMPLATE_DEBUG', default=DEBUG, cast=bool)
+TEMPLATE_CONTEXT_PROCESSORS = [
+    "django.template.context_processors.debug",
+    "django.template.context_processors.request",
+    "django.contrib.auth.context_processors.auth",
+    "django.contrib.messages.context_processors.messages",
+    "common.context_processors.page_cache", # page_cache.timeout and .version for {% cache %} fragments
 ]
+if TEMPLATE_DEBUG:
+    # development and test (coverage) mode
+    TEMPLATES = [
+        {
+            "BACKEND": "django.template.backends.django.DjangoTemplates",
+            "DIRS": [BASE_DIR / "templates"],
+            "APP_DIRS": True,
+            "OPTIONS": {
+                "context_processors": TEMPLATE_CONTEXT_PROCESSORS,
+                "debug": True,
+            },
+        },
+    ]
+else:
+    # production mode: compiled templates are kept (cached loader), and the templates under templates/
+    # are compiled as each server process starts (see healthy_meals/wsgi.py and common/templates.py)
+    TEMPLATES = [
+        {
+            "BACKEND": "django.template.backends.django.DjangoTemplates",
+            "DIRS": [BASE_DIR / "templates"],
+            "OPTIONS": {
+                "context_processors": TEMPLATE_CONTEXT_PROCESSORS,
+                "debug": False,
+                "loaders": [
+                    ("django.template.loaders.cached.Loader", [
+                        "django.template.loaders.filesystem.Loader",
+                        "django.template.loaders.app_directories.Loader",
+                    ]),
+                ],
+            },
+        },
+    ]
 
 # # https://docs.djangoproject.com/en/dev/ref/settings/#databases
 # DATABASES = {
@@ -99,6 +136,22 @@ TEMPLATES = [
 #     }
 # }
 
+# database connections, https://docs.djangoproject.com/en/dev/ref/databases/#connection-pool
+# each server process keeps a pool of open connections (psycopg_pool), the pool's use is in /metrics/ (common/metrics.py)
+DATABASE_POOL = config('DATABASE_POOL', default=True, cast=bool)
+# without the pool: seconds a connection is kept open for the next requests (0: a new connection for each request)
+DATABASE_CONN_MAX_AGE = config('DATABASE_CONN_MAX_AGE', default=0, cast=int)
+DATABASE_POOL_OPTIONS = {
+    # connections kept open, and the most opened when more requests need one at once
+    "min_size": config('DATABASE_POOL_MIN_SIZE', default=1, cast=int),
+    "max_size": config('DATABASE_POOL_MAX_SIZE', default=10, cast=int),
+    # seconds a request waits for a free connection before failing (psycopg_pool.PoolTimeout)
+    "timeout": config('DATABASE_POOL_TIMEOUT', default=10, cast=float),
+    # seconds a connection is used before it is replaced (recycled), and kept unused (above min_size) before closing
+    "max_lifetime": config('DATABASE_POOL_MAX_LIFETIME', default=1800, cast=float),
+    "max_idle": config('DATABASE_POOL_MAX_IDLE', default=300, cast=float),
+}
+
 # For Docker/PostgreSQL usage uncomment this and comment the DATABASES config above
 DATABASES = {
     "default": {
@@ -108,12 +161,48 @@ DATABASES = {
         "PASSWORD": config('DATABASE_PASSWORD'),
         "HOST": config('DATABASE_HOST'), # "db",  # set in docker-compose.yml
         "PORT": config('DATABASE_PORT'), # 5432,  # default postgres port
+        "CONN_MAX_AGE": 0 if DATABASE_POOL else DATABASE_CONN_MAX_AGE, # (the pool keeps its connections open)
+        # a pooled (or kept) connection is checked to be alive before a request uses it (e.g. after a database restart)
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {"pool": DATABASE_POOL_OPTIONS} if DATABASE_POOL else {},
         "TEST": {
             "NAME": config('TEST_DATABASE_NAME'),# Documentation Purposes and allowing for override
         }
     }
 }
 
+# a read replica of the database: reads go to the replica and writes to the primary (see common/routers.py)
+# (to try it locally with two databases, point DATABASE_REPLICA_NAME at a second database, migrated with:
+# python manage.py migrate --database replica)
+DATABASE_REPLICA = config('DATABASE_REPLICA', default=False, cast=bool)
+if DATABASE_REPLICA:
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "NAME": config('DATABASE_REPLICA_NAME', default=DATABASES["default"]["NAME"]),
+        "HOST": config('DATABASE_REPLICA_HOST', default=DATABASES["default"]["HOST"]),
+        "PORT": config('DATABASE_REPLICA_PORT', default=DATABASES["default"]["PORT"]),
+        "TEST": {
+            "NAME": config('TEST_DATABASE_REPLICA_NAME', default=f'{DATABASES["default"]["TEST"]["NAME"]}_replica'),
+        },
+    }
+DATABASE_ROUTERS = ["common.routers.ReplicaRouter"]
+# seconds a user's reads stay on the primary after they write, so they see their changes (longer than the replica lag)
+DATABASE_REPLICA_STICKY_SECONDS = config('DATABASE_REPLICA_STICKY_SECONDS', default=5, cast=float)
+
+# https://docs.djangoproject.com/en/dev/topics/auth/passwords/
+# Django's hashers, with PBKDF2 hashed in a process pool if PASSWORD_HASH_WORKERS is set (see accounts/hashers.py)
+PASSWORD_HASHERS = [
+    "accounts.hashers.PooledPBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+# processes to hash passwords in (0: hash in the request's thread), also runs login and signup off the request thread
+PASSWORD_HASH_WORKERS = config('PASSWORD_HASH_WORKERS', default=0, cast=int)
+# login and signup requests allowed to be hashing passwords at once (when PASSWORD_HASH_WORKERS is set)
+PASSWORD_HASH_CONCURRENCY = config('PASSWORD_HASH_CONCURRENCY', default=4, cast=int)
+
 # Password validation
 # https://docs.djangoproject.com/en/dev/ref/settings/#auth-password-validators
 AUTH_PASSWORD_VALIDATORS = [
@@ -178,6 +267,18 @@ STATICFILES_FINDERS = [
 COMPRESS_PRECOMPILERS = (
     # deprecated libsass removed from here - using installed dart-sass
 )
+# https://django-compressor.readthedocs.io/en/stable/settings.html
+# bundle and minify the css and js of the {% compress %} blocks (see templates/_base.html), unless DEBUG
+COMPRESS_ENABLED = config('COMPRESS_ENABLED', default=not DEBUG, cast=bool)
+# build the bundles ahead of time (python manage.py compress, see nox -s setupEnv), not in requests: it must be run
+# wherever the site is deployed with DEBUG=False, or {% compress %} raises OfflineGenerationError
+COMPRESS_OFFLINE = config('COMPRESS_OFFLINE', default=COMPRESS_ENABLED, cast=bool)
+COMPRESS_FILTERS = {
+    "css": ["compressor.filters.css_default.CssAbsoluteFilter", "compressor.filters.cssmin.rCSSMinFilter"],
+    "js": ["compressor.filters.jsmin.rJSMinFilter"],
+}
+# the bundles (CACHE/css/output.<content hash>.css) are written with .br and .gz variants (see common/storage.py)
+COMPRESS_STORAGE = "common.storage.PrecompressedCompressorFileStorage"
 
 # https://whitenoise.readthedocs.io/en/latest/django.html
 STORAGES = {
@@ -188,6 +289,8 @@ STORAGES = {
         "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
     },
 }
+# serve the content hashed static files (the manifest's name.<hash>.css, and the compressor bundles) as immutable
+WHITENOISE_IMMUTABLE_FILE_TEST = r"^.+\.[0-9a-f]{12}\.\w+$"
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/stable/ref/settings/#default-auto-field
@@ -212,6 +315,25 @@ INTERNAL_IPS = ["127.0.0.1"]
 # https://docs.djangoproject.com/en/dev/topics/auth/customizing/#substituting-a-custom-user-model
 AUTH_USER_MODEL = "accounts.CustomUser"
 
+# https://docs.djangoproject.com/en/dev/ref/settings/#caches
+# the common.cache backends count their hits and misses in the request metrics
+# the cache backend (see common/cache.py): common.cache.LocMemCache (per process), common.cache.FileBasedCache
+# (CACHE_LOCATION: a directory shared by the processes) or common.cache.RedisCache (CACHE_LOCATION: a redis:// url,
+# needs the redis package)
+CACHE_BACKEND = config('CACHE_BACKEND', default='common.cache.LocMemCache')
+# True if the cache is shared by the server processes (not a per process local memory cache), so that what one
+# process changes or deletes in it is seen by the others (the defaults of USER_CACHE_TIMEOUT and SESSION_MODE
+# depend on it)
+CACHE_SHARED = 'locmem' not in CACHE_BACKEND.lower()
+CACHES = {
+    "default": {
+        "BACKEND": CACHE_BACKEND,
+        "LOCATION": config('CACHE_LOCATION', default=''),
+    },
+}
+# seconds anonymous pages and the _base.html header fragments are cached (see common/page_cache.py), 0 for no caching
+PAGE_CACHE_TIMEOUT = config('PAGE_CACHE_TIMEOUT', default=600, cast=int)
+
 # django-allauth config
 # https://docs.djangoproject.com/en/dev/ref/settings/#site-id
 SITE_ID = 1
@@ -224,16 +346,82 @@ ACCOUNT_LOGOUT_REDIRECT_URL = "home"
 
 # https://django-allauth.readthedocs.io/en/latest/installation.html?highlight=backends
 AUTHENTICATION_BACKENDS = (
-    "django.contrib.auth.backends.ModelBackend",
-    "allauth.account.auth_backends.AuthenticationBackend",
+    "accounts.backends.ModelBackend", # Django's ModelBackend, with the session's user cached (see accounts/user_cache.py)
+    "accounts.backends.EmailAuthenticationBackend", # allauth's AuthenticationBackend, using the unique email index
 )
+# admin changelists of large tables (see common/admin.py) count with the planner's estimate above this many rows
+ADMIN_ESTIMATED_COUNT_THRESHOLD = config('ADMIN_ESTIMATED_COUNT_THRESHOLD', default=10000, cast=int)
+# keep the user of session authenticated requests in the cache for this many seconds (0: read them from the database)
+# by default only with a shared cache, as a user's changes (e.g. deactivation) must be seen by every server process
+USER_CACHE_TIMEOUT = config('USER_CACHE_TIMEOUT', default=300 if CACHE_SHARED else 0, cast=int)
 # https://django-allauth.readthedocs.io/en/latest/configuration.html
 ACCOUNT_SESSION_REMEMBER = True
 ACCOUNT_SIGNUP_PASSWORD_ENTER_TWICE = False
 ACCOUNT_USERNAME_REQUIRED = False
 ACCOUNT_AUTHENTICATION_METHOD = "email"
 ACCOUNT_EMAIL_REQUIRED = True
-ACCOUNT_UNIQUE_EMAIL = True # does not work at database level
+ACCOUNT_UNIQUE_EMAIL = True # at the database level by CustomUser's soft_delete_unique email index (any case)
+
+# https://docs.djangoproject.com/en/dev/topics/http/sessions/
+# the session engine (see common/sessions/__init__.py), by SESSION_MODE:
+# - 'cached_db' (default with a shared CACHE_BACKEND): the sessions in the database, read through the cache (CACHES,
+#   which must be shared by all server processes, e.g. redis, for a logout in one process to be seen by the others,
+#   the common.E002 check refuses it with a local memory cache)
+# - 'db' (default otherwise): the sessions in the database
+# - 'signed_cookies': the session data in a signed cookie (no database use, but a logout can not revoke a copied cookie)
+SESSION_MODE = config('SESSION_MODE', default='cached_db' if CACHE_SHARED else 'db',
+                      cast=Choices(['cached_db', 'db', 'signed_cookies']))
+SESSION_ENGINE = f'common.sessions.{SESSION_MODE}'
+# sessions expire SESSION_COOKIE_AGE after the user's last request, but an unchanged session is only saved (its
+# expiry refreshed) when it was last saved at least this many seconds ago
+SESSION_SAVE_EVERY_REQUEST = True
+SESSION_REFRESH_SECONDS = config('SESSION_REFRESH_SECONDS', default=3600, cast=int)
+
+# BaseModel record history audit log buffering (see common/audit.py and common/middleware.py)
+# write the history records of a request in batches (bulk_create) once their transaction has committed
+AUDITLOG_BUFFERED = config('AUDITLOG_BUFFERED', default=False, cast=bool)
+# write the buffered history records early when this many are waiting
+AUDITLOG_BUFFER_SIZE = config('AUDITLOG_BUFFER_SIZE', default=100, cast=int)
+
+# BaseModel record history (see common/history.py)
+# save a history checkpoint when rebuilding a record "as of" a time replays this many history records
+HISTORY_CHECKPOINT_INTERVAL = config('HISTORY_CHECKPOINT_INTERVAL', default=50, cast=int)
+
+# auditlog LogEntry monthly partitions and archives (see common/partitions.py and common/audit_archive.py)
+# create the monthly partitions this many months ahead (python manage.py auditlog_partitions)
+AUDITLOG_PARTITION_MONTHS_AHEAD = config('AUDITLOG_PARTITION_MONTHS_AHEAD', default=3, cast=int)
+# the directory the detached (old) monthly partitions are archived to, as compressed JSONL files
+AUDITLOG_ARCHIVE_DIR = config('AUDITLOG_ARCHIVE_DIR', default=str(BASE_DIR / 'archive' / 'auditlog'))
+
+# per request performance metrics (see common/metrics.py and common/middleware.py MetricsMiddleware)
+# record the wall time, SQL, template render, history record and cache costs of each request, by view
+METRICS_ENABLED = config('METRICS_ENABLED', default=True, cast=bool)
+# the metrics (/metrics/) are shown to staff, and requests with "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+# and to requests from these addresses (comma separated), e.g. a Prometheus server reaching the workers directly
+# (not behind a reverse proxy, from which every request would come)
+METRICS_ALLOWED_IPS = config('METRICS_ALLOWED_IPS', default='', cast=Csv())
+
+# https://docs.djangoproject.com/en/dev/topics/logging/
+# structured (JSON lines) logging to stderr, written from a background thread (see common/log.py)
+LOG_LEVEL = config('LOG_LEVEL', default='INFO')
+# log at most this many debug and info records a minute for each event (or message), 0 for no limit (warnings and
+# errors are never dropped)
+LOG_RATE_LIMIT = config('LOG_RATE_LIMIT', default=10, cast=int)
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "json": {"()": "common.log.JsonFormatter"},
+    },
+    "filters": {
+        "rate_limit": {"()": "common.log.RateLimitFilter", "rate": LOG_RATE_LIMIT, "interval": 60},
+    },
+    "handlers": {
+        "queue": {"class": "common.log.QueueStreamHandler", "formatter": "json", "filters": ["rate_limit"]},
+    },
+    "root": {"handlers": ["queue"], "level": LOG_LEVEL},
+}
 
 # https://docs.djangoproject.com/en/dev/ref/settings/#csrf-trusted-origins
 CSRF_TRUSTED_ORIGINS = [
@@ -2,9 +2,12 @@ from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 
+from common.views import metrics
+
 urlpatterns = [
     path("admin/", admin.site.urls),
-    path("accounts/", include("allauth.urls")),
+    path("accounts/", include("accounts.urls")), # allauth, see accounts/urls.py
+    path("metrics/", metrics, name="metrics"), # Prometheus request metrics, see common/metrics.py
     path("", include("pages.urls")),
 ]
 
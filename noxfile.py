@@ -40,8 +40,12 @@ def setupEnv(session):
     session.run("uv", "run", "python", "manage.py", "migrate")
     # convert all SCSS files to CSS
     session.run("uv", "run","sass", "static/scss:static/css")
+    # extract the css the first screen of the home page needs (inlined in _base.html), see common/critical_css.py
+    session.run("uv", "run", "python", "manage.py", "critical_css")
     # collect all static files to be deployed to the website
     session.run("uv", "run", "python", "manage.py", "collectstatic", "--noinput")
+    # bundle and minify the css and js of the templates (with .br and .gz variants), see COMPRESS_OFFLINE in settings.py
+    session.run("uv", "run", "python", "manage.py", "compress", "--force")
     # session.run("uv", "run", "rm", "-f", "dev-requirements.txt")
     session.run("uv", "run", "ls", "-al", "./docs/source/") # confirm docs source directory exists
 
@@ -180,6 +184,7 @@ def testing_cov(session):
         "--html=./docs/build/tests/index.html",
         "--tb=short", # output debug statements: https://docs.pytest.org/en/7.1.x/how-to/output.html
         # not logging: stdout=out, # output to ran_coverage.txt
+        env={"TEMPLATE_DEBUG": "True"}, # template coverage needs the template debug information
     ) # run tests with coverage
     session.run("uv", "run", "coverage", "xml",
         "-o", "./docs/build/coverage/coverage.xml", # xml output file
@@ -1,8 +1,16 @@
+from django.conf import settings
 from django.urls import path
 
-from .views import HomePageView, AboutPageView
+from . import views
 
-urlpatterns = [
-    path("", HomePageView.as_view(), name="home"),
-    path("about/", AboutPageView.as_view(), name="about"),
-]
+# with ASYNC_VIEWS (serving with ASGI), the pages are served by async views (see pages/views.py)
+if settings.ASYNC_VIEWS:
+    urlpatterns = [
+        path("", views.AsyncHomePageView.as_view(), name="home"),
+        path("about/", views.AsyncAboutPageView.as_view(), name="about"),
+    ]
+else:
+    urlpatterns = [
+        path("", views.HomePageView.as_view(), name="home"),
+        path("about/", views.AboutPageView.as_view(), name="about"),
+    ]
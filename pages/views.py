@@ -1,9 +1,21 @@
 from django.views.generic import TemplateView
 
+from common.page_cache import AnonymousPageCacheMixin, ConditionalPageMixin
+from common.views import AsyncTemplateView
 
-class HomePageView(TemplateView):
+
+class HomePageView(ConditionalPageMixin, AnonymousPageCacheMixin, TemplateView):
+    template_name = "pages/home.html"
+
+
+class AboutPageView(ConditionalPageMixin, AnonymousPageCacheMixin, TemplateView):
+    template_name = "pages/about.html"
+
+
+# async versions of the pages, used when serving with ASGI (settings.ASYNC_VIEWS, see pages/urls.py)
+class AsyncHomePageView(ConditionalPageMixin, AnonymousPageCacheMixin, AsyncTemplateView):
     template_name = "pages/home.html"
 
 
-class AboutPageView(TemplateView):
+class AsyncAboutPageView(ConditionalPageMixin, AnonymousPageCacheMixin, AsyncTemplateView):
     template_name = "pages/about.html"
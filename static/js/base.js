@@ -3,11 +3,10 @@
 /* *************************************************************************************
 window onload event handler function to unobtrusively link javascript events to javascript functions
 unobtrusive - no javascript is needed or being obtrusive in the HTML for javascript to function in the page
-html page should have a script tag in the header that looks like:
-  <script>
-    window.onload = pageOnLoad;
-  </script>
+this script is loaded with defer (it runs once the page is parsed, without blocking it), see templates/_base.html
 */
+window.addEventListener("load", pageOnLoad);
+
 function pageOnLoad() {
     // This function sets all of the event listeners for the elements on the web page
     // There should normally be only one window on load event handler, so combining of them may be necessary
@@ -109,6 +108,12 @@ function pageOnLoad() {
     htmlElems = document.getElementsByTagName("html");
     if (htmlElems.length == 1) {
       htmlElems[0].style.fontSize = fontSize;
+      // saved for the next pages, where it is applied in the head of the page (see templates/_base.html)
+      try {
+        localStorage.setItem("fontSize", fontSize);
+      } catch (error) {
+        console.log("unable to save the font size: " + error);
+      }
     } else {
       setErrorMsg("ERROR: unable to find the 'html' element!");
     }
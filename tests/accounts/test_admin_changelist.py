@@ -0,0 +1,91 @@
+import pytest
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts.admin import CustomUserAdmin
+from accounts.models import CustomUser
+
+from .factories import CustomUserFactory
+
+
+@pytest.fixture
+def admin_client(client):
+    client.force_login(CustomUserFactory.create(email='admin@example.com', is_staff=True, is_superuser=True))
+    return client
+
+
+@pytest.mark.django_db
+def test_changelist_counts_exactly_below_threshold(admin_client):
+    '''Ensure small user tables are counted (once) and paged by page number as usual'''
+    print('Starting test_admin_changelist.py::test_changelist_counts_exactly_below_threshold')
+    CustomUserFactory.create_batch(3)
+    with CaptureQueriesContext(connection) as queries:
+        response = admin_client.get(reverse('admin:accounts_customuser_changelist'))
+    assert response.status_code == 200
+    sql = [query['sql'] for query in queries.captured_queries]
+    assert len([statement for statement in sql if statement.startswith('EXPLAIN')]) == 1
+    assert len([statement for statement in sql if statement.startswith('SELECT COUNT(')]) == 1
+    assert response.context['cl'].keyset_field is None
+    assert response.context['cl'].result_count == 4
+
+
+@pytest.mark.django_db
+def test_changelist_keyset_paging_above_threshold(admin_client, monkeypatch):
+    '''Ensure large (estimated count) user tables are paged by the username of the last user of the page before
+
+        - the count is the planner's estimate
+        - the next page is the users after the last username (email) of this page
+    '''
+    print('Starting test_admin_changelist.py::test_changelist_keyset_paging_above_threshold')
+    for n in range(5):
+        CustomUserFactory.create(email=f'user{n}@example.com')
+    monkeypatch.setattr(CustomUserAdmin, 'list_per_page', 2)
+    url = reverse('admin:accounts_customuser_changelist')
+    with override_settings(ADMIN_ESTIMATED_COUNT_THRESHOLD=-1):
+        response = admin_client.get(url)
+        cl = response.context['cl']
+        assert cl.keyset_field == 'username'
+        assert [user.email for user in cl.result_list] == ['admin@example.com', 'user0@example.com']
+        assert cl.keyset_first_url is None
+        assert cl.keyset_next_url == '?after=user0%40example.com'
+        assert 'about' in response.content.decode()
+
+        emails = []
+        next_url = cl.keyset_next_url
+        while next_url:
+            cl = admin_client.get(url + next_url).context['cl']
+            assert cl.keyset_first_url == '?'
+            emails.extend(user.email for user in cl.result_list)
+            next_url = cl.keyset_next_url
+    assert emails == [f'user{n}@example.com' for n in range(1, 5)]
+
+
+@pytest.mark.django_db
+def test_changelist_search_by_email(admin_client):
+    '''Ensure users are searched by email: the start of the email for short terms, anywhere in it otherwise'''
+    print('Starting test_admin_changelist.py::test_changelist_search_by_email')
+    CustomUserFactory.create(email='carrot@example.com')
+    CustomUserFactory.create(email='parsnip@vegetables.com')
+    url = reverse('admin:accounts_customuser_changelist')
+
+    def search(term):
+        return sorted(user.email for user in admin_client.get(url, {'q': term}).context['cl'].result_list)
+
+    assert search('CA') == ['carrot@example.com']
+    assert search('ar') == [] # (a short term only matches the start of an email)
+    assert search('ARS') == ['parsnip@vegetables.com']
+    assert search('example') == ['admin@example.com', 'carrot@example.com']
+
+
+@pytest.mark.django_db
+def test_email_prefix_search_uses_index():
+    '''Ensure the email prefix (istartswith) search can use the email prefix index'''
+    print('Starting test_admin_changelist.py::test_email_prefix_search_uses_index')
+    CustomUserFactory.create_batch(20)
+    index = CustomUser._meta.indexes[-1].name # (the soft delete indexes are added last)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE accounts_customuser')
+        cursor.execute('SET LOCAL enable_seqscan = off')
+        assert index in CustomUser.objects.filter(email__istartswith='ca').explain()
@@ -0,0 +1,87 @@
+import datetime
+from io import StringIO
+
+import pytest
+from auditlog.models import LogEntry
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.utils import timezone
+
+from common import audit_archive
+from common.audit_archive import archive_manifests
+from common.models import HistoryCheckpoint
+from common.partitions import DEFAULT_PARTITION, monthly_partitions
+
+from .factories import CustomUserFactory
+
+
+@pytest.mark.django_db
+def test_auditlog_partitions_archive(tmp_path, monkeypatch):
+    '''Ensure old auditlog partitions are archived, and their history is still available to the rec_history_* accessors
+
+        - old history records (moved to the default partition) get their own monthly partition
+        - partitions older than --keep-months are archived to compressed JSONL files, and dropped
+        - rec_history_count and the rec_history_field_* accessors read the archived history when asked for it
+        - rec_as_of after the archived month still works (from the checkpoint saved when archiving)
+        - rec_as_of in (or without a checkpoint after) the archived month replays the archived history
+        - each record's archived history is read from its own gzip member
+    '''
+    print('Starting test_audit_archive.py::test_auditlog_partitions_archive')
+    monkeypatch.setattr(audit_archive, 'ARCHIVE_MEMBER_ROWS', 1)
+    other_user = CustomUserFactory.create(first_name='other')
+    user = CustomUserFactory.create(first_name='first')
+    user.first_name = 'second'
+    user.save()
+    user.first_name = 'third'
+    user.save()
+    # back date the creates and the first update (they move to the default partition)
+    old_times = [datetime.datetime(2020, 1, day, tzinfo=datetime.timezone.utc) for day in (1, 2)]
+    old_entries = list(LogEntry.objects.get_for_object(user).order_by('timestamp', 'id')[:2])
+    for old_entry, old_time in zip(old_entries, old_times):
+        LogEntry.objects.filter(pk=old_entry.pk).update(timestamp=old_time)
+    LogEntry.objects.get_for_object(other_user).update(timestamp=old_times[0])
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT count(*) FROM {DEFAULT_PARTITION}')
+        assert cursor.fetchone()[0] == 3
+        # the command commits new partitions before archiving, the test transaction checks the moved rows now instead
+        cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+    with override_settings(AUDITLOG_ARCHIVE_DIR=str(tmp_path)):
+        out = StringIO()
+        call_command('auditlog_partitions', '--keep-months', '1', stdout=out)
+        assert 'auditlog_logentry_p2020_01: 3 history records archived' in out.getvalue()
+        assert (tmp_path / 'auditlog_logentry_p2020_01.jsonl.gz').exists()
+        assert [manifest['rows'] for manifest in archive_manifests()] == [3]
+        assert len({offset for _rows, offset in archive_manifests()[0]['objects'].values()}) == 2
+        assert 'auditlog_logentry_p2020_01' not in [name for _month, name in monthly_partitions()]
+        assert LogEntry.objects.get_for_object(user).count() == 1
+
+        user = type(user).objects.get(pk=user.pk)
+        assert len(user.rec_history()) == 1
+        assert user.rec_history_count() == 3
+        assert user.rec_history_field_is_now(0, 'first_name') == 'third'
+        assert user.rec_history_field_was(1, 'first_name') == 'first'
+        assert user.rec_history_field_is_now(1, 'first_name') == 'second'
+        assert user.rec_history_field_is_now(2, 'first_name') == 'first'
+        assert user.rec_history_field_changed(2, 'email')
+        assert user.rec_history()[0].timestamp > old_times[1]
+        assert user.rec_history_archived()[1].timestamp == old_times[0]
+
+        # the checkpoint at the end of the archived month keeps as of rebuilds working
+        assert user.rec_as_of(datetime.datetime(2020, 3, 1, tzinfo=datetime.timezone.utc))['first_name'] == 'second'
+        assert user.rec_as_of(timezone.now())['first_name'] == 'third'
+        # in the archived month, and before it
+        assert user.rec_as_of(datetime.datetime(2020, 1, 1, 12, tzinfo=datetime.timezone.utc))['first_name'] == 'first'
+        assert user.rec_as_of(datetime.datetime(2019, 12, 31, tzinfo=datetime.timezone.utc)) is None
+        assert other_user.rec_as_of(timezone.now())['first_name'] == 'other'
+        # without the checkpoints (e.g. archived by an earlier version) the archived history is replayed
+        HistoryCheckpoint.objects.all().delete()
+        assert user.rec_as_of(datetime.datetime(2020, 3, 1, tzinfo=datetime.timezone.utc))['first_name'] == 'second'
+        assert user.rec_as_of(timezone.now())['first_name'] == 'third'
+        assert user.rec_as_of(timezone.now())['email'] == user.email
+
+        # nothing left to archive, and the upcoming partitions exist
+        out = StringIO()
+        call_command('auditlog_partitions', '--keep-months', '1', stdout=out)
+        assert out.getvalue() == '0 partitions created\n'
@@ -0,0 +1,89 @@
+import pytest
+from auditlog.models import LogEntry
+from django.db import transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+
+from accounts.models import CustomUser
+from common.audit import buffered_auditlog
+from common.middleware import BufferedAuditlogMiddleware
+
+from .factories import CustomUserFactory
+
+
+@pytest.mark.django_db
+def test_buffered_auditlog_matches_auditlog(django_capture_on_commit_callbacks):
+    '''Ensure buffered history records are the same as auditlog's, and are written with one insert
+
+        - nothing is written until the transaction commits
+        - the history (changes) are the same as written directly by auditlog
+    '''
+    print('Starting test_audit_buffer.py::test_buffered_auditlog_matches_auditlog')
+    direct_user = CustomUserFactory.create(first_name='direct')
+    direct_user.first_name = 'changed'
+    direct_user.save()
+    direct_user.delete()
+
+    # (the test runs in a transaction, so the on_commit callbacks are run at the end of the inner block)
+    with buffered_auditlog() as buffer:
+        with django_capture_on_commit_callbacks(execute=True):
+            buffered_user = CustomUserFactory.create(first_name='direct')
+            buffered_user.first_name = 'changed'
+            buffered_user.save()
+            buffered_user.delete()
+        assert not LogEntry.objects.filter(object_id=buffered_user.pk).exists()
+    assert buffer.flush_count == 1
+    assert buffer.written_count == 3
+
+    direct_history = [(rec.action, rec.changes_dict) for rec in direct_user.history.all()]
+    buffered_history = [(rec.action, rec.changes_dict) for rec in buffered_user.history.all()]
+    assert len(buffered_history) == len(direct_history) == 3
+    for (direct_action, direct_changes), (buffered_action, buffered_changes) in zip(direct_history, buffered_history):
+        assert direct_action == buffered_action
+        assert direct_changes.keys() == buffered_changes.keys()
+    assert buffered_user.rec_history_field_is_now(1, 'first_name') == 'changed'
+    assert buffered_user.rec_history_field_changed(0, 'deleted')
+
+
+@pytest.mark.django_db
+def test_buffered_auditlog_rollback_and_early_flush(django_capture_on_commit_callbacks):
+    '''Ensure history records of rolled back changes are dropped, and a full buffer is flushed early'''
+    print('Starting test_audit_buffer.py::test_buffered_auditlog_rollback_and_early_flush')
+    with buffered_auditlog(max_size=2) as buffer:
+        with django_capture_on_commit_callbacks(execute=True):
+            with pytest.raises(RuntimeError):
+                with transaction.atomic():
+                    CustomUserFactory.create()
+                    raise RuntimeError('roll back')
+            CustomUserFactory.create_batch(3)
+        # two were written early (max_size), the third waits for the end of the block
+        assert buffer.written_count == 2
+        assert len(buffer.pending) == 1
+    assert buffer.written_count == 3
+    assert LogEntry.objects.count() == 3 == CustomUser.objects.count()
+
+
+@pytest.mark.django_db
+@override_settings(AUDITLOG_BUFFERED=True)
+def test_buffered_auditlog_middleware(django_capture_on_commit_callbacks):
+    '''Ensure the request scoped buffer keeps the AuditlogMiddleware actor and remote address attribution'''
+    print('Starting test_audit_buffer.py::test_buffered_auditlog_middleware')
+    actor = CustomUserFactory.create()
+    users = CustomUserFactory.create_batch(2)
+
+    def view(request):
+        with django_capture_on_commit_callbacks(execute=True):
+            for user in users:
+                user.first_name = 'changed by request'
+                user.save()
+        # nothing is written until the end of the request
+        assert not LogEntry.objects.filter(actor=actor).exists()
+        return HttpResponse('ok')
+
+    request = RequestFactory().get('/', REMOTE_ADDR='10.1.2.3')
+    request.user = actor
+    response = BufferedAuditlogMiddleware(view)(request)
+    assert response.status_code == 200
+    log_entries = LogEntry.objects.filter(actor=actor)
+    assert log_entries.count() == 2
+    assert {log_entry.remote_addr for log_entry in log_entries} == {'10.1.2.3'}
@@ -0,0 +1,66 @@
+import pytest
+from auditlog.models import LogEntry
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from accounts.models import CustomUser
+
+from .factories import CustomUserFactory
+
+
+@pytest.mark.django_db
+def test_bulk_create_normalised_and_audited():
+    '''Ensure bulk_create sets username to email (as the pre_save signal does), and writes the history records
+
+        - the history records have the same changes as those of a user created by save
+        - the users and their history records are each written with one insert
+    '''
+    print('Starting test_bulk_writes.py::test_bulk_create_normalised_and_audited')
+    saved_user = CustomUserFactory.create()
+    users = CustomUserFactory.build_batch(5)
+    for user in users:
+        assert user.username != user.email
+    with CaptureQueriesContext(connection) as queries:
+        users = CustomUser.objects.bulk_create(users)
+    assert len([query for query in queries.captured_queries if query['sql'].startswith('INSERT')]) == 2
+
+    for user in CustomUser.objects.filter(pk__in=[user.pk for user in users]):
+        assert user.username == user.email
+    saved_changes = LogEntry.objects.get_for_object(saved_user).get().changes_dict
+    for user in users:
+        log_entry = LogEntry.objects.get_for_object(user).get()
+        assert log_entry.action == LogEntry.Action.CREATE
+        assert sorted(log_entry.changes_dict) == sorted(saved_changes)
+        assert log_entry.changes_dict['username'] == ['None', user.email]
+    assert users[0].rec_history_count() == 1
+
+
+@pytest.mark.django_db
+def test_bulk_update_normalised_and_audited():
+    '''Ensure bulk_update also updates the normalised username and the updated time, and writes the history records'''
+    print('Starting test_bulk_writes.py::test_bulk_update_normalised_and_audited')
+    users = CustomUserFactory.create_batch(4)
+    old_emails = [user.email for user in users]
+    old_updated = [user.updated for user in users]
+    for n, user in enumerate(users):
+        user.email = f'user{n}@example.com'
+        user.first_name = f'first {n}'
+        user.last_name = 'not updated'
+    with CaptureQueriesContext(connection) as queries:
+        assert CustomUser.objects.bulk_update(users, ['email', 'first_name']) == 4
+    # old records, update, history records
+    assert len(queries.captured_queries) == 3
+
+    for n, user in enumerate(CustomUser.objects.filter(pk__in=[user.pk for user in users]).order_by('pk')):
+        assert user.username == user.email == f'user{n}@example.com'
+        assert user.last_name != 'not updated'
+        assert user.updated > old_updated[n]
+        log_entry = LogEntry.objects.get_for_object(user).order_by('-timestamp', '-id').first()
+        assert log_entry.action == LogEntry.Action.UPDATE
+        assert log_entry.changes_dict == {
+            'email': [old_emails[n], user.email],
+            'username': [old_emails[n], user.email],
+            'first_name': [log_entry.changes_dict['first_name'][0], f'first {n}'],
+        }
+        assert 'updated' not in log_entry.changes_dict
+        assert user.rec_history_field_is_now(0, 'first_name') == f'first {n}'
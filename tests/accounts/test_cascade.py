@@ -0,0 +1,102 @@
+import pytest
+from allauth.account.models import EmailAddress
+from auditlog.context import set_actor
+from auditlog.models import LogEntry
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from safedelete.models import SafeDeleteModel
+
+from accounts.models import CustomUser
+
+from .factories import CustomUserFactory
+
+
+def make_user_with_related():
+    '''Return a user with an email address, and a history record of a change they made to another user.'''
+    user = CustomUserFactory.create()
+    EmailAddress.objects.create(user=user, email=user.email, primary=True)
+    other_user = CustomUserFactory.create()
+    with set_actor(user):
+        other_user.first_name = 'changed'
+        other_user.save()
+    return user, other_user
+
+
+@pytest.mark.django_db
+def test_bulk_cascade_matches_per_record_cascade():
+    '''Ensure the set based cascading soft delete gives the same results as safedelete's record at a time cascade
+
+        - the user is soft deleted (not by cascade), with one history record of the same changed fields
+        - related records that are not soft deletable are left alone (email address)
+        - SET_NULL foreign keys are updated (the actor of the history records they made)
+        - undeletes also give the same results
+    '''
+    print('Starting test_cascade.py::test_bulk_cascade_matches_per_record_cascade')
+    per_record_user, per_record_other = make_user_with_related()
+    bulk_user, bulk_other = make_user_with_related()
+
+    per_record_result = SafeDeleteModel.soft_delete_cascade_policy_action(per_record_user)
+    bulk_result = bulk_user.delete()
+    assert bulk_result == per_record_result == (1, {'accounts.CustomUser': 1})
+
+    results = []
+    for user, other_user in ((per_record_user, per_record_other), (bulk_user, bulk_other)):
+        user = CustomUser.all_objects.get(pk=user.pk)
+        delete_entry = LogEntry.objects.get_for_object(user).order_by('-timestamp', '-id').first()
+        results.append({
+            'deleted': user.deleted is not None,
+            'deleted_by_cascade': user.deleted_by_cascade,
+            'history_count': LogEntry.objects.get_for_object(user).count(),
+            'changed_fields': sorted(delete_entry.changes_dict),
+            'email_addresses': EmailAddress.objects.filter(user=user).count(),
+            'actors': list(LogEntry.objects.get_for_object(other_user).values_list('actor_id', flat=True)),
+        })
+    assert results[0] == results[1]
+    assert results[1]['deleted'] and not results[1]['deleted_by_cascade']
+    assert results[1]['changed_fields'] == ['deleted']
+    assert results[1]['actors'] == [None, None]
+    assert bulk_user.deleted is not None # the instance is updated too
+    assert bulk_user.rec_history_count() == 2
+
+    assert SafeDeleteModel.undelete(per_record_user) == bulk_user.undelete() == (1, {'accounts.CustomUser': 1})
+    undelete_changes = [
+        sorted(LogEntry.objects.get_for_object(user).order_by('-timestamp', '-id').first().changes_dict)
+        for user in (per_record_user, bulk_user)
+    ]
+    assert undelete_changes[0] == undelete_changes[1]
+    assert CustomUser.objects.filter(pk__in=[per_record_user.pk, bulk_user.pk]).count() == 2
+
+
+@pytest.mark.django_db
+def test_bulk_cascade_queryset_delete_and_undelete():
+    '''Ensure querysets soft delete and undelete a table at a time
+
+        - the number of queries does not depend on the number of records
+        - each record gets its history record, and the undelete restores the records
+    '''
+    print('Starting test_cascade.py::test_bulk_cascade_queryset_delete_and_undelete')
+    query_counts = []
+    for size in (2, 6):
+        users = CustomUserFactory.create_batch(size)
+        pks = [user.pk for user in users]
+        with CaptureQueriesContext(connection) as queries:
+            assert CustomUser.objects.filter(pk__in=pks).delete() == (size, {'accounts.CustomUser': size})
+        query_counts.append(len(queries.captured_queries))
+        assert CustomUser.deleted_objects.filter(pk__in=pks).count() == size
+        assert LogEntry.objects.filter(object_id__in=pks, action=LogEntry.Action.UPDATE).count() == size
+
+        assert CustomUser.deleted_objects.filter(pk__in=pks).undelete() == (size, {'accounts.CustomUser': size})
+        assert CustomUser.objects.filter(pk__in=pks).count() == size
+        assert LogEntry.objects.filter(object_id__in=pks, action=LogEntry.Action.UPDATE).count() == 2 * size
+        user = CustomUser.objects.get(pk=pks[0])
+        assert user.rec_history_field_is_now(0, 'deleted') == 'None'
+        assert user.rec_history_field_changed(1, 'deleted')
+    assert query_counts[0] == query_counts[1]
+
+    # a single record undelete
+    user = users[0]
+    user.delete()
+    assert user.undelete() == (1, {'accounts.CustomUser': 1})
+    assert user.deleted is None
+    with pytest.raises(AssertionError):
+        user.undelete()
@@ -0,0 +1,79 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, check_password, make_password
+from django.db import connections
+from django.test import override_settings
+
+from accounts.hashers import PooledPBKDF2PasswordHasher, shutdown_hash_pool
+from accounts.views import off_thread_view
+
+
+@pytest.fixture
+def hash_pool():
+    with override_settings(PASSWORD_HASH_WORKERS=1):
+        yield
+        shutdown_hash_pool()
+
+
+def test_pooled_hashes_match_django(hash_pool):
+    '''Ensure passwords hashed in the pool are the same as Django's PBKDF2 hashes, and check against them'''
+    print('Starting test_hashers.py::test_pooled_hashes_match_django')
+    pooled = PooledPBKDF2PasswordHasher().encode('pässword', 'somesalt', iterations=1000)
+    assert pooled == PBKDF2PasswordHasher().encode('pässword', 'somesalt', iterations=1000)
+    assert PooledPBKDF2PasswordHasher().verify('pässword', pooled)
+    assert not PooledPBKDF2PasswordHasher().verify('wrong', pooled)
+
+    encoded = make_password('pässword')
+    assert encoded.startswith('pbkdf2_sha256$')
+    assert check_password('pässword', encoded)
+
+
+@override_settings(PASSWORD_HASH_CONCURRENCY=2)
+def test_off_thread_views_are_limited():
+    '''Ensure the off thread (async) views run the view at most PASSWORD_HASH_CONCURRENCY at once'''
+    print('Starting test_hashers.py::test_off_thread_views_are_limited')
+    running = []
+    most_running = []
+    lock = threading.Lock()
+
+    def view(request):
+        with lock:
+            running.append(request)
+            most_running.append(len(running))
+        time.sleep(0.05)
+        with lock:
+            running.remove(request)
+        return request
+
+    async_view = off_thread_view(view)
+    assert asyncio.iscoroutinefunction(async_view)
+
+    async def requests():
+        return await asyncio.gather(*(async_view(n) for n in range(6)))
+
+    assert asyncio.run(requests()) == list(range(6))
+    assert max(most_running) == 2
+
+
+@pytest.mark.django_db(transaction=True)
+def test_off_thread_views_close_connections():
+    '''Ensure the database connections the off thread views open in the pool's threads are closed when they end'''
+    print('Starting test_hashers.py::test_off_thread_views_close_connections')
+    used = []
+
+    def view(request):
+        with connections['default'].cursor() as cursor:
+            cursor.execute('SELECT 1')
+        used.append(connections['default'])
+        return request
+
+    async_view = off_thread_view(view)
+
+    async def requests():
+        return await asyncio.gather(*(async_view(n) for n in range(4)))
+
+    assert asyncio.run(requests()) == list(range(4))
+    assert all(used_connection.connection is None for used_connection in used)
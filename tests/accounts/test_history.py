@@ -0,0 +1,156 @@
+from io import StringIO
+
+import pytest
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import CustomUser
+from common.models import HistoryCheckpoint
+
+from .factories import CustomUserFactory
+
+
+@pytest.mark.django_db
+def test_rec_history_snapshot_single_query(django_assert_num_queries):
+    '''Ensure the rec_history_* accessors share one history query per record
+
+        - all accessors for all fields read from the one history snapshot
+        - the snapshot is dropped (and reloaded) after a soft delete and an undelete
+    '''
+    print('Starting test_history.py::test_rec_history_snapshot_single_query')
+    user = CustomUserFactory.create()
+    field_names = ['email', 'username', 'first_name', 'last_name', 'deleted']
+
+    # one query for the history, no matter how many accessors or fields are used
+    with django_assert_num_queries(1):
+        assert user.rec_history_count() == 1
+        for field_name in field_names:
+            user.rec_history_field_was(0, field_name)
+            user.rec_history_field_is_now(0, field_name)
+            user.rec_history_field_changed(0, field_name)
+    assert user.rec_history_field_is_now(0, 'email') == user.email
+
+    # soft delete saves the record, so the snapshot is reloaded with the new history record
+    user.delete()
+    with django_assert_num_queries(1):
+        assert user.rec_history_count() == 2
+        assert user.rec_history_field_changed(0, 'deleted')
+        assert user.rec_history_field_was(0, 'deleted') == 'None'
+        assert not user.rec_history_field_changed(1, 'deleted')
+
+    # undelete also saves the record, so the snapshot is reloaded again
+    user.undelete()
+    assert user.rec_history_count() == 3
+    assert user.rec_history_field_is_now(0, 'deleted') == 'None'
+
+
+@pytest.mark.django_db
+def test_with_history_stats(django_assert_num_queries):
+    '''Ensure the history summary of a list of users is annotated in a single query
+
+        - history_count, history_last_changed and history_last_actor match the per record history
+        - records can be sorted by the history annotations
+    '''
+    print('Starting test_history.py::test_with_history_stats')
+    users = CustomUserFactory.create_batch(3)
+    users[0].first_name = 'changed'
+    users[0].save()
+    users[0].delete()
+    users[1].first_name = 'changed'
+    users[1].save()
+
+    with django_assert_num_queries(1):
+        annotated = list(CustomUser.all_objects.with_history_stats().order_by('-history_count', 'pk'))
+    assert [user.pk for user in annotated] == [users[0].pk, users[1].pk, users[2].pk]
+    assert [user.history_count for user in annotated] == [3, 2, 1]
+    for user in annotated:
+        assert user.history_last_changed == user.history.latest().timestamp
+        assert user.history_last_actor_id is None # no actor outside of a request
+        assert user.history_last_actor is None
+
+    # the default manager hides the soft deleted user
+    assert [user.history_count for user in CustomUser.objects.with_history_stats().order_by('pk')] == [2, 1]
+
+
+@pytest.mark.django_db
+def test_admin_changelist_history_columns(client):
+    '''Ensure the CustomUser admin changelist shows the history columns without per row queries'''
+    print('Starting test_history.py::test_admin_changelist_history_columns')
+    admin_user = CustomUserFactory.create(is_staff=True, is_superuser=True)
+    client.force_login(admin_user)
+    CustomUserFactory.create_batch(2)
+    # sort by the history count column
+    resp = client.get(reverse('admin:accounts_customuser_changelist'), {'o': '5'})
+    assert resp.status_code == 200
+    assert 'column-history_count' in resp.content.decode()
+
+    # the number of queries does not grow with the number of users listed
+    with CaptureQueriesContext(connection) as few_users:
+        client.get(reverse('admin:accounts_customuser_changelist'))
+    CustomUserFactory.create_batch(5)
+    with CaptureQueriesContext(connection) as more_users:
+        client.get(reverse('admin:accounts_customuser_changelist'))
+    assert len(more_users.captured_queries) == len(few_users.captured_queries)
+
+
+@pytest.mark.django_db
+def test_rec_as_of(django_assert_num_queries):
+    '''Ensure a record (and many records) can be rebuilt as they were at a point in time
+
+        - before creation the record did not exist (None)
+        - each change is seen from its time onwards, including the soft delete
+        - checkpoints are saved for long histories, and give the same results
+    '''
+    print('Starting test_history.py::test_rec_as_of')
+    before_create = timezone.now()
+    user = CustomUserFactory.create(first_name='first')
+    other_user = CustomUserFactory.create(first_name='other')
+    after_create = timezone.now()
+    user.first_name = 'second'
+    user.save()
+    after_update = timezone.now()
+    user.delete()
+
+    assert user.rec_as_of(before_create) is None
+    as_created = user.rec_as_of(after_create)
+    assert as_created['first_name'] == 'first'
+    assert as_created['email'] == user.email
+    assert as_created['deleted'] == 'None'
+    assert 'password' not in as_created # excluded from the auditlog
+    assert user.rec_as_of(after_update)['first_name'] == 'second'
+    assert user.rec_as_of(timezone.now())['deleted'] != 'None'
+
+    # bulk variant, including the soft deleted user
+    with django_assert_num_queries(3): # content type (cached afterwards), checkpoints, history
+        states = CustomUser.all_objects.as_of(after_create)
+    assert states[user.pk]['first_name'] == 'first'
+    assert states[other_user.pk]['first_name'] == 'other'
+    assert list(CustomUser.objects.as_of(after_update)) == [other_user.pk]
+
+    # a long history is checkpointed, and rebuilds from the checkpoint give the same result
+    for n in range(settings.HISTORY_CHECKPOINT_INTERVAL):
+        other_user.first_name = f'other {n}'
+        other_user.save()
+    assert not HistoryCheckpoint.objects.exists()
+    replayed = other_user.rec_as_of(timezone.now())
+    assert replayed['first_name'] == f'other {settings.HISTORY_CHECKPOINT_INTERVAL - 1}'
+    assert HistoryCheckpoint.objects.filter(object_id=other_user.pk).count() == 1
+    assert other_user.rec_as_of(timezone.now()) == replayed
+    assert other_user.rec_as_of(after_create)['first_name'] == 'other'
+
+
+@pytest.mark.django_db
+def test_history_checkpoints_command():
+    '''Ensure the history_checkpoints command checkpoints all audited records, including soft deleted ones'''
+    print('Starting test_history.py::test_history_checkpoints_command')
+    users = CustomUserFactory.create_batch(3)
+    users[0].delete()
+    out = StringIO()
+    call_command('history_checkpoints', '--batch-size', '2', stdout=out)
+    assert 'accounts.CustomUser: 3 records checked' in out.getvalue()
+    assert HistoryCheckpoint.objects.count() == 3
+    assert users[0].rec_as_of(timezone.now())['deleted'] != 'None'
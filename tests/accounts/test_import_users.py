@@ -0,0 +1,68 @@
+import json
+from io import StringIO
+
+import pytest
+from auditlog.models import LogEntry
+from django.contrib.auth.hashers import check_password
+from django.core.management import call_command
+
+from accounts.models import CustomUser
+
+from .factories import CustomUserFactory
+
+
+@pytest.mark.django_db
+def test_import_users(tmp_path):
+    '''Ensure users are imported normalised, with hashed passwords and history, skipping the rows that are not valid
+
+        - emails are lower cased, and the username is the email
+        - rows with an invalid email, a value too long for its field (e.g. an email longer than the username's
+          max_length), or the email of an existing (or earlier) user in any case, are skipped
+        - passwords are hashed (in the pool) as Django hashes them, users without a password can not log in by password
+    '''
+    print('Starting test_import_users.py::test_import_users')
+    CustomUserFactory.create(email='existing@example.com')
+    path = tmp_path / 'users.csv'
+    path.write_text(
+        'email,first_name,last_name,password\n'
+        'First@Example.com,First,User,first-Password\n'
+        'not an email,Bad,Email,\n'
+        'EXISTING@example.com,Existing,User,\n'
+        'first@example.COM,Duplicate,User,\n'
+        'second@example.com,Second,User,\n'
+        f'{"long" * 40}@example.com,Long,Email,\n'
+        f'third@example.com,{"Long" * 40},Name,\n'
+    )
+    out, err = StringIO(), StringIO()
+    call_command('import_users', str(path), '--chunk-size', '2', '--workers', '1', stdout=out, stderr=err)
+    assert '2 users imported, 5 rows skipped' in out.getvalue()
+    assert 'row 2: invalid email' in err.getvalue()
+    assert "row 3: a user with the email 'existing@example.com' exists" in err.getvalue()
+    assert "row 4: a user with the email 'first@example.com' exists" in err.getvalue()
+    assert 'row 6: invalid username Ensure this value has at most 150 characters' in err.getvalue()
+    assert 'row 7: invalid first_name Ensure this value has at most 150 characters' in err.getvalue()
+
+    first = CustomUser.objects.get(email='first@example.com')
+    assert first.username == 'first@example.com'
+    assert check_password('first-Password', first.password)
+    second = CustomUser.objects.get(email='second@example.com')
+    assert not second.has_usable_password()
+    assert LogEntry.objects.get_for_object(first).get().action == LogEntry.Action.CREATE
+    assert (tmp_path / 'users.csv.checkpoint').read_text() == '7'
+
+
+@pytest.mark.django_db
+def test_import_users_resumes_from_checkpoint(tmp_path):
+    '''Ensure an import resumes after the rows recorded in its checkpoint file (JSONL)'''
+    print('Starting test_import_users.py::test_import_users_resumes_from_checkpoint')
+    path = tmp_path / 'users.jsonl'
+    path.write_text(''.join(
+        json.dumps({'email': f'resume{n}@example.com', 'first_name': f'Resume {n}'}) + '\n' for n in range(5)
+    ))
+    (tmp_path / 'users.jsonl.checkpoint').write_text('3')
+    out = StringIO()
+    call_command('import_users', str(path), '--workers', '0', stdout=out)
+    assert 'resuming after row 3' in out.getvalue()
+    assert sorted(CustomUser.objects.filter(email__startswith='resume').values_list('email', flat=True)) == [
+        'resume3@example.com', 'resume4@example.com',
+    ]
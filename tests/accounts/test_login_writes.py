@@ -0,0 +1,71 @@
+import pytest
+from auditlog.models import LogEntry
+from django.db.models.signals import post_save
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import CustomUser
+
+from .factories import CustomUserFactory
+
+
+@pytest.mark.django_db
+def test_last_login_save_skips_audit_and_normalisation(django_assert_num_queries):
+    '''Ensure saves of only unaudited fields (e.g. last_login) are one UPDATE, with no history read or written
+
+        - auditlog does not read the old record (last_login is excluded from the history)
+        - the username is not normalised to the email (neither field is being saved)
+        - saves that include an audited field are still logged
+    '''
+    print('Starting test_login_writes.py::test_last_login_save_skips_audit_and_normalisation')
+    user = CustomUserFactory.create()
+    history_count = LogEntry.objects.get_for_object(user).count()
+    user.last_login = timezone.now()
+    user.username = 'not-the-email'
+    with django_assert_num_queries(1):
+        user.save(update_fields=['last_login'])
+    assert LogEntry.objects.get_for_object(user).count() == history_count
+    assert user.username == 'not-the-email'
+    assert CustomUser.objects.get(pk=user.pk).username == user.email
+
+    user.first_name = 'changed'
+    user.save(update_fields=['first_name', 'last_login'])
+    assert LogEntry.objects.get_for_object(user).count() == history_count + 1
+    assert user.rec_history_field_is_now(0, 'first_name') == 'changed'
+
+
+@pytest.mark.django_db
+def test_last_login_save_still_logs_other_saves():
+    '''Ensure the records saved by receivers of an unaudited (e.g. last_login) save still have their history written'''
+    print('Starting test_login_writes.py::test_last_login_save_still_logs_other_saves')
+    user, other = CustomUserFactory.create_batch(2)
+    other_history_count = LogEntry.objects.get_for_object(other).count()
+
+    def save_other(sender, instance, update_fields=None, **kwargs):
+        if instance.pk == user.pk:
+            other.first_name = 'saved by a receiver'
+            other.save()
+
+    post_save.connect(save_other, sender=CustomUser)
+    try:
+        user.last_login = timezone.now()
+        user.save(update_fields=['last_login'])
+    finally:
+        post_save.disconnect(save_other, sender=CustomUser)
+    assert LogEntry.objects.get_for_object(other).count() == other_history_count + 1
+    assert other.rec_history_field_is_now(0, 'first_name') == 'saved by a receiver'
+
+
+@pytest.mark.django_db
+def test_login_writes_no_history(client):
+    '''Ensure logging in sets last_login without writing a history record'''
+    print('Starting test_login_writes.py::test_login_writes_no_history')
+    user = CustomUserFactory.create()
+    user.set_password('login-password')
+    user.save()
+    history_count = LogEntry.objects.get_for_object(user).count()
+    response = client.post(reverse('account_login'), {'login': user.email, 'password': 'login-password'})
+    assert response.status_code == 302
+    user.refresh_from_db()
+    assert user.last_login is not None
+    assert LogEntry.objects.get_for_object(user).count() == history_count
@@ -0,0 +1,156 @@
+import json
+import logging
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.urls import reverse
+from psycopg_pool import PoolTimeout
+
+from common.log import JsonFormatter, RateLimitFilter
+from common.metrics import REGISTRY, RequestMetrics, reset_request_metrics, set_request_metrics
+
+from .factories import CustomUserFactory
+
+
+@pytest.fixture
+def registry():
+    REGISTRY.reset()
+    yield REGISTRY
+    REGISTRY.reset()
+
+
+@pytest.mark.django_db
+def test_request_metrics_by_view(client, registry):
+    '''Ensure the metrics middleware records the costs of each request by view name
+
+        - requests, wall time and SQL queries are recorded for each view
+        - template render time is recorded for template (TemplateResponse) views (not for pages from the page cache)
+        - history records written during the request are counted
+    '''
+    print('Starting test_metrics.py::test_request_metrics_by_view')
+    client.get(reverse('home'))
+    client.get(reverse('home'))
+    assert registry.requests.values['home'] == 2
+    assert registry.request_seconds.values['home'][-1] == 2
+    assert registry.template_seconds.values['home'][-1] == 1
+    assert registry.cache_hits.values['home'] >= 1
+
+    # signing up creates the user (one history record)
+    response = client.post(reverse('account_signup'), {'email': 'metrics@example.com', 'password1': 'Metrics-pw-2025'})
+    assert response.status_code == 302
+    assert registry.db_queries.values['account_signup'][-2] > 0 # sum of the queries
+    assert registry.auditlog_writes.values['account_signup'] == 1
+
+
+def test_request_metrics_count_cache_lookups():
+    '''Ensure cache lookups are counted as hits and misses (get_many lookups only once)'''
+    print('Starting test_metrics.py::test_request_metrics_count_cache_lookups')
+    request_metrics = RequestMetrics()
+    token = set_request_metrics(request_metrics)
+    try:
+        cache.set('metrics-test', 1)
+        assert cache.get('metrics-test') == 1
+        assert cache.get('metrics-test-missing', 'default') == 'default'
+        assert cache.get_many(['metrics-test', 'metrics-test-missing']) == {'metrics-test': 1}
+    finally:
+        reset_request_metrics(token)
+        cache.delete('metrics-test')
+    assert (request_metrics.cache_hits, request_metrics.cache_misses) == (2, 2)
+
+
+@pytest.mark.django_db
+def test_metrics_endpoint(client, registry):
+    '''Ensure /metrics/ returns the Prometheus text format, only to staff, with the token or to allowed ips'''
+    print('Starting test_metrics.py::test_metrics_endpoint')
+    client.get(reverse('home'))
+    assert client.get('/metrics/', REMOTE_ADDR='10.1.2.3').status_code == 403
+    assert client.get('/metrics/').status_code == 403 # (127.0.0.1 is not allowed, e.g. behind a local proxy)
+
+    with override_settings(METRICS_ALLOWED_IPS=['127.0.0.1']):
+        response = client.get('/metrics/') # (the test client's address is 127.0.0.1)
+    assert response.status_code == 200
+    assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+    text = response.content.decode()
+    assert '# TYPE healthy_meals_request_duration_seconds histogram' in text
+    assert 'healthy_meals_requests_total{view="home"} 1' in text
+    assert 'healthy_meals_request_duration_seconds_bucket{view="home",le="+Inf"} 1' in text
+
+    with override_settings(METRICS_TOKEN='secret'):
+        assert client.get('/metrics/', REMOTE_ADDR='10.1.2.3', HTTP_AUTHORIZATION='Bearer wrong').status_code == 403
+        assert client.get('/metrics/', REMOTE_ADDR='10.1.2.3', HTTP_AUTHORIZATION='Bearer secret').status_code == 200
+
+    client.force_login(CustomUserFactory.create(is_staff=True))
+    assert client.get('/metrics/', REMOTE_ADDR='10.1.2.3').status_code == 200
+
+
+def test_structured_rate_limited_logging():
+    '''Ensure log records are formatted as JSON (with their extra fields), and rate limited by event'''
+    print('Starting test_metrics.py::test_structured_rate_limited_logging')
+    logger = logging.getLogger('tests.metrics')
+    records = []
+    for user_id in range(5):
+        records.append(logger.makeRecord(
+            logger.name, logging.INFO, __file__, 1, 'missing full name', None, None,
+            extra={'event': 'user.name_missing', 'user_id': user_id},
+        ))
+    entry = json.loads(JsonFormatter().format(records[0]))
+    assert entry['level'] == 'INFO'
+    assert entry['message'] == 'missing full name'
+    assert (entry['event'], entry['user_id']) == ('user.name_missing', 0)
+
+    rate_limit = RateLimitFilter(rate=2, interval=60)
+    assert [rate_limit.filter(record) for record in records] == [True, True, False, False, False]
+    # the next interval lets records through again, with the number dropped
+    rate_limit.windows[('tests.metrics', 'user.name_missing')][0] -= 60
+    assert rate_limit.filter(records[0])
+    assert records[0].suppressed == 3
+
+
+def test_rate_limited_logging_keeps_errors():
+    '''Ensure warnings and errors are never dropped by the rate limit (e.g. the 500 tracebacks of django.request)'''
+    print('Starting test_metrics.py::test_rate_limited_logging_keeps_errors')
+    logger = logging.getLogger('django.request')
+    rate_limit = RateLimitFilter(rate=2, interval=60)
+    for level in (logging.ERROR, logging.WARNING):
+        records = [
+            logger.makeRecord(logger.name, level, __file__, 1, 'Internal Server Error: %s', (f'/page/{n}/',), None)
+            for n in range(5)
+        ]
+        assert all(rate_limit.filter(record) for record in records)
+    assert rate_limit.windows == {}
+
+
+@pytest.mark.django_db
+def test_metrics_database_pool(client, settings):
+    '''Ensure the database connection pool's use and exhaustion are in the metrics
+
+        - connections taken from the pool, and the requests for a connection that timed out (the pool was exhausted)
+    '''
+    print('Starting test_metrics.py::test_metrics_database_pool')
+    settings.METRICS_ALLOWED_IPS = ['127.0.0.1']
+    pool = connection.pool
+    client.get(reverse('home'))
+    text = client.get('/metrics/').content.decode()
+    assert '# TYPE healthy_meals_db_pool_connections gauge' in text
+    requests = pool.get_stats()['requests_num']
+    assert f'healthy_meals_db_pool_requests_total{{database="default"}} {requests}' in text
+
+    # take every connection, so the next request for one times out
+    taken = []
+    try:
+        while len(taken) < pool.max_size:
+            taken.append(pool.getconn(timeout=1))
+    except PoolTimeout:
+        pass
+    try:
+        with pytest.raises(PoolTimeout):
+            pool.getconn(timeout=0.1)
+    finally:
+        for pool_connection in taken:
+            pool.putconn(pool_connection)
+    timeouts = pool.get_stats()['requests_errors']
+    assert timeouts >= 1
+    text = client.get('/metrics/').content.decode()
+    assert f'healthy_meals_db_pool_timeouts_total{{database="default"}} {timeouts}' in text
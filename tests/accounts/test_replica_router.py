@@ -0,0 +1,94 @@
+'''tests of the read replica routing (common/routers.py)
+
+The replica tests need two databases, run them with: DATABASE_REPLICA=True pytest tests/accounts/test_replica_router.py
+(the replica test database is a second, empty, copy of the schema, so reads routed to it do not find new records)
+'''
+import pytest
+from django.conf import settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import CustomUser
+from common.routers import STICKY_COOKIE_NAME, ReplicaRouter, pin_database
+
+from .factories import CustomUserFactory
+
+requires_replica = pytest.mark.skipif(
+    'replica' not in settings.DATABASES, reason='needs a replica database (DATABASE_REPLICA=True)',
+)
+
+
+@pytest.mark.skipif('replica' in settings.DATABASES, reason='without a replica database only')
+@pytest.mark.django_db
+def test_without_replica(client):
+    '''Ensure every query stays on the default database when there is no replica'''
+    print('Starting test_replica_router.py::test_without_replica')
+    user = CustomUserFactory.create()
+    assert ReplicaRouter().db_for_read(CustomUser) is None
+    assert ReplicaRouter().db_for_write(CustomUser) is None
+    assert CustomUser.objects.all().db == 'default'
+    with pin_database('default'):
+        assert CustomUser.objects.all().db == 'default'
+    assert user.rec_history_using() == 'default'
+    assert STICKY_COOKIE_NAME not in client.get(reverse('home')).cookies
+
+
+@requires_replica
+@pytest.mark.django_db(databases=['default', 'replica'], transaction=True)
+def test_reads_go_to_replica(settings):
+    '''Ensure reads go to the replica and writes to the primary
+
+        - reads pinned to the primary, and reads soon after a write (read your writes), go to the primary
+    '''
+    print('Starting test_replica_router.py::test_reads_go_to_replica')
+    settings.DATABASE_REPLICA_STICKY_SECONDS = 0
+    user = CustomUserFactory.create()
+    assert user._state.db == 'default'
+    assert CustomUser.objects.all().db == 'replica'
+    assert not CustomUser.objects.filter(pk=user.pk).exists() # (not on the replica)
+    with pin_database():
+        assert CustomUser.objects.filter(pk=user.pk).exists()
+
+    settings.DATABASE_REPLICA_STICKY_SECONDS = 60
+    user.first_name = 'Sticky'
+    user.save()
+    assert CustomUser.objects.all().db == 'default'
+    assert CustomUser.objects.get(pk=user.pk).first_name == 'Sticky'
+
+
+@requires_replica
+@pytest.mark.django_db(databases=['default', 'replica'], transaction=True)
+def test_rec_history_pinned(settings):
+    '''Ensure the rec_history_* accessors read a record's history from the database the record came from'''
+    print('Starting test_replica_router.py::test_rec_history_pinned')
+    settings.DATABASE_REPLICA_STICKY_SECONDS = 0
+    user = CustomUserFactory.create()
+    assert user.rec_history_using() == 'default'
+    assert user.rec_history_count() == 1
+    assert user.rec_as_of(timezone.now())['email'] == user.email
+
+    user.rec_history_reset()
+    with pin_database('replica'):
+        assert user.rec_history_using() == 'replica'
+        assert user.rec_history_count() == 0 # (not on the replica)
+        assert user.rec_as_of(timezone.now()) is None
+
+
+@requires_replica
+@pytest.mark.django_db(databases=['default', 'replica'], transaction=True)
+def test_stickiness_cookie(client, settings):
+    '''Ensure a user's requests read from the primary for a while after a request of theirs wrote
+
+        - the signup response sets the cookie, so the next page reads the new session from the primary
+        - without the cookie the session is read from the replica (which does not have it)
+    '''
+    print('Starting test_replica_router.py::test_stickiness_cookie')
+    settings.SESSION_ENGINE = 'common.sessions.db' # (read each time from the database, not the cache)
+    settings.DATABASE_REPLICA_STICKY_SECONDS = 60
+    response = client.post(reverse('account_signup'), {'email': 'replica@example.com', 'password1': 'Replica-pw-2025'})
+    assert response.status_code == 302
+    assert response.cookies[STICKY_COOKIE_NAME]['max-age'] == 60
+    assert b'tsm_name_email' in client.get(reverse('home')).content
+
+    del client.cookies[STICKY_COOKIE_NAME]
+    assert b'tsm_name_email' not in client.get(reverse('home')).content
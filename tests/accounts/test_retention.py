@@ -0,0 +1,64 @@
+import datetime
+from io import StringIO
+
+import pytest
+from allauth.account.models import EmailAddress
+from auditlog.models import LogEntry
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.utils import timezone
+
+from accounts.models import CustomUser
+from common.models import HistoryCheckpoint
+
+from .factories import CustomUserFactory
+
+
+@pytest.mark.django_db
+def test_purge_soft_deleted_users():
+    '''Ensure users soft deleted longer ago than the retention period are purged (hard deleted) in batches
+
+        - recently soft deleted and active users are kept
+        - related records are removed by the delete cascade (email addresses, history checkpoints)
+        - one summary history record is written, rather than one per purged user
+    '''
+    print('Starting test_retention.py::test_purge_soft_deleted_users')
+    expired_users = CustomUserFactory.create_batch(3)
+    recent_user, active_user = CustomUserFactory.create_batch(2)
+    for user in [*expired_users, recent_user]:
+        EmailAddress.objects.create(user=user, email=user.email)
+        user.delete()
+    expired_pks = [user.pk for user in expired_users]
+    long_ago = timezone.now() - CustomUser.soft_delete_retention - datetime.timedelta(days=1)
+    CustomUser.all_objects.filter(pk__in=expired_pks).update(deleted=long_ago)
+    HistoryCheckpoint.objects.bulk_create([
+        HistoryCheckpoint(
+            content_type=ContentType.objects.get_for_model(CustomUser),
+            object_id=user.pk, timestamp=timezone.now(), log_entry_id=0, state={},
+        )
+        for user in [*expired_users, recent_user]
+    ])
+    log_entries_before = LogEntry.objects.count()
+
+    out = StringIO()
+    call_command('purge_soft_deleted', 'accounts.CustomUser', '--batch-size', '2', '--pause', '0', stdout=out)
+    assert 'accounts.CustomUser: 3 records purged (6 including related records) in 2 batches, 0 skipped' in out.getvalue()
+
+    assert not CustomUser.all_objects.filter(pk__in=expired_pks).exists()
+    assert CustomUser.deleted_objects.filter(pk=recent_user.pk).exists()
+    assert CustomUser.objects.filter(pk=active_user.pk).exists()
+    assert not EmailAddress.objects.filter(user_id__in=expired_pks).exists()
+    assert not HistoryCheckpoint.objects.filter(object_id__in=expired_pks).exists()
+    assert HistoryCheckpoint.objects.filter(object_id=recent_user.pk).exists()
+
+    assert LogEntry.objects.count() == log_entries_before + 1
+    summary = LogEntry.objects.latest('timestamp')
+    assert summary.action == LogEntry.Action.DELETE
+    assert summary.additional_data['purged'] == {'accounts.CustomUser': 3, 'account.EmailAddress': 3}
+    assert summary.additional_data['batches'] == 2
+
+    # nothing more to purge
+    out = StringIO()
+    call_command('purge_soft_deleted', stdout=out)
+    assert 'accounts.CustomUser: 0 records purged' in out.getvalue()
+    assert LogEntry.objects.count() == log_entries_before + 1
@@ -0,0 +1,124 @@
+import datetime
+from io import StringIO
+
+import pytest
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from common.checks import check_shared_cache
+from common.sessions import SAVED_AT_KEY, signed_cookies
+from common.sessions.db import SessionStore
+
+from .factories import CustomUserFactory
+
+
+def session_queries(client, times=3):
+    '''Request the about page times, returning the SQL of the queries of the django_session table.'''
+    with CaptureQueriesContext(connection) as queries:
+        for _ in range(times):
+            assert client.get(reverse('about')).status_code == 200
+    return [query['sql'] for query in queries.captured_queries if 'django_session' in query['sql']]
+
+
+@pytest.mark.django_db
+def test_unchanged_session_not_saved():
+    '''Ensure a session is saved only when its data has changed, or its expiry is due to be refreshed'''
+    print('Starting test_sessions.py::test_unchanged_session_not_saved')
+    session = SessionStore()
+    session['meal'] = 'soup'
+    session.save()
+    saved_at = session[SAVED_AT_KEY]
+
+    session = SessionStore(session.session_key)
+    session['meal'] = 'soup' # (marks the session modified, but does not change it)
+    with CaptureQueriesContext(connection) as queries:
+        session.save()
+    assert [query['sql'] for query in queries.captured_queries if 'django_session' in query['sql']] == []
+
+    session['meal'] = 'salad'
+    session.save()
+    assert SessionStore(session.session_key)['meal'] == 'salad'
+    assert SessionStore(session.session_key)[SAVED_AT_KEY] >= saved_at
+
+
+@pytest.mark.django_db
+def test_session_expiry_refreshed_lazily(client, settings):
+    '''Ensure the requests of a logged in user do not write their session, until its expiry is due to be refreshed'''
+    print('Starting test_sessions.py::test_session_expiry_refreshed_lazily')
+    settings.SESSION_ENGINE = 'common.sessions.db'
+    client.force_login(CustomUserFactory.create())
+    session_key = client.cookies[settings.SESSION_COOKIE_NAME].value
+    Session.objects.filter(pk=session_key).update(expire_date=timezone.now() + datetime.timedelta(days=1))
+
+    queries = session_queries(client)
+    assert len(queries) == 3
+    assert all(query.startswith('SELECT') for query in queries)
+
+    settings.SESSION_REFRESH_SECONDS = 0
+    assert any(query.startswith('UPDATE') for query in session_queries(client, times=1))
+    assert Session.objects.get(pk=session_key).expire_date > timezone.now() + datetime.timedelta(days=13)
+
+
+@pytest.mark.django_db
+def test_cached_db_sessions(client, settings):
+    '''Ensure the requests of a logged in user read their session from the cache (not the database)'''
+    print('Starting test_sessions.py::test_cached_db_sessions')
+    settings.SESSION_ENGINE = 'common.sessions.cached_db'
+    client.force_login(CustomUserFactory.create())
+    assert session_queries(client) == []
+    assert Session.objects.filter(pk=client.cookies[settings.SESSION_COOKIE_NAME].value).exists()
+
+
+def test_cached_db_sessions_need_a_shared_cache(settings):
+    '''Ensure cached_db sessions with a cache that is not shared by the processes are refused by the system checks'''
+    print('Starting test_sessions.py::test_cached_db_sessions_need_a_shared_cache')
+    settings.USER_CACHE_TIMEOUT = 0
+    settings.SESSION_ENGINE = 'common.sessions.cached_db'
+    settings.CACHES = {'default': {'BACKEND': 'common.cache.LocMemCache'}}
+    assert [error.id for error in check_shared_cache()] == ['common.E002']
+    settings.SESSION_ENGINE = 'common.sessions.db'
+    assert check_shared_cache() == []
+    settings.SESSION_ENGINE = 'common.sessions.cached_db'
+    settings.CACHES = {'default': {'BACKEND': 'common.cache.FileBasedCache', 'LOCATION': '/tmp/healthy-meals-test-cache'}}
+    assert check_shared_cache() == []
+
+
+@pytest.mark.django_db
+def test_signed_cookie_sessions(client, settings):
+    '''Ensure signed cookie sessions do not use the database, and the cookie is re-signed only to refresh it'''
+    print('Starting test_sessions.py::test_signed_cookie_sessions')
+    settings.SESSION_ENGINE = 'common.sessions.signed_cookies'
+    client.force_login(CustomUserFactory.create())
+    cookie = client.cookies[settings.SESSION_COOKIE_NAME].value
+    assert session_queries(client) == []
+    assert client.cookies[settings.SESSION_COOKIE_NAME].value == cookie
+    assert b'tsm_name_email' in client.get(reverse('about')).content
+
+    # a session last saved SESSION_REFRESH_SECONDS ago is re-signed (with the new saved time)
+    session = signed_cookies.SessionStore(cookie)
+    session[SAVED_AT_KEY] -= settings.SESSION_REFRESH_SECONDS
+    session._session_key = session._get_session_key()
+    client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+    client.get(reverse('about'))
+    refreshed = signed_cookies.SessionStore(client.cookies[settings.SESSION_COOKIE_NAME].value)
+    assert refreshed[SAVED_AT_KEY] > session[SAVED_AT_KEY]
+    assert not Session.objects.exists()
+
+
+@pytest.mark.django_db
+def test_purge_expired_sessions():
+    '''Ensure expired sessions are deleted in batches, and the sessions that have not expired are kept'''
+    print('Starting test_sessions.py::test_purge_expired_sessions')
+    now = timezone.now()
+    for n in range(5):
+        Session.objects.create(session_key=f'expired{n}', session_data='', expire_date=now - datetime.timedelta(hours=1))
+    for n in range(2):
+        Session.objects.create(session_key=f'live{n}', session_data='', expire_date=now + datetime.timedelta(hours=1))
+    out = StringIO()
+    call_command('purge_expired_sessions', '--batch-size', '2', '--pause', '0', stdout=out)
+    assert '5 expired sessions purged in 3 batches' in out.getvalue()
+    assert set(Session.objects.values_list('pk', flat=True)) == {'live0', 'live1'}
@@ -0,0 +1,82 @@
+from io import StringIO
+
+import pytest
+from django.contrib.auth import authenticate
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection, transaction
+
+from accounts.models import CustomUser
+from common.checks import check_soft_delete_indexes
+
+from .factories import CustomUserFactory
+
+
+@pytest.mark.django_db
+def test_soft_delete_index_used_for_email_login():
+    '''Ensure the CustomUser email indexes only hold users that are not soft deleted, and are used by logins
+
+        - the unique email index, or the email prefix (search) index, which also serves equality
+    '''
+    print('Starting test_soft_delete_indexes.py::test_soft_delete_index_used_for_email_login')
+    constraint = next(constraint for constraint in CustomUser._meta.constraints if constraint.name.endswith('_sdu'))
+    assert constraint.condition.children == [('deleted__isnull', True)]
+    with connection.cursor() as cursor:
+        cursor.execute('SET LOCAL enable_seqscan = off')
+    plan = CustomUser.objects.filter(email__iexact='Someone@Example.com').explain()
+    assert constraint.name in plan or CustomUser._meta.indexes[-1].name in plan
+
+
+@pytest.mark.django_db
+def test_unique_email_in_any_case():
+    '''Ensure emails are unique (in any case) among users that are not soft deleted, and logins find users in any case
+
+        - a second user with the same email (in another case) is refused by the database, and by model validation
+        - the email of a soft deleted user can be used again
+        - login by email (allauth) and by username (admin) find the user whatever the case of the email entered
+    '''
+    print('Starting test_soft_delete_indexes.py::test_unique_email_in_any_case')
+    user = CustomUserFactory.create(email='Unique@Example.com')
+    user.set_password('unique-password')
+    user.save()
+    with pytest.raises(ValidationError, match='already exists'):
+        CustomUserFactory.build(email='unique@example.COM').validate_constraints()
+    with transaction.atomic(), pytest.raises(IntegrityError):
+        CustomUserFactory.create(email='unique@example.COM')
+
+    assert CustomUser.objects.get_by_email('UNIQUE@example.com') == user
+    assert authenticate(email='unique@EXAMPLE.com', password='unique-password') == user
+    assert authenticate(username='unique@EXAMPLE.com', password='unique-password') == user
+    assert authenticate(email='unique@EXAMPLE.com', password='wrong') is None
+
+    user.delete()
+    with pytest.raises(CustomUser.DoesNotExist):
+        CustomUser.objects.get_by_email('unique@example.com')
+    assert CustomUserFactory.create(email='unique@example.com').pk != user.pk
+
+
+@pytest.mark.django_db
+def test_soft_delete_index_checks_and_report(monkeypatch):
+    '''Ensure missing soft delete indexes and bad soft_delete_lookups are reported
+
+        - the database check and the soft_delete_indexes command report a missing index
+        - the model check reports a lookup of a field that does not exist
+    '''
+    print('Starting test_soft_delete_indexes.py::test_soft_delete_index_checks_and_report')
+    assert check_soft_delete_indexes(databases=['default']) == []
+    out = StringIO()
+    call_command('soft_delete_indexes', '--fail', stdout=out)
+    assert 'accounts.CustomUser: accounts_cu_email_04a025_sdu' in out.getvalue()
+    assert 'missing' not in out.getvalue()
+
+    with connection.cursor() as cursor:
+        cursor.execute('DROP INDEX accounts_cu_email_04a025_sdu')
+    assert [warning.id for warning in check_soft_delete_indexes(databases=['default'])] == ['common.W001']
+    out = StringIO()
+    with pytest.raises(CommandError, match='accounts_cu_email_04a025_sdu'):
+        call_command('soft_delete_indexes', '--fail', stdout=out)
+    assert 'accounts_cu_email_04a025_sdu missing' in out.getvalue()
+
+    monkeypatch.setattr(CustomUser, 'soft_delete_lookups', ['no_such_field'])
+    assert 'common.E001' in [error.id for error in CustomUser.check()]
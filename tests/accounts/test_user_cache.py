@@ -0,0 +1,129 @@
+import pytest
+from django.contrib.auth import BACKEND_SESSION_KEY
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts.middleware import LEGACY_BACKENDS
+from accounts.models import CustomUser
+from common.checks import check_shared_cache
+
+from .factories import CustomUserFactory
+
+
+@pytest.fixture(autouse=True)
+def user_cache_on(settings):
+    '''Cache the users (the local memory cache is shared here, the tests run in one process).'''
+    settings.USER_CACHE_TIMEOUT = 300
+
+
+def user_queries(client):
+    '''Return the user table queries of a home page request.'''
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(reverse('home'))
+    assert response.status_code == 200
+    return response, [query for query in queries.captured_queries if 'accounts_customuser' in query['sql']]
+
+
+@pytest.mark.django_db
+def test_cached_user_needs_no_queries(client, django_capture_on_commit_callbacks):
+    '''Ensure session authenticated requests read an unchanged user from the cache, with no user queries
+
+        - the cached user has every field but the password (deferred, read if used)
+        - a changed (saved) user is read again from the database
+    '''
+    print('Starting test_user_cache.py::test_cached_user_needs_no_queries')
+    user = CustomUserFactory.create()
+    client.force_login(user, backend='accounts.backends.EmailAuthenticationBackend')
+    _response, queries = user_queries(client)
+    assert len(queries) == 1
+    response, queries = user_queries(client)
+    assert queries == []
+    assert response.wsgi_request.user == user
+    assert response.wsgi_request.user.email == user.email
+    assert response.wsgi_request.user.get_deferred_fields() == {'password'}
+
+    with django_capture_on_commit_callbacks(execute=True):
+        user.first_name = 'Changed'
+        user.save()
+    response, queries = user_queries(client)
+    assert len(queries) == 1
+    assert response.wsgi_request.user.first_name == 'Changed'
+
+
+@pytest.mark.django_db
+def test_cached_user_logged_out_when_deactivated_deleted_or_password_changed(client, django_capture_on_commit_callbacks):
+    '''Ensure deactivated, soft deleted and password changed users are logged out, even though they were cached'''
+    print('Starting test_user_cache.py::test_cached_user_logged_out_when_deactivated_deleted_or_password_changed')
+    user = CustomUserFactory.create()
+    client.force_login(user)
+    user_queries(client)
+    with django_capture_on_commit_callbacks(execute=True):
+        user.is_active = False
+        user.save()
+    response, _queries = user_queries(client)
+    assert not response.wsgi_request.user.is_authenticated
+
+    user = CustomUserFactory.create()
+    client.force_login(user)
+    user_queries(client)
+    with django_capture_on_commit_callbacks(execute=True):
+        CustomUser.objects.filter(pk=user.pk).delete() # (a queryset soft delete, a table at a time)
+    response, _queries = user_queries(client)
+    assert not response.wsgi_request.user.is_authenticated
+
+    user = CustomUserFactory.create()
+    client.force_login(user)
+    user_queries(client)
+    with django_capture_on_commit_callbacks(execute=True):
+        user.set_password('a-new-password')
+        user.save()
+    response, _queries = user_queries(client)
+    assert not response.wsgi_request.user.is_authenticated
+
+
+@pytest.mark.django_db
+def test_cached_user_password_change_keeps_session(client):
+    '''Ensure a user changing their own (cached) password stays logged in, with the new session hash'''
+    print('Starting test_user_cache.py::test_cached_user_password_change_keeps_session')
+    user = CustomUserFactory.create()
+    user.set_password('old-Password-1')
+    user.save()
+    client.force_login(user)
+    user_queries(client)
+    user_queries(client)
+    response = client.post(reverse('account_change_password'), {
+        'oldpassword': 'old-Password-1', 'password1': 'new-Password-2', 'password2': 'new-Password-2',
+    })
+    assert response.status_code == 302
+    response, _queries = user_queries(client)
+    assert response.wsgi_request.user == user
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('legacy_backend', [
+    'django.contrib.auth.backends.ModelBackend', 'allauth.account.auth_backends.AuthenticationBackend',
+])
+def test_legacy_backend_sessions_stay_logged_in(client, legacy_backend):
+    '''Ensure sessions logged in with the backends replaced by accounts/backends.py stay logged in'''
+    print('Starting test_user_cache.py::test_legacy_backend_sessions_stay_logged_in')
+    user = CustomUserFactory.create()
+    client.force_login(user)
+    session = client.session
+    session[BACKEND_SESSION_KEY] = legacy_backend
+    session.save()
+    response = client.get(reverse('about'))
+    assert response.wsgi_request.user == user
+    assert client.session[BACKEND_SESSION_KEY] == LEGACY_BACKENDS[legacy_backend]
+
+
+def test_user_cache_needs_a_shared_cache(settings):
+    '''Ensure the user cache with a cache that is not shared by the processes is warned about'''
+    print('Starting test_user_cache.py::test_user_cache_needs_a_shared_cache')
+    settings.CACHES = {'default': {'BACKEND': 'common.cache.LocMemCache'}}
+    assert [warning.id for warning in check_shared_cache()] == ['common.W003']
+    settings.USER_CACHE_TIMEOUT = 0
+    assert check_shared_cache() == []
+    settings.USER_CACHE_TIMEOUT = 300
+    settings.CACHES = {'default': {'BACKEND': 'common.cache.FileBasedCache', 'LOCATION': '/tmp/healthy-meals-test-cache'}}
+    assert check_shared_cache() == []
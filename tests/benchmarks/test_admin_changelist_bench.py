@@ -0,0 +1,54 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - tests/benchmarks/test_admin_changelist_bench.py
+
+Benchmark of the user admin changelist (see accounts/admin.py CustomUserAdmin and common/admin.py) as the user table
+grows (default 1,000 and 1,000,000 users): the first page, a deep (keyset) page, and email prefix and trigram searches.
+
+- run with: pytest tests/benchmarks/test_admin_changelist_bench.py --runslow -s
+- the ADMIN_BENCH_USERS environment variable changes the table sizes, e.g. ADMIN_BENCH_USERS=1000,10000000
+- the trigram search is only indexed where the pg_trgm extension is available (see accounts migration 0007)
+'''
+import os
+import statistics
+import time
+
+import pytest
+from django.urls import reverse
+
+from tests.accounts.factories import CustomUserFactory
+from tests.benchmarks.test_login_lookup_bench import add_users
+
+SIZES = [int(size) for size in os.environ.get('ADMIN_BENCH_USERS', '1000,1000000').split(',')]
+REPEATS = 5
+
+
+def median_ms(client, url, params=None):
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        response = client.get(url, params)
+        timings.append(time.perf_counter() - start)
+        assert response.status_code == 200
+    return statistics.median(timings) * 1000, response
+
+
+@pytest.mark.slow
+@pytest.mark.django_db
+def test_admin_changelist_benchmark(client):
+    client.force_login(CustomUserFactory.create(email='admin@example.com', is_staff=True, is_superuser=True))
+    url = reverse('admin:accounts_customuser_changelist')
+    loaded = 0
+    for size in sorted(SIZES):
+        add_users(loaded, size)
+        loaded = size
+        first_ms, response = median_ms(client, url)
+        deep_ms, _response = median_ms(client, url, {'after': f'Bench{size * 9 // 10}@Sample.com'})
+        prefix_ms, _response = median_ms(client, url, {'q': 'be'})
+        trigram_ms, _response = median_ms(client, url, {'q': f'{size // 2}@sample'})
+        print(f'\n{size} users (keyset paged: {response.context["cl"].keyset_field is not None}): '
+              f'first page {first_ms:.0f} ms, deep page {deep_ms:.0f} ms, '
+              f'prefix search {prefix_ms:.0f} ms, trigram search {trigram_ms:.0f} ms')
@@ -0,0 +1,97 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - tests/benchmarks/test_db_pool_bench.py
+
+Load test of the database connections of the web workers (gunicorn sync workers, see gunicorn.conf.py):
+- a new connection for each request (DATABASE_POOL=False, DATABASE_CONN_MAX_AGE=0)
+- persistent connections (DATABASE_POOL=False, DATABASE_CONN_MAX_AGE=600)
+- the connection pool (DATABASE_POOL=True, the default)
+Concurrent clients request the about page as a logged in user (the session and user are read from the database),
+reporting the latency, the connections opened (pg_stat_database.sessions) and the most open at once.
+
+- run with: pytest tests/benchmarks/test_db_pool_bench.py --runslow -s
+- needs gunicorn (see pyproject.toml)
+- DB_POOL_BENCH_CLIENTS (default 16), DB_POOL_BENCH_REQUESTS (default 2000) and WEB_CONCURRENCY (default 2)
+  change the load and the number of workers
+'''
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from django.db import connection
+from django.test import Client
+
+from tests.accounts.factories import CustomUserFactory
+from tests.benchmarks.test_server_modes_bench import free_port, get, start_server
+
+CLIENTS = int(os.environ.get('DB_POOL_BENCH_CLIENTS', 16))
+REQUESTS = int(os.environ.get('DB_POOL_BENCH_REQUESTS', 2000))
+CONNECTION_MODES = {
+    'new connection per request': {'DATABASE_POOL': 'False', 'DATABASE_CONN_MAX_AGE': '0'},
+    'persistent connections': {'DATABASE_POOL': 'False', 'DATABASE_CONN_MAX_AGE': '600'},
+    'connection pool': {'DATABASE_POOL': 'True'},
+}
+
+
+def database_stat(sql):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [connection.settings_dict['NAME']])
+        return cursor.fetchone()[0]
+
+
+def sessions_opened():
+    '''Return the number of connections opened to the test database (ever).'''
+    return database_stat('SELECT sessions FROM pg_stat_database WHERE datname = %s')
+
+
+def open_connections():
+    return database_stat('SELECT count(*) FROM pg_stat_activity WHERE datname = %s')
+
+
+@pytest.mark.slow
+@pytest.mark.django_db(transaction=True)
+def test_db_pool_benchmark():
+    pytest.importorskip('gunicorn')
+    client = Client()
+    client.force_login(CustomUserFactory.create())
+    headers = {'Cookie': f'sessionid={client.cookies["sessionid"].value}'}
+    for name, settings_env in CONNECTION_MODES.items():
+        port = free_port()
+        server = start_server('wsgi', port, PAGE_CACHE_TIMEOUT='0', **settings_env)
+        try:
+            for _ in range(CLIENTS * 2): # (warm up the workers)
+                get(port, '/about/', headers)
+            opened = sessions_opened()
+            most_open = [open_connections()]
+            done = threading.Event()
+
+            def watch_connections():
+                try:
+                    while not done.wait(0.05):
+                        most_open.append(open_connections())
+                finally:
+                    connection.close() # (this thread's connection)
+
+            watcher = threading.Thread(target=watch_connections)
+            watcher.start()
+            start = time.perf_counter()
+            with ThreadPoolExecutor(CLIENTS) as executor:
+                results = list(executor.map(lambda _: get(port, '/about/', headers), range(REQUESTS)))
+            seconds = time.perf_counter() - start
+            done.set()
+            watcher.join()
+            opened = sessions_opened() - opened
+        finally:
+            server.terminate()
+            server.wait()
+        latencies = [latency for _, latency in results]
+        percentiles = statistics.quantiles(latencies, n=100)
+        print(f'\n{name}: {REQUESTS / seconds:.0f} requests/s, p50 {percentiles[49] * 1000:.1f} ms, '
+              f'p99 {percentiles[98] * 1000:.1f} ms, {opened} connections opened, at most {max(most_open)} open')
+        assert {status for status, _ in results} == {200}
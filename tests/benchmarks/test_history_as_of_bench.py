@@ -0,0 +1,84 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - tests/benchmarks/test_history_as_of_bench.py
+
+Benchmark of rebuilding records "as of" a point in time (BaseModel.rec_as_of / objects.as_of),
+against a synthetic auditlog history (default 1,000,000 LogEntry rows).
+
+- run with: pytest tests/benchmarks/test_history_as_of_bench.py --runslow -s
+- HISTORY_BENCH_ROWS and HISTORY_BENCH_ROWS_PER_RECORD environment variables change the history size
+'''
+import os
+import time
+from datetime import timedelta
+
+import pytest
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.utils import timezone
+
+from accounts.models import CustomUser
+from common.models import HistoryCheckpoint
+
+ROWS = int(os.environ.get('HISTORY_BENCH_ROWS', 1_000_000))
+ROWS_PER_RECORD = int(os.environ.get('HISTORY_BENCH_ROWS_PER_RECORD', 1_000))
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+@pytest.mark.slow
+@pytest.mark.django_db
+def test_history_as_of_benchmark():
+    records = max(ROWS // ROWS_PER_RECORD, 1)
+    start_time = timezone.now() - timedelta(minutes=ROWS_PER_RECORD + 1)
+    CustomUser.objects.bulk_create(
+        CustomUser(email=f'bench{n}@sample.com', username=f'bench{n}@sample.com') for n in range(records)
+    )
+    content_type = ContentType.objects.get_for_model(CustomUser)
+    # one create and (ROWS_PER_RECORD - 1) first_name changes per user, one minute apart
+    with connection.cursor() as cursor:
+        cursor.execute('''
+            INSERT INTO auditlog_logentry
+                (content_type_id, object_pk, object_id, object_repr, action, changes_text, changes, timestamp)
+            SELECT %s, u.id::text, u.id, u.email, CASE WHEN g = 0 THEN 0 ELSE 1 END, '',
+                jsonb_build_object(
+                    'email', jsonb_build_array('None', u.email),
+                    'first_name', jsonb_build_array('name ' || greatest(g - 1, 0), 'name ' || g)
+                ),
+                %s + g * interval '1 minute'
+            FROM accounts_customuser u CROSS JOIN generate_series(0, %s - 1) g
+        ''', [content_type.id, start_time, ROWS_PER_RECORD])
+        cursor.execute('ANALYZE auditlog_logentry')
+    print(f'\nsynthetic history: {records * ROWS_PER_RECORD} LogEntry rows, {records} records')
+
+    sample = list(CustomUser.objects.order_by('pk')[:20])
+    middle = start_time + timedelta(minutes=ROWS_PER_RECORD // 2, seconds=30)
+    late = start_time + timedelta(minutes=ROWS_PER_RECORD - 1, seconds=30)
+
+    # single records, without and then with checkpoints
+    no_checkpoints, cold = timed(lambda: [user.rec_as_of(late) for user in sample])
+    assert HistoryCheckpoint.objects.count() == len(sample)
+    with_checkpoints, warm = timed(lambda: [user.rec_as_of(late) for user in sample])
+    assert with_checkpoints == no_checkpoints
+    assert no_checkpoints[0]['first_name'] == f'name {ROWS_PER_RECORD - 1}'
+    print(f'rec_as_of, {len(sample)} records: full replay {cold * 1000 / len(sample):.1f} ms/record, '
+          f'from checkpoint {warm * 1000 / len(sample):.1f} ms/record')
+
+    # a time before the checkpoints still replays correctly
+    assert sample[0].rec_as_of(middle)['first_name'] == f'name {ROWS_PER_RECORD // 2}'
+
+    # bulk rebuild of many records, without and then with checkpoints
+    bulk = CustomUser.objects.order_by('pk')[:min(records, 200)]
+    _, bulk_cold = timed(lambda: bulk.as_of(late))
+    states, bulk_warm = timed(lambda: bulk.as_of(late))
+    assert len(states) == len(bulk)
+    print(f'as_of, {len(bulk)} records: full replay {bulk_cold:.2f} s, from checkpoints {bulk_warm:.2f} s')
+    assert warm < cold
+    assert bulk_warm < bulk_cold
@@ -0,0 +1,63 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - tests/benchmarks/test_login_bench.py
+
+Benchmark of login requests per second, with and without the last_login save fast path (see BaseModel.save),
+which skips auditlog's read and diff of the old record for saves of fields left out of the history.
+
+- run with: pytest tests/benchmarks/test_login_bench.py --runslow -s
+- LOGIN_BENCH_REQUESTS environment variable changes the number of logins (default 300)
+- a fast password hasher is used (and allauth's login rate limits are off), so the timings are of the login's
+  database work rather than the hashing
+'''
+import os
+import time
+
+import pytest
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+import common.audit
+import common.base_model
+from tests.accounts.factories import CustomUserFactory
+
+REQUESTS = int(os.environ.get('LOGIN_BENCH_REQUESTS', 300))
+
+
+def logins_per_second(client, user):
+    '''Return the logins per second (login and logout requests), and the queries of one login.'''
+    url = reverse('account_login')
+    data = {'login': user.email, 'password': 'bench-password'}
+    client.post(url, data) # (warm up, e.g. the cached Site)
+    client.logout()
+    with CaptureQueriesContext(connection) as queries:
+        client.post(url, data)
+    query_count = len(queries) # (before the next request resets the queries log)
+    client.logout()
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        assert client.post(url, data).status_code == 302
+        client.logout()
+    return REQUESTS / (time.perf_counter() - start), query_count
+
+
+@pytest.mark.slow
+@pytest.mark.django_db
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'], ACCOUNT_RATE_LIMITS=False)
+def test_login_benchmark(client, monkeypatch):
+    user = CustomUserFactory.create()
+    user.set_password('bench-password')
+    user.save()
+
+    fast, fast_queries = logins_per_second(client, user)
+    # without the fast path, auditlog reads and diffs the old record for every last_login save
+    monkeypatch.setattr(common.base_model, 'is_audited_update', lambda model, update_fields: True)
+    monkeypatch.setattr(common.audit, 'is_audited_update', lambda model, update_fields: True)
+    slow, slow_queries = logins_per_second(client, user)
+    print(f'\nlogins: {slow:.0f}/s ({slow_queries} queries) before, {fast:.0f}/s ({fast_queries} queries) after')
+    assert fast_queries < slow_queries
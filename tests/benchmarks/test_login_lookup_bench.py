@@ -0,0 +1,62 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - tests/benchmarks/test_login_lookup_bench.py
+
+Benchmark of the login by email user lookup (CustomUserManager.get_by_email, used by accounts/backends.py),
+as the user table grows (default 1,000, 100,000 and 1,000,000 users, a tenth of them soft deleted).
+
+- run with: pytest tests/benchmarks/test_login_lookup_bench.py --runslow -s
+- the LOGIN_BENCH_USERS environment variable changes the table sizes, e.g. LOGIN_BENCH_USERS=1000,10000000
+'''
+import os
+import random
+import statistics
+import time
+
+import pytest
+from django.db import connection
+
+from accounts.models import CustomUser
+
+SIZES = [int(size) for size in os.environ.get('LOGIN_BENCH_USERS', '1000,100000,1000000').split(',')]
+LOOKUPS = 200
+
+
+def add_users(first, last):
+    '''Insert users first..last-1 with SQL (a tenth soft deleted, with a mixed case email), as a bulk load would.'''
+    with connection.cursor() as cursor:
+        cursor.execute('''
+            INSERT INTO accounts_customuser
+                (password, is_superuser, username, first_name, last_name, email, is_staff, is_active,
+                 date_joined, created, updated, deleted, deleted_by_cascade)
+            SELECT '', false, 'Bench' || n || '@Sample.com', '', '', 'Bench' || n || '@Sample.com', false, true,
+                now(), now(), now(), CASE WHEN n %% 10 = 0 THEN now() END, false
+            FROM generate_series(%s, %s - 1) n
+        ''', [first, last])
+        cursor.execute('ANALYZE accounts_customuser')
+
+
+@pytest.mark.slow
+@pytest.mark.django_db
+def test_login_lookup_benchmark():
+    constraint = next(constraint for constraint in CustomUser._meta.constraints if constraint.name.endswith('_sdu'))
+    medians = []
+    loaded = 0
+    for size in sorted(SIZES):
+        add_users(loaded, size)
+        loaded = size
+        emails = [f'bench{n}@sample.com' for n in random.sample(range(size), min(LOOKUPS, size)) if n % 10]
+        assert constraint.name in CustomUser.objects.filter(email__iexact=emails[0]).explain()
+        timings = []
+        for email in emails:
+            start = time.perf_counter()
+            CustomUser.objects.get_by_email(email)
+            timings.append(time.perf_counter() - start)
+        medians.append(statistics.median(timings))
+        print(f'\n{size} users: get_by_email median {medians[-1] * 1_000_000:.0f} us, '
+              f'p95 {statistics.quantiles(timings, n=20)[-1] * 1_000_000:.0f} us')
+    # an index probe: the lookup time stays (about) flat as the table grows
+    assert medians[-1] < medians[0] * 3
@@ -0,0 +1,82 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - tests/benchmarks/test_login_storm_bench.py
+
+Benchmark of the home page latency during a login storm, with passwords hashed in the request threads
+and then in the password hashing pool (PASSWORD_HASH_WORKERS, see accounts/hashers.py).
+
+- run with: pytest tests/benchmarks/test_login_storm_bench.py --runslow -s
+- LOGIN_STORM_THREADS (default 8) logins run at once, while LOGIN_STORM_PAGES (default 30) home pages are timed
+'''
+import os
+import statistics
+import threading
+import time
+
+import pytest
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from accounts.hashers import shutdown_hash_pool
+from tests.accounts.factories import CustomUserFactory
+
+THREADS = int(os.environ.get('LOGIN_STORM_THREADS', 8))
+PAGES = int(os.environ.get('LOGIN_STORM_PAGES', 30))
+
+
+def home_page_latency(client):
+    timings = []
+    for _ in range(PAGES):
+        start = time.perf_counter()
+        assert client.get(reverse('home')).status_code == 200
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def login_storm(user, stop):
+    '''Log in (and out) repeatedly until stopped.'''
+    client = Client()
+    try:
+        while not stop.is_set():
+            client.post(reverse('account_login'), {'login': user.email, 'password': 'storm-password'})
+            client.logout()
+    finally:
+        connection.close()
+
+
+def home_page_latency_during_storm(client, user):
+    stop = threading.Event()
+    threads = [threading.Thread(target=login_storm, args=(user, stop)) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    try:
+        time.sleep(1) # (let the storm get going)
+        return home_page_latency(client)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+
+@pytest.mark.slow
+@pytest.mark.django_db(transaction=True)
+@override_settings(ACCOUNT_RATE_LIMITS=False)
+def test_login_storm_benchmark(client):
+    user = CustomUserFactory.create()
+    user.set_password('storm-password')
+    user.save()
+
+    quiet = home_page_latency(client)
+    in_thread = home_page_latency_during_storm(client, user)
+    with override_settings(PASSWORD_HASH_WORKERS=1):
+        try:
+            pooled = home_page_latency_during_storm(client, user)
+        finally:
+            shutdown_hash_pool()
+    print(f'\nhome page median latency: {quiet * 1000:.1f} ms quiet, during a storm of {THREADS} logins: '
+          f'{in_thread * 1000:.1f} ms hashing in the request threads, {pooled * 1000:.1f} ms hashing in the pool')
+    assert pooled < in_thread
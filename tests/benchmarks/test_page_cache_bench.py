@@ -0,0 +1,52 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - tests/benchmarks/test_page_cache_bench.py
+
+Benchmark of home page requests per second, rendered on every request and served from the page cache
+(anonymous users), and with the _base.html header fragments cached (logged in users), see common/page_cache.py,
+and answered 304 Not Modified to conditional GETs (If-None-Match, see ConditionalPageMixin).
+
+- run with: pytest tests/benchmarks/test_page_cache_bench.py --runslow -s
+- PAGE_BENCH_REQUESTS environment variable changes the number of requests (default 500)
+'''
+import os
+import time
+
+import pytest
+from django.test import override_settings
+from django.urls import reverse
+
+from tests.accounts.factories import CustomUserFactory
+
+REQUESTS = int(os.environ.get('PAGE_BENCH_REQUESTS', 500))
+
+
+def requests_per_second(client, conditional=False):
+    response = client.get(reverse('home')) # (warm up, and fill the page cache)
+    headers = {'HTTP_IF_NONE_MATCH': response['ETag']} if conditional else {}
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        assert client.get(reverse('home'), **headers).status_code == (304 if conditional else 200)
+    return REQUESTS / (time.perf_counter() - start)
+
+
+@pytest.mark.slow
+@pytest.mark.django_db
+def test_page_cache_benchmark(client):
+    with override_settings(PAGE_CACHE_TIMEOUT=0):
+        anonymous_rendered = requests_per_second(client)
+    anonymous_cached = requests_per_second(client)
+    anonymous_not_modified = requests_per_second(client, conditional=True)
+    client.force_login(CustomUserFactory.create())
+    with override_settings(PAGE_CACHE_TIMEOUT=0):
+        user_rendered = requests_per_second(client)
+    user_fragments = requests_per_second(client)
+    user_not_modified = requests_per_second(client, conditional=True)
+    print(f'\nanonymous: rendered {anonymous_rendered:.0f} requests/s, page cache {anonymous_cached:.0f} requests/s, '
+          f'not modified {anonymous_not_modified:.0f} requests/s'
+          f'\nlogged in: rendered {user_rendered:.0f} requests/s, header fragments cached {user_fragments:.0f} requests/s, '
+          f'not modified {user_not_modified:.0f} requests/s')
+    assert anonymous_cached > anonymous_rendered
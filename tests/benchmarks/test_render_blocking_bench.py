@@ -0,0 +1,57 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - tests/benchmarks/test_render_blocking_bench.py
+
+Benchmark of the render blocking resources of the home page (with the offline bundles): before, when its
+stylesheet and script were linked as blocking (the page could only be drawn once both were loaded), and now,
+with the critical css inlined, the stylesheet loaded asynchronously and the script deferred.
+
+The time before the first draw is estimated for a slow mobile connection (the round trips and transfer time
+of the blocking resources, loaded in parallel), as no headless browser is part of the development environment.
+
+- run with: pytest tests/benchmarks/test_render_blocking_bench.py --runslow -s
+'''
+import pytest
+from bs4 import BeautifulSoup
+from django.urls import reverse
+
+from tests.pages.test_static_bundles import offline_bundles  # noqa: F401 (fixture)
+
+ROUND_TRIP_SECONDS = 0.150 # slow 4G
+BYTES_PER_SECOND = 1.6 * 1_000_000 / 8
+
+
+def blocking_time(client, page_bytes, resource_urls):
+    '''Return the estimated seconds before the first draw: the page, then its blocking resources (in parallel).'''
+    resource_bytes = sum(
+        int(client.get(url, HTTP_ACCEPT_ENCODING='gzip')['Content-Length']) for url in resource_urls
+    )
+    page_seconds = 2 * ROUND_TRIP_SECONDS + page_bytes / BYTES_PER_SECOND # (connection and request)
+    resource_seconds = (ROUND_TRIP_SECONDS + resource_bytes / BYTES_PER_SECOND) if resource_urls else 0
+    return page_seconds + resource_seconds, resource_bytes
+
+
+@pytest.mark.slow
+@pytest.mark.django_db
+def test_render_blocking_benchmark(client, offline_bundles):  # noqa: F811
+    page = client.get(reverse('home')).content
+    head = BeautifulSoup(page, 'html.parser').head
+    stylesheets = [link['href'] for link in head.find_all('link', rel=['stylesheet', 'preload'])]
+    scripts = [script['src'] for script in head.find_all('script', src=True)]
+    # before: the stylesheet and script linked as blocking, no inline critical css
+    before_urls = sorted(set(stylesheets)) + scripts
+    inline_bytes = sum(len(style.encode()) for style in head.find_all('style'))
+    before, before_bytes = blocking_time(client, len(page) - inline_bytes, before_urls)
+    # now: only the blocking resources left in the head (stylesheets outside of noscript, scripts without defer)
+    blocking = [
+        link['href'] for link in head.find_all('link', rel='stylesheet') if link.find_parent('noscript') is None
+    ] + [script['src'] for script in head.find_all('script', src=True) if not script.has_attr('defer')]
+    after, after_bytes = blocking_time(client, len(page), blocking)
+    print(f'\nbefore: {len(before_urls)} blocking resources ({before_bytes} bytes), first draw after ~{before * 1000:.0f} ms'
+          f'\nnow: {len(blocking)} blocking resources ({after_bytes} bytes, {inline_bytes} bytes of inlined css), '
+          f'first draw after ~{after * 1000:.0f} ms')
+    assert not blocking
+    assert after < before
@@ -0,0 +1,142 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - tests/benchmarks/test_server_modes_bench.py
+
+Benchmark of the serving modes (see gunicorn.conf.py): gunicorn with sync workers (SERVER_MODE=wsgi, the sync
+page views) and with uvicorn workers (SERVER_MODE=asgi, the async page views), the same number of workers each,
+under the same number of concurrent clients. The clients request the home page (from the page cache) and
+the about page with a query string (rendered each time), reporting the throughput and the p50 and p99 latency:
+- with fast clients only
+- and with a few slow clients meanwhile (sending their requests over a few seconds, e.g. on a poor mobile connection),
+  each of which holds up a whole sync worker while it is read
+
+- run with: pytest tests/benchmarks/test_server_modes_bench.py --runslow -s
+- needs gunicorn and uvicorn-worker (see pyproject.toml)
+- SERVER_BENCH_CLIENTS (default 32), SERVER_BENCH_SLOW_CLIENTS (default 2), SERVER_BENCH_REQUESTS (default 2000)
+  and WEB_CONCURRENCY (default 2) change the load and the number of workers
+'''
+import http.client
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from django.conf import settings
+from django.db import connection
+
+CLIENTS = int(os.environ.get('SERVER_BENCH_CLIENTS', 32))
+SLOW_CLIENTS = int(os.environ.get('SERVER_BENCH_SLOW_CLIENTS', 2))
+REQUESTS = int(os.environ.get('SERVER_BENCH_REQUESTS', 2000))
+SLOW_REQUEST_SECONDS = 2
+WORKERS = os.environ.get('WEB_CONCURRENCY', '2')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(mode, port, **settings_env):
+    '''Start gunicorn in mode (with the test database, and settings_env), returning once it answers.'''
+    env = {
+        **os.environ,
+        'SERVER_MODE': mode,
+        'GUNICORN_BIND': f'127.0.0.1:{port}',
+        'WEB_CONCURRENCY': WORKERS,
+        'DATABASE_NAME': connection.settings_dict['NAME'],
+        'DEBUG': 'False',
+        'COMPRESS_ENABLED': 'False',
+        'METRICS_ENABLED': 'False',
+        **settings_env,
+    }
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py'],
+        cwd=settings.BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    for _ in range(100):
+        try:
+            get(port, '/')
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError(f'gunicorn ({mode}) did not start')
+
+
+def get(port, path, headers=None):
+    '''GET path, returning (status, seconds).'''
+    start = time.perf_counter()
+    client = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    try:
+        client.request('GET', path, headers=headers or {})
+        response = client.getresponse()
+        response.read()
+    finally:
+        client.close()
+    return response.status, time.perf_counter() - start
+
+
+def slow_client(port, done):
+    '''Send requests a header line at a time (over SLOW_REQUEST_SECONDS), until done is set.'''
+    lines = [b'GET / HTTP/1.1\r\n', b'Host: 127.0.0.1\r\n'] + [b'X-Slow: %d\r\n' % n for n in range(8)]
+    while not done.is_set():
+        with socket.create_connection(('127.0.0.1', port), timeout=60) as sock:
+            for line in lines:
+                sock.sendall(line)
+                time.sleep(SLOW_REQUEST_SECONDS / len(lines))
+            sock.sendall(b'Connection: close\r\n\r\n')
+            while sock.recv(65536):
+                pass
+
+
+def load(port, slow_clients=0):
+    '''Send REQUESTS requests from CLIENTS threads (while slow_clients send slow requests),
+    returning (requests per second, latencies, statuses).
+    '''
+    paths = ['/' if n % 2 else f'/about/?n={n}' for n in range(REQUESTS)]
+    done = threading.Event()
+    slow = [threading.Thread(target=slow_client, args=(port, done)) for _ in range(slow_clients)]
+    for thread in slow:
+        thread.start()
+    time.sleep(0.5 if slow_clients else 0) # (the slow requests are being read)
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(CLIENTS) as executor:
+            results = list(executor.map(lambda path: get(port, path), paths))
+        seconds = time.perf_counter() - start
+    finally:
+        done.set()
+        for thread in slow:
+            thread.join()
+    return REQUESTS / seconds, [latency for _, latency in results], {status for status, _ in results}
+
+
+@pytest.mark.slow
+@pytest.mark.django_db(transaction=True)
+def test_server_modes_benchmark():
+    pytest.importorskip('gunicorn')
+    pytest.importorskip('uvicorn_worker')
+    for mode in ('wsgi', 'asgi'):
+        port = free_port()
+        server = start_server(mode, port)
+        try:
+            load(port) # (warm up the workers)
+            for slow_clients in (0, SLOW_CLIENTS):
+                throughput, latencies, statuses = load(port, slow_clients)
+                percentiles = statistics.quantiles(latencies, n=100)
+                print(f'\n{mode}: {WORKERS} workers, {CLIENTS} clients ({slow_clients} slow): '
+                      f'{throughput:.0f} requests/s, p50 {percentiles[49] * 1000:.1f} ms, '
+                      f'p99 {percentiles[98] * 1000:.1f} ms')
+                assert statuses == {200}
+        finally:
+            server.terminate()
+            server.wait()
@@ -0,0 +1,61 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - tests/benchmarks/test_session_queries_bench.py
+
+Benchmark of the database queries of a logged in user's requests (the about page), by session engine:
+- Django's db engine, as before SESSION_MODE (sessions saved only when modified, expiring two weeks after login)
+- Django's db engine saving every request (sessions expiring two weeks after the last request)
+- the SESSION_MODE engines (see common/sessions/__init__.py): db, cached_db and signed_cookies, saving every request
+  only to refresh the expiry (after SESSION_REFRESH_SECONDS) or when the session has changed
+reporting the django_session reads and writes, and all the queries, per request, and the requests per second.
+
+- run with: pytest tests/benchmarks/test_session_queries_bench.py --runslow -s
+- SESSION_BENCH_REQUESTS environment variable changes the number of requests (default 500)
+'''
+import os
+import time
+
+import pytest
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from tests.accounts.factories import CustomUserFactory
+
+REQUESTS = int(os.environ.get('SESSION_BENCH_REQUESTS', 500))
+ENGINES = {
+    'django db, saved when modified': ('django.contrib.sessions.backends.db', False),
+    'django db, saved every request': ('django.contrib.sessions.backends.db', True),
+    'db': ('common.sessions.db', True),
+    'cached_db': ('common.sessions.cached_db', True),
+    'signed_cookies': ('common.sessions.signed_cookies', True),
+}
+
+
+@pytest.mark.slow
+@pytest.mark.django_db
+def test_session_queries_benchmark():
+    user = CustomUserFactory.create()
+    print()
+    for name, (engine, save_every_request) in ENGINES.items():
+        with override_settings(SESSION_ENGINE=engine, SESSION_SAVE_EVERY_REQUEST=save_every_request):
+            client = Client()
+            client.force_login(user)
+            client.get(reverse('about')) # (warm up the caches)
+            start = time.perf_counter()
+            with CaptureQueriesContext(connection) as queries:
+                for _ in range(REQUESTS):
+                    assert client.get(reverse('about')).status_code == 200
+            seconds = time.perf_counter() - start
+        sql = [query['sql'] for query in queries.captured_queries]
+        session_sql = [statement for statement in sql if 'django_session' in statement]
+        reads = sum(statement.startswith('SELECT') for statement in session_sql)
+        writes = len(session_sql) - reads
+        print(f'{name}: {reads / REQUESTS:.2f} session reads, {writes / REQUESTS:.2f} session writes, '
+              f'{len(sql) / REQUESTS:.2f} queries per request, {REQUESTS / seconds:.0f} requests/s')
+        if engine.startswith('common.sessions'):
+            assert writes == 0
@@ -0,0 +1,46 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - tests/benchmarks/test_static_bundles_bench.py
+
+Benchmark of the bytes and requests of a first view of the home page (the page, and its css and js),
+with the static files linked as they are (DEBUG), and with the offline bundles (minified, served compressed).
+
+- run with: pytest tests/benchmarks/test_static_bundles_bench.py --runslow -s
+'''
+import pytest
+from bs4 import BeautifulSoup
+from django.test import override_settings
+from django.urls import reverse
+
+from common.page_cache import clear_page_cache
+from tests.pages.test_static_bundles import offline_bundles  # noqa: F401 (fixture)
+
+
+def first_view(client, encoding):
+    '''Return the number of requests and the bytes (as sent) of a first view of the home page.'''
+    page = client.get(reverse('home'), HTTP_ACCEPT_ENCODING=encoding)
+    soup = BeautifulSoup(page.content, 'html.parser')
+    urls = [link['href'] for link in soup.find_all('link', rel='stylesheet')]
+    urls += [script['src'] for script in soup.find_all('script', src=True)]
+    sizes = [len(page.content)]
+    for url in urls:
+        response = client.get(url, HTTP_ACCEPT_ENCODING=encoding)
+        assert response.status_code == 200
+        sizes.append(int(response['Content-Length']))
+    return len(sizes), sum(sizes)
+
+
+@pytest.mark.slow
+@pytest.mark.django_db
+def test_static_bundles_benchmark(client, offline_bundles):  # noqa: F811
+    with override_settings(COMPRESS_ENABLED=False):
+        requests, before = first_view(client, encoding='')
+    print(f'\nlinked static files: {requests} requests, {before} bytes')
+    for encoding in ('gzip', 'br, gzip'):
+        clear_page_cache() # (the home page was cached with the static files it linked)
+        requests, after = first_view(client, encoding=encoding)
+        print(f'offline bundles, Accept-Encoding {encoding}: {requests} requests, {after} bytes')
+    assert after < before
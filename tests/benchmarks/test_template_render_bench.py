@@ -0,0 +1,52 @@
+'''
+Healthy Meals Web Site
+Copyright (C) 2025 David A. Taylor of Taylored Web Sites (tayloredwebsites.com)
+Licensed under AGPL-3.0-only.  See https://opensource.org/license/agpl-v3/
+
+https://github.com/tayloredwebsites/healthy-meals - tests/benchmarks/test_template_render_bench.py
+
+Benchmark of rendering pages/home.html (with _base.html) in the debug (development and test) and production
+template modes (see TEMPLATES in settings.py): the first render of a server process, and the following renders.
+
+- run with: pytest tests/benchmarks/test_template_render_bench.py --runslow -s
+- TEMPLATE_BENCH_RENDERS environment variable changes the number of renders (default 2000)
+'''
+import os
+import statistics
+import time
+
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.test import RequestFactory, override_settings
+
+from common.templates import precompile_templates
+from tests.pages.test_templates import template_backend
+
+RENDERS = int(os.environ.get('TEMPLATE_BENCH_RENDERS', 2000))
+
+
+def render_times(backend, request, precompile):
+    '''Return the first render time, and the median of the following renders (in microseconds).'''
+    start = time.perf_counter()
+    if precompile:
+        precompile_templates(backend.engine) # (as the server process starts, not in a request)
+    boot = time.perf_counter() - start
+    timings = []
+    for _ in range(RENDERS + 1):
+        start = time.perf_counter()
+        backend.get_template('pages/home.html').render(request=request)
+        timings.append(time.perf_counter() - start)
+    return boot * 1_000_000, timings[0] * 1_000_000, statistics.median(timings[1:]) * 1_000_000
+
+
+@pytest.mark.slow
+@override_settings(PAGE_CACHE_TIMEOUT=0) # (render the _base.html header fragments every time)
+def test_template_render_benchmark():
+    request = RequestFactory().get('/')
+    request.user = AnonymousUser()
+    results = {}
+    for mode, debug, precompile in (('debug', True, False), ('production', False, True)):
+        boot, first, median = render_times(template_backend(debug), request, precompile)
+        results[mode] = median
+        print(f'\n{mode}: precompile {boot:.0f} us, first render {first:.0f} us, render median {median:.0f} us')
+    assert results['production'] <= results['debug'] * 1.1
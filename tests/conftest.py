@@ -4,8 +4,12 @@
 
 add the ability to mark tests with @pytest.mark.slow (by default will be skipped except if --runslow cli option is given)
 see: https://docs.pytest.org/en/latest/example/simple.html#control-skipping-of-tests-according-to-command-line-option
+
+the (default) cache is cleared before each test, and pages link the static files as they are
+(tests of the compressed bundles build them, see tests/pages/test_static_bundles.py)
 '''
 import pytest
+from django.core.cache import cache
 
 
 def pytest_addoption(parser):
@@ -25,4 +29,18 @@ def pytest_collection_modifyitems(config, items):
     skip_slow = pytest.mark.skip(reason="need --runslow option to run")
     for item in items:
         if "slow" in item.keywords:
-            item.add_marker(skip_slow)
\ No newline at end of file
+            item.add_marker(skip_slow)
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    '''Start each test with an empty cache (e.g. no pages or users cached by earlier tests).'''
+    cache.clear()
+    yield
+
+
+@pytest.fixture(autouse=True)
+def static_files_as_linked(settings):
+    '''Do not bundle the static files (in production, unless DEBUG, the bundles are built offline).'''
+    settings.COMPRESS_ENABLED = False
+    settings.COMPRESS_OFFLINE = False
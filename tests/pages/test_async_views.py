@@ -0,0 +1,103 @@
+import datetime
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import AsyncClient, RequestFactory
+from django.urls import include, path, reverse
+from django.utils.http import http_date
+
+from accounts.models import CustomUser
+from common.checks import check_async_middleware
+from common.metrics import REGISTRY
+from common.page_cache import ConditionalPageMixin, page_cache_key
+from common.views import AsyncTemplateView
+from pages.views import AsyncAboutPageView, AsyncHomePageView
+from tests.accounts.factories import CustomUserFactory
+
+# the site, with the async page views (as pages/urls.py has them with settings.ASYNC_VIEWS)
+urlpatterns = [
+    path("", AsyncHomePageView.as_view(), name="home"),
+    path("about/", AsyncAboutPageView.as_view(), name="about"),
+    path("", include("healthy_meals.urls")),
+]
+
+
+@pytest.mark.urls(__name__)
+@pytest.mark.django_db
+def test_async_page_views():
+    '''Ensure the async page views serve the pages through the async middleware (as under ASGI)
+
+        - pages are stored in (and served from) the page cache for anonymous users
+        - conditional GETs are answered with 304 Not Modified
+        - the pages of logged in users are not cached, and their queries are counted in the request metrics
+    '''
+    print('Starting test_async_views.py::test_async_page_views')
+    REGISTRY.reset()
+    client = AsyncClient()
+
+    async def visit():
+        response = await client.get(reverse('home'))
+        assert response.status_code == 200
+        assert b'<html' in response.content
+        cached = await client.get(reverse('home'))
+        assert cached.content == response.content
+        not_modified = await client.get(reverse('home'), headers={'If-None-Match': response['ETag']})
+        assert not_modified.status_code == 304
+        assert 'no-cache' in not_modified['Cache-Control']
+        return response
+
+    response = async_to_sync(visit)()
+    request = RequestFactory().get(reverse('home'))
+    request.LANGUAGE_CODE = response['Content-Language']
+    assert cache.get(page_cache_key(request)) is not None
+    assert REGISTRY.template_seconds.values['home'][-1] == 1 # (rendered once)
+
+    async def visit_logged_in(user):
+        await client.aforce_login(user)
+        return await client.get(reverse('about'))
+
+    user = CustomUserFactory.create()
+    response = async_to_sync(visit_logged_in)(user)
+    assert response.status_code == 200
+    assert b'tsm_name_email' in response.content
+    assert REGISTRY.db_queries.values['about'][-2] > 0 # (the session and user queries)
+    REGISTRY.reset()
+
+
+class AsyncUsersPage(ConditionalPageMixin, AsyncTemplateView):
+    template_name = 'pages/about.html'
+    last_modified_models = (CustomUser,)
+
+
+@pytest.mark.django_db
+def test_async_conditional_last_modified():
+    '''Ensure async views read the Last-Modified time of their models asynchronously'''
+    print('Starting test_async_views.py::test_async_conditional_last_modified')
+    user = CustomUserFactory.create()
+    CustomUser.all_objects.filter(pk=user.pk).update(updated=user.updated - datetime.timedelta(seconds=5))
+    user.refresh_from_db()
+
+    async def anonymous():
+        return AnonymousUser()
+
+    request = RequestFactory().get('/users/', HTTP_IF_MODIFIED_SINCE=http_date(user.updated.timestamp()))
+    request.user = AnonymousUser()
+    request.auser = anonymous
+    response = async_to_sync(AsyncUsersPage.as_view())(request)
+    assert response.status_code == 304
+    assert response['Last-Modified'] == http_date(user.updated.timestamp())
+
+
+def test_async_middleware_check(settings):
+    '''Ensure the middleware that is not async capable is reported when serving with ASGI'''
+    print('Starting test_async_views.py::test_async_middleware_check')
+    settings.SERVER_MODE = 'wsgi'
+    assert check_async_middleware() == []
+    settings.SERVER_MODE = 'asgi'
+    reported = {warning.obj for warning in check_async_middleware()}
+    assert 'whitenoise.middleware.WhiteNoiseMiddleware' in reported
+    assert 'django.contrib.sessions.middleware.SessionMiddleware' not in reported
+    assert 'common.middleware.MetricsMiddleware' not in reported
+    assert 'common.middleware.BufferedAuditlogMiddleware' not in reported
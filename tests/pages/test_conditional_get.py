@@ -0,0 +1,73 @@
+import datetime
+from io import StringIO
+
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import call_command
+from django.test import RequestFactory
+from django.urls import reverse
+from django.utils.http import http_date
+from django.views.generic import TemplateView
+
+from accounts.models import CustomUser
+from common.page_cache import ConditionalPageMixin
+from tests.accounts.factories import CustomUserFactory
+
+
+@pytest.mark.django_db
+def test_page_not_modified(client):
+    '''Ensure a page is answered with 304 Not Modified when the browser has its current ETag
+
+        - the ETag changes with the page cache version and the user (logging in, or a change to the user)
+    '''
+    print('Starting test_conditional_get.py::test_page_not_modified')
+    response = client.get(reverse('home'))
+    etag = response['ETag']
+    assert 'no-cache' in response['Cache-Control']
+    not_modified = client.get(reverse('home'), HTTP_IF_NONE_MATCH=etag)
+    assert not_modified.status_code == 304
+    assert not_modified.content == b''
+    assert client.get(reverse('about'), HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    call_command('clear_page_cache', '--local', stdout=StringIO())
+    assert client.get(reverse('home'), HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    user = CustomUserFactory.create()
+    client.force_login(user)
+    response = client.get(reverse('home'))
+    assert response['ETag'] != etag
+    assert client.get(reverse('home'), HTTP_IF_NONE_MATCH=response['ETag']).status_code == 304
+    user.first_name = 'Changed'
+    user.save()
+    assert client.get(reverse('home'), HTTP_IF_NONE_MATCH=response['ETag']).status_code == 200
+
+
+class UsersPageView(ConditionalPageMixin, TemplateView):
+    '''A page of (BaseModel) data.'''
+    template_name = 'pages/about.html'
+    last_modified_models = (CustomUser,)
+
+
+@pytest.mark.django_db
+def test_data_page_last_modified():
+    '''Ensure a page of BaseModel data is Last-Modified when its records were last updated (or soft deleted)'''
+    print('Starting test_conditional_get.py::test_data_page_last_modified')
+    view = UsersPageView.as_view()
+
+    def get(**headers):
+        request = RequestFactory().get('/users/', headers=headers)
+        request.user = AnonymousUser()
+        return view(request)
+
+    user = CustomUserFactory.create()
+    # (Last-Modified is to the second, so the user was last updated a few seconds ago)
+    CustomUser.all_objects.filter(pk=user.pk).update(updated=user.updated - datetime.timedelta(seconds=5))
+    user.refresh_from_db()
+    response = get()
+    assert response['Last-Modified'] == http_date(user.updated.timestamp())
+    assert get(if_modified_since=response['Last-Modified']).status_code == 304
+    assert get(if_none_match=response['ETag']).status_code == 304
+
+    user.delete()
+    assert get(if_modified_since=response['Last-Modified']).status_code == 200
+    assert get(if_none_match=response['ETag']).status_code == 200
@@ -0,0 +1,57 @@
+from io import StringIO
+
+import pytest
+from bs4 import BeautifulSoup
+from django.core.management import call_command
+from django.urls import reverse
+
+from common.critical_css import critical_css
+
+LAYOUT = '''
+<html><head></head><body>
+  <header id="pageHeader"><ul class="menu"><li><a href="/">Home</a></li></ul></header>
+  <main></main>
+</body></html>
+'''
+
+CSS = '''
+@charset "UTF-8";
+/* layout */
+body { margin: 0; }
+#pageHeader .menu li, .sidebar { display: flex; }
+a:hover { color: blue; }
+.sidebar { width: 20em; }
+article p { line-height: 1.2rem; }
+@media (max-width: 600px) {
+  #pageHeader { padding: 0; }
+  .sidebar { display: none; }
+}
+@media print { .sidebar { display: none; } }
+'''
+
+
+def test_critical_css_rules():
+    '''Ensure the critical css is the rules (and media queries) for the elements of the layout, minified'''
+    print('Starting test_critical_css.py::test_critical_css_rules')
+    assert critical_css(CSS, LAYOUT) == (
+        'body{margin:0}#pageHeader .menu li,.sidebar{display:flex}a:hover{color:blue}'
+        '@media (max-width:600px){#pageHeader{padding:0}}'
+    )
+
+
+@pytest.mark.django_db
+def test_critical_css_inlined(client, tmp_path):
+    '''Ensure the critical css of the layout is built, and inlined in the pages with the script loaded deferred
+
+        - the saved font size is applied in the head of the page (before it is drawn)
+    '''
+    print('Starting test_critical_css.py::test_critical_css_inlined')
+    output = tmp_path / 'critical.css'
+    call_command('critical_css', output=str(output), stdout=StringIO())
+    critical = output.read_text()
+    assert '#fontSizer' in critical and '.thinItem' not in critical
+
+    head = BeautifulSoup(client.get(reverse('home')).content, 'html.parser').head
+    assert '#fontSizer' in head.style.get_text() # (the built static/css/critical.css)
+    assert 'localStorage.getItem("fontSize")' in head.script.get_text()
+    assert head.find('script', src=True).has_attr('defer')
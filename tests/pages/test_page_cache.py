@@ -0,0 +1,102 @@
+from io import StringIO
+
+import pytest
+from bs4 import BeautifulSoup
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.template.response import TemplateResponse
+from django.test import override_settings
+from django.urls import reverse
+
+from common.page_cache import templates_fingerprint
+from tests.accounts.factories import CustomUserFactory
+
+
+def is_rendered(response):
+    '''Return True if the page was rendered for the response (not served from the page cache).'''
+    return isinstance(response, TemplateResponse)
+
+
+@pytest.mark.django_db
+def test_anonymous_pages_cached(client):
+    '''Ensure pages for anonymous users are served from the page cache, by page and language
+
+        - the first request of each page (and language) renders it, the next requests are served from the cache
+    '''
+    print('Starting test_page_cache.py::test_anonymous_pages_cached')
+    first = client.get(reverse('home'))
+    assert is_rendered(first)
+    second = client.get(reverse('home'))
+    assert not is_rendered(second)
+    assert second.status_code == 200
+    assert second.content == first.content
+    assert second['Content-Type'] == first['Content-Type']
+
+    assert is_rendered(client.get(reverse('about')))
+    about = client.get(reverse('about'))
+    assert not is_rendered(about)
+    assert BeautifulSoup(about.content, 'html.parser').h2.get_text() == 'About'
+
+    # a page with a query string is not cached
+    assert is_rendered(client.get(reverse('home'), {'next': '/about/'}))
+    with override_settings(LANGUAGES=[('en', 'English'), ('fr', 'French')]):
+        assert is_rendered(client.get(reverse('home'), HTTP_ACCEPT_LANGUAGE='fr'))
+        assert not is_rendered(client.get(reverse('home'), HTTP_ACCEPT_LANGUAGE='fr'))
+        assert not is_rendered(client.get(reverse('home'), HTTP_ACCEPT_LANGUAGE='en'))
+
+
+@pytest.mark.django_db
+def test_logged_in_pages_use_header_fragments(client):
+    '''Ensure pages for logged in users are rendered, with the header of each user (cached as a fragment)'''
+    print('Starting test_page_cache.py::test_logged_in_pages_use_header_fragments')
+    client.get(reverse('home'))
+    for email in ('first@example.com', 'second@example.com'):
+        client.force_login(CustomUserFactory.create(email=email, first_name='', last_name=''))
+        for _request in range(2):
+            response = client.get(reverse('home'))
+            assert is_rendered(response)
+            soup = BeautifulSoup(response.content, 'html.parser')
+            assert soup.find(id='tsm_name_email').get_text() == email
+            assert soup.find(id='tsm_friend') is None
+    client.logout()
+    soup = BeautifulSoup(client.get(reverse('home')).content, 'html.parser')
+    assert soup.find(id='tsm_friend') is not None
+
+
+@pytest.mark.django_db
+def test_page_cache_invalidation(client, tmp_path):
+    '''Ensure cached pages are rendered again after clear_page_cache, or when a template changes
+
+        - with a file based cache (shared by the server processes)
+        - the command refuses to clear a local memory cache (it would only clear its own process's copy)
+    '''
+    print('Starting test_page_cache.py::test_page_cache_invalidation')
+    with override_settings(CACHES={'default': {'BACKEND': 'common.cache.FileBasedCache', 'LOCATION': str(tmp_path)}}):
+        client.get(reverse('home'))
+        assert not is_rendered(client.get(reverse('home')))
+        call_command('clear_page_cache', stdout=StringIO())
+        assert is_rendered(client.get(reverse('home')))
+        assert not is_rendered(client.get(reverse('home')))
+
+        # (as the templates fingerprint is computed again when a template changes, see common/signals.py)
+        templates_fingerprint.cache_clear()
+        fingerprint = templates_fingerprint()
+        with override_settings(LOCALE_PATHS=[tmp_path]):
+            (tmp_path / 'django.mo').write_bytes(b'')
+            templates_fingerprint.cache_clear()
+            assert templates_fingerprint() != fingerprint
+            assert is_rendered(client.get(reverse('home')))
+    templates_fingerprint.cache_clear()
+
+    with override_settings(CACHES={'default': {'BACKEND': 'common.cache.LocMemCache'}}):
+        with pytest.raises(CommandError, match='local to each process'):
+            call_command('clear_page_cache', stdout=StringIO())
+
+
+@pytest.mark.django_db
+@override_settings(PAGE_CACHE_TIMEOUT=0)
+def test_page_cache_off(client):
+    '''Ensure every page is rendered when PAGE_CACHE_TIMEOUT is 0'''
+    print('Starting test_page_cache.py::test_page_cache_off')
+    client.get(reverse('home'))
+    assert is_rendered(client.get(reverse('home')))
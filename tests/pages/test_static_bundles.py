@@ -0,0 +1,63 @@
+import re
+from io import StringIO
+
+import pytest
+from compressor import storage as compressor_storage
+from compressor.cache import flush_offline_manifest
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils.functional import empty
+from bs4 import BeautifulSoup
+
+
+def reset_compressor():
+    '''Forget django-compressor's storages and offline manifest (set up for the STATIC_ROOT of the settings).'''
+    compressor_storage.default_storage._wrapped = empty
+    compressor_storage.default_offline_manifest_storage._wrapped = empty
+    flush_offline_manifest()
+
+
+@pytest.fixture
+def offline_bundles(tmp_path):
+    '''Collect the static files and build the offline bundles into a temporary STATIC_ROOT.'''
+    with override_settings(
+        STATIC_ROOT=tmp_path, COMPRESS_ROOT=tmp_path, COMPRESS_ENABLED=True, COMPRESS_OFFLINE=True,
+        STORAGES={
+            'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+            'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+        },
+    ):
+        reset_compressor()
+        call_command('collectstatic', '--noinput', stdout=StringIO())
+        call_command('compress', '--force', stdout=StringIO(), stderr=StringIO())
+        yield tmp_path
+    reset_compressor()
+
+
+@pytest.mark.django_db
+def test_offline_bundles(client, offline_bundles):
+    '''Ensure pages link the css and js bundles built offline, minified and content hashed
+
+        - the bundles are served compressed (their gzip variants), and as immutable
+        - the css is loaded without blocking the page (preloaded, then applied), the js deferred
+    '''
+    print('Starting test_static_bundles.py::test_offline_bundles')
+    soup = BeautifulSoup(client.get(reverse('home')).content, 'html.parser')
+    css = [link['href'] for link in soup.find_all('link', rel='stylesheet')] # (for browsers without javascript)
+    assert [link['href'] for link in soup.find_all('link', rel='preload', attrs={'as': 'style'})] == css
+    assert soup.find('link', rel='stylesheet').parent.name == 'noscript'
+    assert soup.find('script', src=True).has_attr('defer')
+    js = [script['src'] for script in soup.find_all('script', src=True)]
+    assert len(css) == 1 and re.fullmatch(r'/static/CACHE/css/output\.[0-9a-f]{12}\.css', css[0])
+    assert len(js) == 1 and re.fullmatch(r'/static/CACHE/js/output\.[0-9a-f]{12}\.js', js[0])
+
+    for url, source in ((css[0], 'css/base.css'), (js[0], 'js/base.js')):
+        bundle = offline_bundles / url.removeprefix('/static/')
+        assert bundle.stat().st_size < (offline_bundles / source).stat().st_size # (minified)
+        assert bundle.with_name(bundle.name + '.gz').exists()
+
+    # served by WhiteNoise, compressed and immutable (cached by browsers until the content, so the name, changes)
+    response = client.get(css[0], HTTP_ACCEPT_ENCODING='gzip')
+    assert response['Content-Encoding'] == 'gzip'
+    assert 'immutable' in response['Cache-Control']
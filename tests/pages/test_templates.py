@@ -0,0 +1,50 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.template.backends.django import DjangoTemplates
+from django.test import RequestFactory
+
+from common.templates import precompile_templates
+
+
+def template_backend(debug):
+    '''Return a template backend of the site's templates, in the production (or debug) template mode.'''
+    return DjangoTemplates({
+        'NAME': 'test',
+        'DIRS': settings.TEMPLATES[0]['DIRS'],
+        'APP_DIRS': False,
+        'OPTIONS': {
+            'context_processors': settings.TEMPLATE_CONTEXT_PROCESSORS,
+            'debug': debug,
+            'loaders': [('django.template.loaders.cached.Loader', [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ])],
+        },
+    })
+
+
+def test_precompile_templates(caplog):
+    '''Ensure the templates under templates/ are compiled into the cached loader (production template mode only)
+
+        - templates that do not compile are logged
+    '''
+    print('Starting test_templates.py::test_precompile_templates')
+    backend = template_backend(debug=False)
+    template_files = [
+        path for directory in backend.engine.dirs for path in Path(directory).rglob('*')
+        if path.suffix in ('.html', '.txt')
+    ]
+    count = precompile_templates(backend.engine)
+    invalid = [record for record in caplog.records if getattr(record, 'event', None) == 'templates.invalid']
+    assert count == len(template_files) - len(invalid)
+    cached = backend.engine.template_loaders[0].get_template_cache
+    assert {'_base.html', 'pages/home.html', 'admin/keyset_change_list.html'} <= set(cached)
+    assert cached['pages/home.html'].origin.name.endswith('pages/home.html')
+
+    request = RequestFactory().get('/')
+    request.user = AnonymousUser()
+    assert '<h3>Home</h3>' in backend.get_template('pages/home.html').render(request=request)
+
+    assert precompile_templates(template_backend(debug=True).engine) == 0